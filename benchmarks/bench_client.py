@@ -0,0 +1,228 @@
+"""
+End-to-end benchmarks of the tiimaweb client against the fake server.
+
+Starts the fake Tiima server in a subprocess, so that the measured CPU
+time is spent by the client only, and measures the number of HTTP
+requests, the wall time and the client CPU time of the main client
+operations::
+
+  python -m benchmarks.bench_client --latency 0.05 --iterations 10
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Text, Tuple
+
+import requests
+
+from tiimaweb import Client
+from tiimaweb.client import Connection
+from tiimaweb.types import TimeBlock
+
+USERNAME = 'bench'
+PASSWORD = 'bench'
+CUSTOMER = 'bench'
+TODAY = date(2020, 3, 4)
+
+if hasattr(time, 'process_time'):
+    _process_time = time.process_time
+else:  # Python 2
+    _process_time = time.clock  # type: ignore
+
+
+class Measurement(object):
+    def __init__(self, name):  # type: (Text) -> None
+        self.name = name
+        self.count = 0
+        self.requests = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+    def row(self):  # type: (...) -> Tuple[Text, float, float, float]
+        n = max(self.count, 1)
+        return (
+            self.name,
+            float(self.requests) / n,
+            1000.0 * self.wall_time / n,
+            1000.0 * self.cpu_time / n)
+
+
+class FakeServerProcess(object):
+    """
+    The fake Tiima server running in a subprocess.
+    """
+    def __init__(
+            self,
+            latency=0.0,  # type: float
+            seed_days=90,  # type: int
+            blocks_per_day=2,  # type: int
+    ):  # type: (...) -> None
+        self.process = subprocess.Popen([
+            sys.executable, '-m', 'benchmarks.fakeserver',
+            '--port', '0',
+            '--latency', '{}'.format(latency),
+            '--user', '{}:{}:{}'.format(USERNAME, PASSWORD, CUSTOMER),
+            '--today', '{}'.format(TODAY),
+            '--seed-days', '{}'.format(seed_days),
+            '--blocks-per-day', '{}'.format(blocks_per_day),
+        ], stdout=subprocess.PIPE)
+        assert self.process.stdout
+        line = self.process.stdout.readline().decode('utf-8')
+        m = re.search(r'(http://\S+)', line)
+        if not m:
+            self.process.kill()
+            raise RuntimeError('Cannot start fake server: {}'.format(line))
+        self.url = m.group(1)
+
+    def get_request_count(self):  # type: (...) -> int
+        count = requests.get(self.url + '/_stats').json()['requests']
+        assert isinstance(count, int)
+        return count
+
+    def stop(self):  # type: (...) -> None
+        self.process.terminate()
+        self.process.wait()
+
+
+class Benchmark(object):
+    def __init__(self, server):  # type: (FakeServerProcess) -> None
+        self.server = server
+        self.measurements = OrderedDict()  # type: Dict[Text, Measurement]
+
+    @contextmanager
+    def measure(self, name):  # type: (Text) -> Iterator[None]
+        measurement = self.measurements.get(name)
+        if not measurement:
+            measurement = self.measurements[name] = Measurement(name)
+        requests_before = self.server.get_request_count()
+        wall_start = time.time()
+        cpu_start = _process_time()
+        yield
+        measurement.cpu_time += _process_time() - cpu_start
+        measurement.wall_time += time.time() - wall_start
+        measurement.requests += (
+            self.server.get_request_count() - requests_before)
+        measurement.count += 1
+
+    def report(self):  # type: (...) -> Text
+        lines = ['{:<34} {:>10} {:>10} {:>10}'.format(
+            'operation', 'requests', 'wall ms', 'cpu ms')]
+        for measurement in self.measurements.values():
+            lines.append('{:<34} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                *measurement.row()))
+        return '\n'.join(lines)
+
+
+def run_operations(
+        benchmark,  # type: Benchmark
+        client,  # type: Client
+        iterations,  # type: int
+):  # type: (...) -> None
+    for n in range(iterations):
+        with benchmark.measure('login'):
+            connection = client.login(USERNAME, PASSWORD, CUSTOMER)
+
+        with connection:
+            run_connection_operations(benchmark, connection, n)
+
+
+def run_connection_operations(
+        benchmark,  # type: Benchmark
+        connection,  # type: Connection
+        n,  # type: int
+):  # type: (...) -> None
+    # Alternate between two days so that each fetch selects a date
+    day = TODAY - timedelta(days=(1 + n % 2))
+    with benchmark.measure('get_time_blocks_of_date'):
+        connection.get_time_blocks_of_date(day)
+
+    with benchmark.measure('get_totals_list'):
+        connection.get_totals_list(TODAY - timedelta(days=60))
+
+    # Use days in the future, which are empty
+    empty_day = TODAY + timedelta(days=(1 + n))
+    short_block = _block(empty_day, 7, 0, 7, 30)
+    with benchmark.measure('add_time_block'):
+        blocks = connection.add_time_block(*short_block)
+    added = _find_block(blocks, short_block)
+
+    with benchmark.measure('delete_time_block'):
+        connection.delete_time_block(added)
+
+    long_block = _block(empty_day, 8, 0, 16, 0)
+    with benchmark.measure('add_time_block (temporary lunch)'):
+        blocks = connection.add_time_block(*long_block)
+
+    connection.get_time_blocks_of_date(day)  # Select another day
+    with benchmark.measure('delete_time_block (other day)'):
+        connection.delete_time_block(_find_block(blocks, long_block))
+
+
+def _block(day, h1, m1, h2, m2):
+    # type: (date, int, int, int, int) -> Tuple[datetime, datetime]
+    return (
+        datetime(day.year, day.month, day.day, h1, m1),
+        datetime(day.year, day.month, day.day, h2, m2))
+
+
+def _find_block(blocks, span):
+    # type: (List[TimeBlock], Tuple[datetime, datetime]) -> TimeBlock
+    for block in blocks:
+        naive_start = block.start_time.replace(tzinfo=None)
+        naive_end = block.end_time.replace(tzinfo=None)
+        if (naive_start, naive_end) == span:
+            return block
+    raise AssertionError('Block not found: {}'.format(span))
+
+
+def main(argv=None):  # type: (Optional[Iterable[Text]]) -> None
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='Server latency in seconds (default: %(default)s)')
+    parser.add_argument(
+        '--iterations', type=int, default=5,
+        help='Number of iterations (default: %(default)s)')
+    parser.add_argument(
+        '--parser', default=None,
+        help='Parser backend of the client (default: MechanicalSoup)')
+    parser.add_argument(
+        '--transport', default='form',
+        help='Transport of the client (default: %(default)s)')
+    parser.add_argument(
+        '--optimistic', action='store_true',
+        help='Use the optimistic mutation mode of the client')
+    parser.add_argument(
+        '--json', action='store_true',
+        help='Output the results as JSON')
+    args = parser.parse_args(list(argv) if argv is not None else None)
+
+    server = FakeServerProcess(latency=args.latency)
+    try:
+        client = Client(
+            url=server.url, parser=args.parser, transport=args.transport,
+            optimistic=args.optimistic)
+        benchmark = Benchmark(server)
+        run_operations(benchmark, client, args.iterations)
+    finally:
+        server.stop()
+
+    if args.json:
+        print(json.dumps([
+            dict(zip(['operation', 'requests', 'wall_ms', 'cpu_ms'],
+                     x.row()))
+            for x in benchmark.measurements.values()], indent=2))
+    else:
+        print(benchmark.report())
+
+
+if __name__ == '__main__':
+    main()
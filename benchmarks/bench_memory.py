@@ -0,0 +1,146 @@
+"""
+Memory benchmark of open connections in the normal and lean modes.
+
+Starts the fake Tiima server in a subprocess and, for each mode, opens
+a number of connections in a fresh subprocess, fetches a date and the
+totals with each of them and reports the resident set size (RSS)
+growth per open connection::
+
+  python -m benchmarks.bench_memory --connections 100
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import gc
+import json
+import resource
+import subprocess
+import sys
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Text
+
+from tiimaweb import Client
+from tiimaweb.client import Connection
+
+from .bench_client import (
+    CUSTOMER,
+    PASSWORD,
+    TODAY,
+    USERNAME,
+    FakeServerProcess,
+)
+
+MODES = ['normal', 'lean']
+
+
+def get_rss():  # type: (...) -> int
+    """
+    Get the current resident set size of this process in bytes.
+
+    Falls back to the peak RSS on systems without /proc.
+    """
+    try:
+        with open('/proc/self/statm') as fp:
+            pages = int(fp.read().split()[1])
+        return pages * resource.getpagesize()
+    except (IOError, OSError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def measure(
+        url,  # type: Text
+        mode,  # type: Text
+        connections,  # type: int
+        parser,  # type: Optional[Text]
+        debug_history,  # type: int
+):  # type: (...) -> Dict[Text, float]
+    client = Client(
+        url=url, parser=parser, lean=(mode == 'lean'),
+        debug_history=debug_history)
+    # Warm up the imports and caches with one connection first
+    with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        _use(connection)
+    gc.collect()
+    rss_before = get_rss()
+    open_connections = []  # type: List[Connection]
+    for _ in range(connections):
+        connection = client.login(USERNAME, PASSWORD, CUSTOMER)
+        _use(connection)
+        open_connections.append(connection)
+    gc.collect()
+    rss_after = get_rss()
+    for connection in open_connections:
+        connection.logout()
+    return {
+        'rss_before_kib': rss_before / 1024.0,
+        'rss_after_kib': rss_after / 1024.0,
+        'per_connection_kib': (
+            (rss_after - rss_before) / 1024.0 / max(connections, 1)),
+    }
+
+
+def _use(connection):  # type: (Connection) -> None
+    connection.get_time_blocks_of_date(TODAY - timedelta(days=1))
+    connection.get_totals_list(TODAY - timedelta(days=30))
+
+
+def run_child(
+        url,  # type: Text
+        mode,  # type: Text
+        args,  # type: argparse.Namespace
+):  # type: (...) -> Dict[Text, float]
+    command = [
+        sys.executable, '-m', 'benchmarks.bench_memory', '--child',
+        '--url', url, '--mode', mode,
+        '--connections', '{}'.format(args.connections),
+        '--debug-history', '{}'.format(args.debug_history),
+    ]
+    if args.parser:
+        command += ['--parser', args.parser]
+    output = subprocess.check_output(command)
+    result = json.loads(output.decode('utf-8'))  # type: Dict[Text, float]
+    return result
+
+
+def main(argv=None):  # type: (Optional[Iterable[Text]]) -> None
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--connections', type=int, default=50,
+        help='Number of open connections (default: %(default)s)')
+    parser.add_argument(
+        '--parser', default=None,
+        help='Parser backend of the client (default: MechanicalSoup)')
+    parser.add_argument(
+        '--debug-history', type=int, default=0,
+        help='Responses kept per connection (default: %(default)s)')
+    parser.add_argument(
+        '--blocks-per-day', type=int, default=10,
+        help='Time blocks per day on the server (default: %(default)s)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args(list(argv) if argv is not None else None)
+
+    if args.child:
+        print(json.dumps(measure(
+            args.url, args.mode, args.connections, args.parser,
+            args.debug_history)))
+        return
+
+    server = FakeServerProcess(blocks_per_day=args.blocks_per_day)
+    try:
+        results = [(mode, run_child(server.url, mode, args)) for mode in MODES]
+    finally:
+        server.stop()
+
+    print('{:<8} {:>12} {:>12} {:>16}'.format(
+        'mode', 'RSS before', 'RSS after', 'KiB/connection'))
+    for (mode, result) in results:
+        print('{:<8} {:>9.0f} KiB {:>9.0f} KiB {:>16.1f}'.format(
+            mode, result['rss_before_kib'], result['rss_after_kib'],
+            result['per_connection_kib']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Parser micro-benchmarks over a corpus of recorded Tiima pages.
+
+Records a corpus of large pages from the fake Tiima server (or loads
+a cassette recorded with tiimaweb.recording) and measures how many
+pages per second each parser backend turns into time blocks and day
+summaries::
+
+  python -m benchmarks.bench_parser --blocks-per-day 50
+  python -m benchmarks.bench_parser --cassette tiima.jsonl
+
+The generated corpus has every page in all three languages and time
+blocks crossing midnight and the turn of the year.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Text, Tuple
+
+from tiimaweb import Client
+from tiimaweb.client import BaseConnection
+from tiimaweb.parsing import FragmentParser, SoupParser
+from tiimaweb.recording import Recorder, make_response, read_records
+from tiimaweb.types import HtmlResponse
+
+from .fakeserver import LANGUAGES, FakeTiima, FakeTiimaServer
+
+USERNAME = 'bench'
+PASSWORD = 'bench'
+CUSTOMER = 'bench'
+TODAY = date(2020, 1, 10)
+
+#: Page kinds by the action which returned them
+PAGE_KINDS = OrderedDict([
+    ('action_select_date', 'time blocks'),
+    ('action_previous_month', 'calendar'),
+])
+
+PARSERS = OrderedDict([
+    ('soup (lxml)', SoupParser('lxml')),
+    ('soup (html.parser)', SoupParser('html.parser')),
+    ('fragment (lxml)', FragmentParser('lxml')),
+    ('fragment (html.parser)', FragmentParser('html.parser')),
+])
+
+if hasattr(time, 'process_time'):
+    _process_time = time.process_time
+else:  # Python 2
+    _process_time = time.clock  # type: ignore
+
+
+def record_corpus(
+        path,  # type: Text
+        days=30,  # type: int
+        blocks_per_day=50,  # type: int
+):  # type: (...) -> None
+    """
+    Record the pages of the given number of days before TODAY.
+
+    Each weekday gets the given number of blocks and a block crossing
+    midnight, which on the last day of the year ends in the next year.
+    """
+    tiima = FakeTiima(today=TODAY)
+    account = tiima.add_account(USERNAME, PASSWORD, CUSTOMER)
+    first_day = TODAY - timedelta(days=days)
+    tiima.seed(account, first_day, TODAY, blocks_per_day)
+    day = first_day
+    while day <= TODAY:
+        if day.weekday() < 5:
+            start = datetime(day.year, day.month, day.day, 22, 0)
+            tiima.add_block(
+                account, start, start + timedelta(hours=4),
+                description='Night shift')
+        day += timedelta(days=1)
+
+    recorder = Recorder(path, secrets=[USERNAME, PASSWORD, CUSTOMER])
+    with FakeTiimaServer(tiima) as server:
+        client = Client(url=server.url, transport=recorder)
+        with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+            for language in sorted(LANGUAGES):
+                day = first_day
+                while day <= TODAY:
+                    params = connection._get_select_date_params(day)
+                    params['UserLanguage'] = language
+                    connection.post_action('action_select_date', params)
+                    day += timedelta(days=1)
+                params = connection._get_totals_params(first_day)
+                params['UserLanguage'] = language
+                connection.post_action('action_previous_month', params)
+
+
+def load_pages(path):  # type: (Text) -> Dict[Text, List[Dict[Text, Any]]]
+    """
+    Load the recorded responses of a cassette by page kind.
+    """
+    pages = OrderedDict(
+        (kind, []) for kind in PAGE_KINDS.values()
+    )  # type: Dict[Text, List[Dict[Text, Any]]]
+    for record in read_records(path):
+        kind = PAGE_KINDS.get(record.get('action', ''))
+        if kind and record.get('status') == 200:
+            pages[kind].append(record)
+    return pages
+
+
+def parse_page(
+        connection,  # type: BaseConnection
+        kind,  # type: Text
+        record,  # type: Dict[Text, Any]
+        parser,  # type: SoupParser
+):  # type: (...) -> List[Any]
+    page = HtmlResponse.from_response(make_response(record), parser)
+    if kind == 'time blocks':
+        return [
+            x._replace(reason_text='', status='')  # Language dependent
+            for x in connection._parse_and_store_time_blocks(page)]
+    return list(connection._parse_totals(page))
+
+
+def check_parsers(
+        connection,  # type: BaseConnection
+        pages,  # type: Dict[Text, List[Dict[Text, Any]]]
+):  # type: (...) -> None
+    """
+    Check that every parser gets the same results from every page.
+    """
+    for (kind, records) in pages.items():
+        for record in records:
+            results = [
+                parse_page(connection, kind, record, parser)
+                for parser in PARSERS.values()]
+            if any(x != results[0] for x in results):
+                raise AssertionError('Parsers disagree on {} page {}'.format(
+                    kind, record['params']))
+
+
+def run(
+        connection,  # type: BaseConnection
+        pages,  # type: Dict[Text, List[Dict[Text, Any]]]
+        iterations,  # type: int
+):  # type: (...) -> List[Tuple[Text, Text, int, float, float]]
+    """
+    Measure the parsers and return rows of (parser, page kind, pages,
+    pages/s, items/s).
+    """
+    rows = []
+    for (name, parser) in PARSERS.items():
+        for (kind, records) in pages.items():
+            if not records:
+                continue
+            items = 0
+            start = _process_time()
+            for _ in range(iterations):
+                for record in records:
+                    items += len(parse_page(connection, kind, record, parser))
+            elapsed = max(_process_time() - start, 1e-9)
+            count = len(records) * iterations
+            rows.append((name, kind, len(records), count / elapsed,
+                         items / elapsed))
+    return rows
+
+
+def main(argv=None):  # type: (Optional[Iterable[Text]]) -> None
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--cassette', default=None,
+        help='Cassette to use instead of recording a corpus')
+    parser.add_argument(
+        '--save', default=None,
+        help='Save the recorded corpus to this file')
+    parser.add_argument(
+        '--days', type=int, default=30,
+        help='Days in the recorded corpus (default: %(default)s)')
+    parser.add_argument(
+        '--blocks-per-day', type=int, default=50,
+        help='Time blocks per day in the corpus (default: %(default)s)')
+    parser.add_argument(
+        '--iterations', type=int, default=3,
+        help='Number of passes over the corpus (default: %(default)s)')
+    parser.add_argument(
+        '--json', action='store_true',
+        help='Output the results as JSON')
+    args = parser.parse_args(list(argv) if argv is not None else None)
+
+    path = args.cassette or args.save
+    temporary_path = None
+    if not path:
+        (fd, temporary_path) = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        path = temporary_path
+    try:
+        if not args.cassette:
+            record_corpus(path, args.days, args.blocks_per_day)
+        pages = load_pages(path)
+    finally:
+        if temporary_path:
+            os.remove(temporary_path)
+
+    connection = BaseConnection(Client())
+    check_parsers(connection, pages)
+    rows = run(connection, pages, args.iterations)
+
+    if args.json:
+        print(json.dumps([
+            dict(zip(['parser', 'page', 'pages', 'pages_per_s',
+                      'items_per_s'], x))
+            for x in rows], indent=2))
+        return
+    print('{:<24} {:<12} {:>6} {:>10} {:>10}'.format(
+        'parser', 'page', 'pages', 'pages/s', 'items/s'))
+    for row in rows:
+        print('{:<24} {:<12} {:>6} {:>10.1f} {:>10.0f}'.format(*row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Micro-benchmarks of the date, timestamp and time range conversions.
+
+Compares the precomputed conversions of tiimaweb.timeconv to the
+per-call pytz conversions and strptime parsing they replaced, over
+every date of the given years and time ranges within, before and
+after each date::
+
+  python -m benchmarks.bench_timeconv --years 2019-2021
+  python -m benchmarks.bench_timeconv --tz America/New_York --json
+
+Before measuring, checks that both give the same results, except for
+the times after a DST transition on the date of the transition and
+the ranges ending on a leap day, which the old code got wrong or could
+not parse and which are checked against pytz instead.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import re
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Iterable, List, Optional, Text, Tuple
+
+import pytz
+
+from tiimaweb.timeconv import EPOCH, TimeConverter
+
+if hasattr(time, 'process_time'):
+    _process_time = time.process_time
+else:  # Python 2
+    _process_time = time.clock  # type: ignore
+
+_OLD_TIME_RANGE_RE = (
+    r'(\((?P<start_date>[0-9.]+)\) )?'
+    r'(?P<start>[0-9:]+)-(?P<end>[0-9:]+)'
+    r'( \((?P<end_date>[0-9.]+)\))?')
+
+
+def old_date_to_timestamp(tz, day):  # type: (Any, date) -> int
+    dt = tz.localize(datetime.combine(day, datetime.min.time()))
+    return int((dt - EPOCH).total_seconds() * 1000)
+
+
+def old_parse_timestamp(tz, ts):  # type: (Any, int) -> datetime
+    utc_datetime = EPOCH + timedelta(seconds=(ts / 1000.0))
+    return utc_datetime.astimezone(tz)
+
+
+def old_parse_time_range(text, day):
+    # type: (Text, datetime) -> Tuple[datetime, datetime]
+    m = re.match(_OLD_TIME_RANGE_RE, text)
+    if not m:
+        raise ValueError('Cannot parse times: {}'.format(text))
+    start = datetime.strptime(m.group(str('start')), '%H:%M').time()
+    end = datetime.strptime(m.group(str('end')), '%H:%M').time()
+    start_time = day + timedelta(hours=start.hour, minutes=start.minute)
+    end_time = day + timedelta(hours=end.hour, minutes=end.minute)
+    if m.group(str('start_date')):
+        sd = datetime.strptime(m.group(str('start_date')), '%d.%m.').date()
+        year_delta = 1 if (sd.month == 12 and start_time.month == 1) else 0
+        start_time = start_time.replace(
+            year=(start_time.year - year_delta), month=sd.month, day=sd.day)
+    if m.group(str('end_date')):
+        ed = datetime.strptime(m.group(str('end_date')), '%d.%m.').date()
+        year_delta = 1 if (ed.month == 1 and end_time.month == 12) else 0
+        end_time = end_time.replace(
+            year=(end_time.year + year_delta), month=ed.month, day=ed.day)
+    return (start_time, end_time)
+
+
+def get_dates(first_year, last_year):  # type: (int, int) -> List[date]
+    day = date(first_year, 1, 1)
+    result = []
+    while day.year <= last_year:
+        result.append(day)
+        day += timedelta(days=1)
+    return result
+
+
+def get_time_ranges(day):  # type: (date) -> List[Text]
+    """
+    Get time ranges of the rows shown on a date, as Tiima shows them.
+    """
+    previous_day = day - timedelta(days=1)
+    next_day = day + timedelta(days=1)
+    return [
+        '08:00-11:30',
+        '11:30-12:00',
+        '12:00-16:15',
+        '({:%d.%m.}) 22:00-02:00'.format(previous_day),
+        '22:00-06:00 ({:%d.%m.})'.format(next_day),
+    ]
+
+
+def check(tz, converter, days):
+    # type: (Any, TimeConverter, List[date]) -> int
+    """
+    Check the conversions against the old code and pytz.
+
+    Returns the number of time ranges which the old code got wrong or
+    could not parse.
+    """
+    old_errors = 0
+    for day in days:
+        ts = old_date_to_timestamp(tz, day)
+        if converter.get_timestamp(day) != ts:
+            raise AssertionError('Different timestamp of {}'.format(day))
+        midnight = old_parse_timestamp(tz, ts)
+        if converter.get_midnight(ts) != midnight:
+            raise AssertionError('Different date of {}'.format(ts))
+        for text in get_time_ranges(day):
+            new = converter.parse_time_range(text, day)
+            try:
+                if new == old_parse_time_range(text, midnight):
+                    continue
+            except ValueError:  # E.g. "(29.02.)", parsed in year 1900
+                pass
+            old_errors += 1
+            expected = _localize_time_range(tz, text, day)
+            if new != expected:
+                raise AssertionError('Wrong times of {} on {}: {}'.format(
+                    text, day, new))
+    return old_errors
+
+
+def run(tz, days, iterations):
+    # type: (Any, List[date], int) -> List[Tuple[Text, Text, int, float]]
+    """
+    Measure the conversions and return rows of (operation, code,
+    count, operations/s).
+    """
+    converter = TimeConverter(tz)
+    timestamps = [old_date_to_timestamp(tz, day) for day in days]
+    midnights = [old_parse_timestamp(tz, ts) for ts in timestamps]
+    ranges = [
+        (text, day, midnight)
+        for (day, midnight) in zip(days, midnights)
+        for text in get_time_ranges(day)
+        if _is_parsed_by_old_code(text, midnight)]
+
+    def build_index():  # type: () -> None
+        TimeConverter(tz).get_timestamp(days[0])
+
+    cases = [
+        ('index build (year)', 'new', 1, build_index),
+        ('date -> timestamp', 'old', len(days), lambda: [
+            old_date_to_timestamp(tz, x) for x in days]),
+        ('date -> timestamp', 'new', len(days), lambda: [
+            converter.get_timestamp(x) for x in days]),
+        ('timestamp -> date', 'old', len(days), lambda: [
+            old_parse_timestamp(tz, x) for x in timestamps]),
+        ('timestamp -> date', 'new', len(days), lambda: [
+            converter.get_midnight(x) for x in timestamps]),
+        ('time range', 'old', len(ranges), lambda: [
+            old_parse_time_range(text, midnight)
+            for (text, _day, midnight) in ranges]),
+        ('time range', 'new', len(ranges), lambda: [
+            converter.parse_time_range(text, day)
+            for (text, day, _midnight) in ranges]),
+    ]  # type: List[Tuple[Text, Text, int, Callable[[], Any]]]
+    rows = []
+    for (name, code, count, func) in cases:
+        func()  # Warm up, e.g. fill the index
+        start = _process_time()
+        for _ in range(iterations):
+            func()
+        elapsed = max(_process_time() - start, 1e-9)
+        rows.append((name, code, count, count * iterations / elapsed))
+    return rows
+
+
+def _is_parsed_by_old_code(text, midnight):  # type: (Text, datetime) -> bool
+    try:
+        old_parse_time_range(text, midnight)
+    except ValueError:
+        return False
+    return True
+
+
+def _localize_time_range(tz, text, day):
+    # type: (Any, Text, date) -> Tuple[datetime, datetime]
+    m = re.match(_OLD_TIME_RANGE_RE, text)
+    assert m
+    (start_day, end_day) = (day, day)
+    if m.group(str('start_date')):
+        start_day = day - timedelta(days=1)
+    if m.group(str('end_date')):
+        end_day = day + timedelta(days=1)
+    return tuple(
+        tz.localize(datetime.combine(d, datetime.strptime(t, '%H:%M').time()))
+        for (d, t) in [(start_day, m.group(str('start'))),
+                       (end_day, m.group(str('end')))])
+
+
+def parse_years(text):  # type: (Text) -> Tuple[int, int]
+    (first, _sep, last) = text.partition('-')
+    return (int(first), int(last or first))
+
+
+def main(argv=None):  # type: (Optional[Iterable[Text]]) -> None
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--years', type=parse_years, default=(2019, 2021),
+        help='Years of the converted dates (default: 2019-2021)')
+    parser.add_argument(
+        '--tz', default='Europe/Helsinki',
+        help='Time zone of the dates (default: %(default)s)')
+    parser.add_argument(
+        '--iterations', type=int, default=5,
+        help='Number of passes over the dates (default: %(default)s)')
+    parser.add_argument(
+        '--json', action='store_true',
+        help='Output the results as JSON')
+    args = parser.parse_args(list(argv) if argv is not None else None)
+
+    tz = pytz.timezone(args.tz)
+    days = get_dates(*args.years)
+    old_errors = check(tz, TimeConverter(tz), days)
+    rows = run(tz, days, args.iterations)
+
+    if args.json:
+        print(json.dumps({
+            'old_code_errors': old_errors,
+            'results': [
+                dict(zip(['operation', 'code', 'count', 'ops_per_s'], x))
+                for x in rows],
+        }, indent=2))
+        return
+    print('{:<20} {:<4} {:>8} {:>12} {:>8}'.format(
+        'operation', 'code', 'count', 'ops/s', 'speedup'))
+    old_speeds = dict((x[0], x[3]) for x in rows if x[1] == 'old')
+    for (name, code, count, speed) in rows:
+        old_speed = old_speeds.get(name) if code == 'new' else None
+        print('{:<20} {:<4} {:>8} {:>12.0f} {:>8}'.format(
+            name, code, count, speed,
+            '{:.1f}x'.format(speed / old_speed) if old_speed else ''))
+    print('')
+    print('Time ranges wrong or unparseable in old code: {}'.format(
+        old_errors))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,703 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the Tiima web service.
+
+Implements just enough of the Tiima web UI for exercising the tiimaweb
+client: the login form, the stamping page with the "tiima" form and
+the AJAX actions posted through it.  All state is kept in memory.  The
+time blocks are stored per account and the selected date, calendar
+strip position and edit panel state are stored per session, so several
+sessions of the same account see the same data.
+
+The server can be started from the command line::
+
+  python -m benchmarks.fakeserver --port 8000 --user demo:secret:acme
+
+or in-process with the FakeTiimaServer class.
+"""
+from __future__ import unicode_literals
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Text, Tuple
+
+import pytz
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.http_cookies import SimpleCookie
+from six.moves.urllib.parse import parse_qsl
+
+from tiimaweb.timeconv import EPOCH
+
+LANGUAGES = {'1': 'FIN', '2': 'SWE', '3': 'ENG'}
+
+TABLE_HEADERS = {
+    'FIN': ['', 'Kello', 'Syykoodi', 'Tila', 'Selite'],
+    'SWE': ['', 'Klockan', 'Orsakskod', 'Status', 'Förklaring'],
+    'ENG': ['', 'Clock', 'Reason code', 'Status', 'Description'],
+}
+
+STATUS_TEXTS = {
+    'FIN': 'Hyväksytty',
+    'SWE': 'Godkänd',
+    'ENG': 'Approved',
+}
+
+REASON_CODES = {
+    '1': ('NTYO', {
+        'FIN': 'Normaali työaika',
+        'SWE': 'Normal arbetstid',
+        'ENG': 'Normal working time',
+    }),
+    '13': ('LOU', {
+        'FIN': 'Lounas',
+        'SWE': 'Lunch',
+        'ENG': 'Lunch',
+    }),
+    '39': ('YT', {
+        'FIN': 'Ylityö',
+        'SWE': 'Övertid',
+        'ENG': 'Overtime',
+    }),
+}
+
+LUNCH_REASON_CODE = '13'
+NORMAL_REASON_CODE = '1'
+
+#: Days longer than this get an automatic lunch break, unless they
+#: already contain one.  This mimics the behaviour of the real service
+#: which the client works around with a temporary lunch break.
+MAX_LUNCHLESS_DAY_LEN = timedelta(hours=6)
+AUTOMATIC_LUNCH_LEN = timedelta(minutes=30)
+
+
+class Block(object):
+    def __init__(
+            self,
+            id,  # type: int
+            start,  # type: datetime
+            end,  # type: datetime
+            reason_code=NORMAL_REASON_CODE,  # type: Text
+            description='',  # type: Text
+    ):  # type: (...) -> None
+        self.id = id
+        self.start = start
+        self.end = end
+        self.reason_code = reason_code
+        self.description = description
+
+    @property
+    def duration(self):  # type: (...) -> timedelta
+        return self.end - self.start
+
+
+class Account(object):
+    def __init__(
+            self,
+            username,  # type: Text
+            password,  # type: Text
+            customer,  # type: Text
+    ):  # type: (...) -> None
+        self.username = username
+        self.password = password
+        self.customer = customer
+        self.employee_id = '{}'.format(abs(hash(username)) % 100000)
+        self.blocks = {}  # type: Dict[date, List[Block]]
+        self.lock = threading.RLock()
+
+    def blocks_of_day(self, day):  # type: (date) -> List[Block]
+        return sorted(self.blocks.get(day, []), key=(lambda x: x.start))
+
+
+class Session(object):
+    def __init__(self, account, today):  # type: (Account, date) -> None
+        self.account = account
+        self.selected_date = today
+        self.strip_start = today.replace(day=1)
+        self.language = 'ENG'
+        self.edit_open = False
+        self.last_seen = time.time()
+
+
+class FakeTiima(object):
+    """
+    The state and page rendering logic of the fake Tiima service.
+    """
+    def __init__(
+            self,
+            tz=str('Europe/Helsinki'),  # type: str
+            latency=0.0,  # type: float
+            today=None,  # type: Optional[date]
+            strict_edit_panel=False,  # type: bool
+            session_timeout=None,  # type: Optional[float]
+            error_rate=0.0,  # type: float
+            random_seed=None,  # type: Optional[int]
+    ):  # type: (...) -> None
+        """
+        Initialize the fake service.
+
+        Sessions idle for more than session_timeout seconds expire.
+        The given fraction of the actions fails with a server error,
+        half of them before and half after the action is applied.
+        """
+        self.tz = pytz.timezone(tz)
+        self.latency = latency
+        self.today = today or date.today()
+        self.strict_edit_panel = strict_edit_panel
+        self.session_timeout = session_timeout
+        self.error_rate = error_rate
+        self.random = random.Random(random_seed)
+        self.accounts = {}  # type: Dict[Tuple[Text, Text], Account]
+        self.sessions = {}  # type: Dict[Text, Session]
+        self.request_count = 0
+        self._ids = itertools.count(1000)
+        self._lock = threading.Lock()
+
+    def add_account(
+            self,
+            username,  # type: Text
+            password,  # type: Text
+            customer,  # type: Text
+    ):  # type: (...) -> Account
+        account = Account(username, password, customer)
+        self.accounts[(customer.lower(), username.lower())] = account
+        return account
+
+    def add_block(
+            self,
+            account,  # type: Account
+            start,  # type: datetime
+            end,  # type: datetime
+            reason_code=NORMAL_REASON_CODE,  # type: Text
+            description='',  # type: Text
+    ):  # type: (...) -> Block
+        start = self._localize(start)
+        end = self._localize(end)
+        with self._lock:
+            block_id = next(self._ids)
+        block = Block(block_id, start, end, reason_code, description)
+        with account.lock:
+            account.blocks.setdefault(start.date(), []).append(block)
+        return block
+
+    def seed(
+            self,
+            account,  # type: Account
+            start,  # type: date
+            end,  # type: date
+            blocks_per_day=2,  # type: int
+    ):  # type: (...) -> None
+        """
+        Fill the weekdays of the given date range with time blocks.
+        """
+        day = start
+        while day <= end:
+            if day.weekday() < 5:
+                self._seed_day(account, day, blocks_per_day)
+            day += timedelta(days=1)
+
+    def _seed_day(
+            self,
+            account,  # type: Account
+            day,  # type: date
+            blocks_per_day,  # type: int
+    ):  # type: (...) -> None
+        start = datetime(day.year, day.month, day.day, 8, 0)
+        block_len = timedelta(minutes=(450 // max(blocks_per_day, 1)))
+        for n in range(blocks_per_day):
+            end = start + block_len
+            self.add_block(account, start, end, description='Work')
+            if n == 0 and blocks_per_day > 1:
+                lunch_end = end + AUTOMATIC_LUNCH_LEN
+                self.add_block(account, end, lunch_end, LUNCH_REASON_CODE)
+                end = lunch_end
+            start = end
+
+    def _localize(self, dt):  # type: (datetime) -> datetime
+        if not dt.tzinfo:
+            return self.tz.localize(dt)
+        return dt.astimezone(self.tz)
+
+    def date_to_timestamp(self, day):  # type: (date) -> Text
+        dt = self.tz.localize(datetime(day.year, day.month, day.day))
+        return '{}'.format(int((dt - EPOCH).total_seconds() * 1000))
+
+    def timestamp_to_date(self, ts):  # type: (Text) -> date
+        utc_datetime = EPOCH + timedelta(seconds=(int(ts) / 1000.0))
+        return utc_datetime.astimezone(self.tz).date()
+
+    # Request handling
+
+    def login(self, fields):  # type: (Dict[Text, Text]) -> Optional[Text]
+        key = (
+            fields.get('CustomerIdentifier', '').lower(),
+            fields.get('UserName', '').lower())
+        account = self.accounts.get(key)
+        if not account or account.password != fields.get('Password'):
+            return None
+        session_id = uuid.uuid4().hex
+        session = Session(account, self.today)
+        session.language = fields.get('Language', 'ENG')
+        with self._lock:
+            self.sessions[session_id] = session
+        return session_id
+
+    def logout(self, session_id):  # type: (Optional[Text]) -> None
+        with self._lock:
+            self.sessions.pop(session_id or '', None)
+
+    def get_session(self, session_id):
+        # type: (Optional[Text]) -> Optional[Session]
+        session = self.sessions.get(session_id or '')
+        now = time.time()
+        if session and self.session_timeout is not None and (
+                now - session.last_seen > self.session_timeout):
+            self.logout(session_id)
+            return None
+        if session:
+            session.last_seen = now
+        return session
+
+    def expire_sessions(self):  # type: (...) -> None
+        with self._lock:
+            self.sessions.clear()
+
+    def pick_failure(self):  # type: (...) -> Optional[Text]
+        """
+        Pick whether to fail the next action "before" or "after" it.
+        """
+        with self._lock:
+            if self.random.random() >= self.error_rate:
+                return None
+            return self.random.choice(['before', 'after'])
+
+    def handle_action(
+            self,
+            session,  # type: Session
+            fields,  # type: Dict[Text, Text]
+    ):  # type: (...) -> Text
+        action = fields.get('FieldAction', '')
+        session.language = LANGUAGES.get(
+            fields.get('UserLanguage', ''), session.language)
+        with session.account.lock:
+            handler = getattr(self, '_' + action, None)
+            if action.startswith('action_') and handler:
+                handler(session, fields)
+            return self.render_main_page(session)
+
+    def _action_select_date(self, session, fields):
+        # type: (Session, Dict[Text, Text]) -> None
+        session.selected_date = self.timestamp_to_date(
+            fields['SelectedStampingDate'])
+
+    def _action_previous_month(self, session, fields):
+        # type: (Session, Dict[Text, Text]) -> None
+        session.strip_start = self.timestamp_to_date(
+            fields['CalendarStripStartDate']).replace(day=1)
+
+    def _action_edit_open(self, session, fields):
+        # type: (Session, Dict[Text, Text]) -> None
+        session.edit_open = True
+
+    def _action_save(self, session, fields):
+        # type: (Session, Dict[Text, Text]) -> None
+        if self.strict_edit_panel and not session.edit_open:
+            return
+        session.edit_open = False
+        try:
+            start = datetime.strptime(
+                fields['EditStartDate'] + ' ' + fields['EditStartTime'],
+                '%d.%m.%Y %H:%M')
+            end = datetime.strptime(
+                fields['EditEndDate'] + ' ' + fields['EditEndTime'],
+                '%d.%m.%Y %H:%M')
+        except (KeyError, ValueError):
+            return
+        reason_code = fields.get('EditReasonCodeId', NORMAL_REASON_CODE)
+        if end <= start or reason_code not in REASON_CODES:
+            return
+        account = session.account
+        block = self.add_block(
+            account, start, end, reason_code,
+            fields.get('EditDescription', ''))
+        if reason_code != LUNCH_REASON_CODE:
+            self._add_automatic_lunch(account, block.start.date())
+
+    def _add_automatic_lunch(self, account, day):
+        # type: (Account, date) -> None
+        blocks = account.blocks_of_day(day)
+        if any(x.reason_code == LUNCH_REASON_CODE for x in blocks):
+            return
+        total = sum((x.duration for x in blocks), timedelta(0))
+        if total < MAX_LUNCHLESS_DAY_LEN:
+            return
+        lunch_start = blocks[0].start + timedelta(hours=4)
+        self.add_block(
+            account, lunch_start, lunch_start + AUTOMATIC_LUNCH_LEN,
+            LUNCH_REASON_CODE)
+
+    def _action_delete_selected(self, session, fields):
+        # type: (Session, Dict[Text, Text]) -> None
+        # Like in Tiima, only the rows of the selected date are deletable
+        block_id = fields.get('SelectedRowStampId', '')
+        blocks = session.account.blocks.get(session.selected_date, [])
+        for block in list(blocks):
+            if '{}'.format(block.id) == block_id:
+                blocks.remove(block)
+
+    # Rendering
+
+    def render_login_page(self, failed=False):  # type: (bool) -> Text
+        return (
+            '<html><head><title>Tiima login</title></head><body>'
+            '{error}'
+            '<form id="loginForm" method="post" action="/Login/">'
+            '<input type="text" name="UserName" value=""/>'
+            '<input type="password" name="Password" value=""/>'
+            '<input type="text" name="CustomerIdentifier" value=""/>'
+            '<select name="Language">'
+            '<option value="FIN">Suomi</option>'
+            '<option value="SWE">Svenska</option>'
+            '<option value="ENG">English</option>'
+            '</select>'
+            '<input type="submit" value="Login"/>'
+            '</form></body></html>').format(
+                error=('<p class="error">Login failed</p>' if failed else ''))
+
+    def render_main_page(self, session):  # type: (Session) -> Text
+        account = session.account
+        return (
+            '<html><head><title>Tiima</title></head><body>'
+            '<div class="menu"><a id="Logout" href="/Logout/">Log out</a>'
+            '</div>'
+            '<form name="tiima" method="post" action="/Stamping/">'
+            '<input name="FieldAction" type="hidden" value=""/>'
+            '<input name="FieldShowSubMenu" type="hidden" value="true"/>'
+            '<input name="FieldMenuId1" type="hidden" value="TOP_WORKHOUR"/>'
+            '<input name="FieldMenuId1" type="hidden"'
+            ' value="WORKINGHOURSTAMP"/>'
+            '<input name="UserLanguage" type="hidden" value="1"/>'
+            '<input name="companyIdentifierTiima" type="hidden"'
+            ' value="{customer}"/>'
+            '<input name="PageId" type="hidden" value="1"/>'
+            '<select name="StampReasonCodeId">{reason_options}</select>'
+            '<input name="StampDescription" type="text" value=""/>'
+            '<input name="CalendarStripStartDate" type="hidden"'
+            ' value="{strip_start}"/>'
+            '<input name="EmployeeId" type="hidden" value="{employee_id}"/>'
+            '{day_content}'
+            '<input name="EditStampId" type="hidden" value="0"/>'
+            '<input name="EditPanelActive" type="hidden" value="0"/>'
+            '<input name="ActiveList" type="hidden" value=""/>'
+            '<input name="lmi" type="hidden" value=""/>'
+            '<input name="DebugDeleteRawStampId" type="hidden" value=""/>'
+            '</form></body></html>').format(
+                customer=_escape(account.customer),
+                reason_options=self._render_reason_options(session),
+                strip_start=self.date_to_timestamp(session.strip_start),
+                employee_id=account.employee_id,
+                day_content=self._render_day_content(session))
+
+    def _render_reason_options(self, session):  # type: (Session) -> Text
+        return ''.join(
+            '<option value="{}">{} ({})</option>'.format(
+                code, texts[session.language], abbr)
+            for (code, (abbr, texts)) in sorted(REASON_CODES.items()))
+
+    def _render_day_content(self, session):  # type: (Session) -> Text
+        return (
+            '<input name="SelectedStampingDate" type="hidden"'
+            ' value="{selected}"/>'
+            '<div id="CalendarStrip"><table><tr>{calendar}</tr></table></div>'
+            '<div class="stamping_realized_stamp_scroll_box">'
+            '<table>{header}{rows}</table></div>').format(
+                selected=self.date_to_timestamp(session.selected_date),
+                calendar=self._render_calendar(session),
+                header=self._render_table_header(session.language),
+                rows=''.join(
+                    self._render_block_row(session, block)
+                    for block in session.account.blocks_of_day(
+                        session.selected_date)))
+
+    def _render_calendar(self, session):  # type: (Session) -> Text
+        start = session.strip_start
+        (end_year, end_month) = divmod(start.month + 2, 12)
+        end = date(start.year + end_year, end_month + 1, 1)
+        cells = []
+        day = start
+        while day < end:
+            cells.append(self._render_calendar_day(session, day))
+            day += timedelta(days=1)
+        return ''.join(cells)
+
+    def _render_calendar_day(self, session, day):
+        # type: (Session, date) -> Text
+        blocks = session.account.blocks_of_day(day)
+        work = [x for x in blocks if x.reason_code != LUNCH_REASON_CODE]
+        total = sum((x.duration for x in work), timedelta(0))
+        minutes = int(total.total_seconds()) // 60
+        hours_text = (
+            '{}:{:02d}'.format(minutes // 60, minutes % 60) if work else '')
+        indicators = sorted(set(
+            REASON_CODES[x.reason_code][0] for x in blocks
+            if x.reason_code != NORMAL_REASON_CODE))
+        day_class = (
+            'calendar_current_day_of_month' if day == self.today
+            else 'calendar_day_of_month')
+        return (
+            '<td onclick="document.tiima.SelectedStampingDate.value='
+            '\'{ts}\';postAction(\'action_select_date\');">'
+            '<div class="{day_class}">{day}</div>'
+            '<div class="calendar_date_hours">{hours}</div>'
+            '<div class="calendar_date_reasoncode_indicator">{indicator}'
+            '</div></td>').format(
+                ts=self.date_to_timestamp(day),
+                day_class=day_class,
+                day=day.day,
+                hours=hours_text,
+                indicator=' '.join(indicators))
+
+    def _render_table_header(self, language):  # type: (Text) -> Text
+        return '<tr>{}</tr>'.format(''.join(
+            '<th>{}</th>'.format(x) for x in TABLE_HEADERS[language]))
+
+    def _render_block_row(self, session, block):
+        # type: (Session, Block) -> Text
+        day = session.selected_date
+        start = block.start.astimezone(self.tz)
+        end = block.end.astimezone(self.tz)
+        time_range = '{}{:%H:%M}-{:%H:%M}{}'.format(
+            ('({:%d.%m.}) '.format(start) if start.date() != day else ''),
+            start, end,
+            (' ({:%d.%m.})'.format(end) if end.date() != day else ''))
+        (abbr, texts) = REASON_CODES[block.reason_code]
+        return (
+            '<tr>'
+            '<td><input type="hidden" id="SelectedRowStampId"'
+            ' value="{id}"/></td>'
+            '<td>{time_range}</td>'
+            '<td>{reason_text}&nbsp;({abbr})</td>'
+            '<td>{status}</td>'
+            '<td title="{description}">{description}</td>'
+            '</tr>').format(
+                id=block.id,
+                time_range=time_range,
+                reason_text=texts[session.language],
+                abbr=abbr,
+                status=STATUS_TEXTS[session.language],
+                description=_escape(block.description))
+
+
+def _escape(text):  # type: (Text) -> Text
+    return (
+        text.replace('&', '&amp;').replace('<', '&lt;')
+        .replace('>', '&gt;').replace('"', '&quot;'))
+
+
+ERROR_PAGE = '<html><body>Service unavailable</body></html>'
+
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = str('HTTP/1.1')
+    server_version = str('FakeTiima/1.0')
+
+    @property
+    def tiima(self):  # type: (...) -> FakeTiima
+        return self.server.tiima  # type: ignore
+
+    def log_message(self, format, *args):  # type: ignore
+        pass
+
+    def do_GET(self):  # type: (...) -> None  # noqa: N802
+        self._before_request()
+        path = self.path.split('?', 1)[0].rstrip('/')
+        session_id = self._get_session_id()
+        if path in ('', '/Stamping'):
+            session = self.tiima.get_session(session_id)
+            if not session:
+                return self._redirect('/Login/')
+            return self._send_html(self.tiima.render_main_page(session))
+        elif path == '/Login':
+            return self._send_html(self.tiima.render_login_page())
+        elif path == '/Logout':
+            self.tiima.logout(session_id)
+            return self._redirect('/Login/', session_id='')
+        elif path == '/_stats':
+            return self._send_json({'requests': self.tiima.request_count})
+        self._send_html('<html><body>Not found</body></html>', status=404)
+
+    def do_POST(self):  # type: (...) -> None  # noqa: N802
+        self._before_request()
+        path = self.path.split('?', 1)[0].rstrip('/')
+        fields = self._read_fields()
+        if path == '/Login':
+            session_id = self.tiima.login(fields)
+            if not session_id:
+                return self._send_html(
+                    self.tiima.render_login_page(failed=True))
+            return self._redirect('/Stamping/', session_id=session_id)
+        elif path == '/Stamping':
+            session = self.tiima.get_session(self._get_session_id())
+            if not session:
+                return self._redirect('/Login/')
+            failure = self.tiima.pick_failure()
+            if failure == 'before':
+                return self._send_html(ERROR_PAGE, status=503)
+            html = self.tiima.handle_action(session, fields)
+            if failure == 'after':
+                return self._send_html(ERROR_PAGE, status=500)
+            return self._send_html(html)
+        self._send_html('<html><body>Not found</body></html>', status=404)
+
+    def _before_request(self):  # type: (...) -> None
+        if self.path.startswith('/_stats'):
+            return
+        self.tiima.request_count += 1
+        if self.tiima.latency:
+            time.sleep(self.tiima.latency)
+
+    def _read_fields(self):  # type: (...) -> Dict[Text, Text]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        # Later values override earlier ones like on the real server
+        return dict(parse_qsl(body, keep_blank_values=True))
+
+    def _get_session_id(self):  # type: (...) -> Optional[Text]
+        cookie = SimpleCookie(self.headers.get('Cookie') or '')
+        morsel = cookie.get('TiimaSession')
+        return morsel.value if morsel else None
+
+    def _redirect(self, location, session_id=None):
+        # type: (Text, Optional[Text]) -> None
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        if session_id is not None:
+            self.send_header(
+                'Set-Cookie', 'TiimaSession={}; Path=/'.format(session_id))
+        self.end_headers()
+
+    def _send_json(self, data):  # type: (Dict[Text, int]) -> None
+        self._send(json.dumps(data).encode('utf-8'), 'application/json')
+
+    def _send_html(self, html, status=200):  # type: (Text, int) -> None
+        self._send(html.encode('utf-8'), 'text/html; charset=utf-8', status)
+
+    def _send(self, body, content_type, status=200):
+        # type: (bytes, Text, int) -> None
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', '{}'.format(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ThreadingHTTPServer(
+        socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class FakeTiimaServer(object):
+    """
+    HTTP server running a FakeTiima instance in a background thread.
+    """
+    def __init__(
+            self,
+            tiima=None,  # type: Optional[FakeTiima]
+            host='127.0.0.1',  # type: Text
+            port=0,  # type: int
+    ):  # type: (...) -> None
+        self.tiima = tiima or FakeTiima()
+        self._host = host
+        self._httpd = _ThreadingHTTPServer((host, port), RequestHandler)
+        self._httpd.tiima = self.tiima  # type: ignore
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def url(self):  # type: (...) -> Text
+        return 'http://{}:{}'.format(self._host, self._httpd.server_port)
+
+    def start(self):  # type: (...) -> FakeTiimaServer
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):  # type: (...) -> None
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):  # type: (...) -> FakeTiimaServer
+        return self.start()
+
+    def __exit__(self, *args):  # type: (object) -> None
+        self.stop()
+
+
+def parse_user(value):  # type: (Text) -> Tuple[Text, Text, Text]
+    parts = value.split(':')
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(
+            'Expected USERNAME:PASSWORD:CUSTOMER, got {!r}'.format(value))
+    return (parts[0], parts[1], parts[2])
+
+
+def parse_date(value):  # type: (Text) -> date
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main(argv=None):  # type: (Optional[Iterable[Text]]) -> None
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='Seconds to sleep before answering each request')
+    parser.add_argument(
+        '--user', type=parse_user, action='append', default=[],
+        metavar='USERNAME:PASSWORD:CUSTOMER')
+    parser.add_argument(
+        '--seed-days', type=int, default=0,
+        help='Fill this many days before today with time blocks')
+    parser.add_argument(
+        '--blocks-per-day', type=int, default=2,
+        help='Number of time blocks on each seeded day')
+    parser.add_argument(
+        '--today', type=parse_date, default=None, metavar='YYYY-MM-DD')
+    parser.add_argument(
+        '--session-timeout', type=float, default=None,
+        help='Expire sessions idle for this many seconds')
+    parser.add_argument(
+        '--error-rate', type=float, default=0.0,
+        help='Fraction of actions failing with a server error')
+    args = parser.parse_args(list(argv) if argv is not None else None)
+
+    tiima = FakeTiima(
+        latency=args.latency, today=args.today,
+        session_timeout=args.session_timeout, error_rate=args.error_rate)
+    for (username, password, customer) in args.user or [
+            ('demo', 'demo', 'demo')]:
+        account = tiima.add_account(username, password, customer)
+        if args.seed_days:
+            tiima.seed(
+                account, tiima.today - timedelta(days=args.seed_days),
+                tiima.today, args.blocks_per_day)
+    server = FakeTiimaServer(tiima, args.host, args.port)
+    print('Serving fake Tiima at {}'.format(server.url))
+    sys.stdout.flush()
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
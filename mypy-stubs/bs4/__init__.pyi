@@ -1,4 +1,4 @@
-from typing import Any, Optional, Protocol, Sequence, TypeVar, Union
+from typing import Any, Mapping, Optional, Protocol, Sequence, TypeVar, Union
 
 from .element import Tag
 
@@ -17,14 +17,25 @@ class BeautifulSoup(Tag):
             self,
             markup: Union[_Str, _Readable[Any]] = ...,
             features: Optional[Union[str, Sequence[str]]] = ...,
+            from_encoding: Optional[str] = ...,
             #
             # The following parameters are unused in this code base
             # and therefore left undefined here:
             #
             # builder: Optional[...] = ...,
             # parse_only: Optional[...] = ...,
-            # from_encoding: Optional[...] = ...,
             # exclude_encodings: Optional[...] = ...,
             # element_classes: Optional[...] = ...,
             # **kwargs: object,
     ) -> None: ...
+
+    def new_tag(
+            self,
+            name: _Str,
+            namespace: Optional[_Str] = ...,
+            nsprefix: Optional[_Str] = ...,
+            attrs: Mapping[str, Any] = ...,
+            sourceline: Optional[int] = ...,
+            sourcepos: Optional[int] = ...,
+            **kwattrs: Any,
+    ) -> Tag: ...
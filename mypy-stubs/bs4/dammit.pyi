@@ -0,0 +1,16 @@
+from typing import Optional, Sequence, Text, Union
+
+_Str = Union[str, bytes]
+
+
+class UnicodeDammit:
+    unicode_markup: Optional[Text]
+
+    def __init__(
+            self,
+            markup: _Str,
+            override_encodings: Sequence[str] = ...,
+            smart_quotes_to: Optional[str] = ...,
+            is_html: bool = ...,
+            # exclude_encodings: Sequence[str] = ...,
+    ) -> None: ...
@@ -1,4 +1,6 @@
 from typing import (
+    Any,
+    Dict,
     Iterable,
     Iterator,
     List,
@@ -33,6 +35,11 @@ class PageElement:
 
 
 class Tag(PageElement):
+    name: _Str
+    attrs: Dict[_Str, Any]
+
+    def has_attr(self, key: _Str) -> bool: ...
+
     @overload
     def get(self, key: _Str) -> Optional[_Str]: ...
 
@@ -74,6 +81,14 @@ class Tag(PageElement):
             # namespaces=None, **kwargs,
     ) -> Optional['Tag']: ...
 
+    def select(
+            self,
+            selector: _Str,
+            # namespaces=None, limit=None, **kwargs,
+    ) -> ResultSet['Tag']: ...
+
+    def append(self, tag: Union[_Str, 'Tag']) -> None: ...
+
     def replace_with(self, replace_with: Union[_Str, 'Tag']) -> 'Tag': ...
 
     def __iter__(self) -> Iterator['Tag']: ...
@@ -14,6 +14,9 @@ class _Response(requests.Response):
 
 
 class Browser:
+    session: requests.Session
+    soup_config: Mapping[_Str, Any]
+
     def __init__(
             self,
             # TODO: Replace Any with Session
@@ -47,6 +50,19 @@ class Browser:
             # *args, **kwargs,
     ) -> _Response: ...
 
+    @staticmethod
+    def add_soup(
+            response: requests.Response,
+            soup_config: Mapping[_Str, Any],
+    ) -> None: ...
+
+    def _request(
+            self,
+            form: bs4.element.Tag,
+            url: Optional[_Str] = ...,
+            **kwargs: Any,
+    ) -> requests.Response: ...
+
     def submit(
             self,
             form: Union[Form, bs4.element.Tag],
@@ -19,6 +19,13 @@ class StatefulBrowser(Browser):
             # **kwargs: ...,
     ) -> _Response: ...
 
+    def open_fake_page(
+            self,
+            page_text: _Str,
+            url: Optional[_Str] = ...,
+            soup_config: Optional[Dict[_Str, Any]] = ...,
+    ) -> None: ...
+
     def open_relative(
             self,
             url: _Str,
@@ -0,0 +1,48 @@
+from __future__ import unicode_literals
+
+import sys
+from datetime import date
+from typing import Iterator, List
+
+import pytest
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import Client
+from tiimaweb.client import Connection
+
+USERNAME = 'user'
+PASSWORD = 'secret'
+CUSTOMER = 'acme'
+TODAY = date(2020, 3, 4)
+
+collect_ignore = []  # type: List[str]
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_aio.py')  # Uses async and await
+
+
+@pytest.fixture
+def tiima():  # type: () -> FakeTiima
+    return FakeTiima(today=TODAY)
+
+
+@pytest.fixture
+def account(tiima):  # type: (FakeTiima) -> Account
+    return tiima.add_account(USERNAME, PASSWORD, CUSTOMER)
+
+
+@pytest.fixture
+def server(tiima, account):
+    # type: (FakeTiima, Account) -> Iterator[FakeTiimaServer]
+    with FakeTiimaServer(tiima) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):  # type: (FakeTiimaServer) -> Client
+    return Client(url=server.url, retry_backoff=0.0)
+
+
+@pytest.fixture
+def connection(client):  # type: (Client) -> Iterator[Connection]
+    with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        yield connection
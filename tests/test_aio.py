@@ -0,0 +1,121 @@
+from __future__ import unicode_literals
+
+import asyncio
+from datetime import date, datetime
+from typing import Awaitable, List, Text, Tuple, TypeVar
+
+import pytest
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import Client
+from tiimaweb.client import LOGIN_REQUEST_COUNT, LOGOUT_REQUEST_COUNT
+from tiimaweb.exceptions import LoginFailed
+from tiimaweb.types import TimeBlock
+
+from .conftest import CUSTOMER, PASSWORD, TODAY, USERNAME
+
+pytest.importorskip('aiohttp')
+
+from tiimaweb.aio import AsyncClient  # noqa: E402 isort:skip
+
+DAY = date(2020, 3, 2)
+
+T = TypeVar('T')
+
+
+def _run(coroutine):  # type: (Awaitable[T]) -> T
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_login_and_get_time_blocks(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    tiima.seed(account, DAY, TODAY)
+
+    async def get_blocks():  # type: () -> Tuple[int, List[TimeBlock]]
+        async with AsyncClient(url=server.url, retry_backoff=0.0) as client:
+            async with await client.login(
+                    USERNAME, PASSWORD, CUSTOMER) as connection:
+                login_request_count = tiima.request_count
+                blocks = await connection.get_time_blocks_of_date(DAY)
+                return (login_request_count, blocks)
+
+    (login_request_count, blocks) = _run(get_blocks())
+
+    assert login_request_count == LOGIN_REQUEST_COUNT
+    assert tiima.request_count == (
+        LOGIN_REQUEST_COUNT + 1 + LOGOUT_REQUEST_COUNT)
+    with Client(url=server.url).login(
+            USERNAME, PASSWORD, CUSTOMER) as connection:
+        assert blocks == connection.get_time_blocks_of_date(DAY)
+    assert [x.reason_code for x in blocks] == ['NTYO', 'LOU', 'NTYO']
+
+
+def test_login_fails_with_wrong_password(
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    async def login():  # type: () -> None
+        async with AsyncClient(url=server.url) as client:
+            await client.login(USERNAME, 'wrong', CUSTOMER)
+
+    with pytest.raises(LoginFailed):
+        _run(login())
+
+
+def test_add_and_delete_time_blocks(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    async def add_and_delete():
+        # type: () -> Tuple[List[TimeBlock], List[TimeBlock]]
+        async with AsyncClient(url=server.url, retry_backoff=0.0) as client:
+            async with await client.login(
+                    USERNAME, PASSWORD, CUSTOMER) as connection:
+                added = await connection.add_time_block(
+                    datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 16), 'Work')
+                await connection.get_time_blocks_of_date(TODAY)
+                [block] = added
+                left = await connection.delete_time_block(block)
+                return (added, left)
+
+    (added, left) = _run(add_and_delete())
+
+    assert [(x.start_time.hour, x.end_time.hour, x.description)
+            for x in added] == [(8, 16, 'Work')]
+    assert left == []
+    assert account.blocks_of_day(DAY) == []
+
+
+def test_sessions_of_many_accounts_run_concurrently(
+        tiima,  # type: FakeTiima
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    accounts = [
+        tiima.add_account('user{}'.format(n), PASSWORD, CUSTOMER)
+        for n in range(5)]
+    for (n, account) in enumerate(accounts):
+        tiima.add_block(
+            account, datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 9 + n))
+
+    async def get_blocks(client, username):
+        # type: (AsyncClient, Text) -> List[TimeBlock]
+        async with await client.login(
+                username, PASSWORD, CUSTOMER) as connection:
+            return await connection.get_time_blocks_of_date(DAY)
+
+    async def get_all():  # type: () -> List[List[TimeBlock]]
+        async with AsyncClient(url=server.url) as client:
+            return await asyncio.gather(*(
+                get_blocks(client, x.username) for x in accounts))
+
+    results = _run(get_all())
+
+    assert [[x.end_time.hour for x in blocks] for blocks in results] == [
+        [9], [10], [11], [12], [13]]
@@ -0,0 +1,135 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+
+import pytest
+
+from benchmarks.fakeserver import (
+    LUNCH_REASON_CODE,
+    NORMAL_REASON_CODE,
+    Account,
+    FakeTiima,
+    FakeTiimaServer,
+)
+from tiimaweb import Client
+from tiimaweb.client import Connection
+
+from .conftest import CUSTOMER, PASSWORD, TODAY, USERNAME
+
+DAY = date(2020, 3, 2)
+
+NEW_BLOCKS = [
+    (datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 12), 'A'),
+    (datetime(2020, 3, 4, 8), datetime(2020, 3, 4, 9), 'B'),
+    (datetime(2020, 3, 2, 12, 30), datetime(2020, 3, 2, 16, 30), 'C'),
+    (datetime(2020, 3, 4, 9), datetime(2020, 3, 4, 10), 'D'),
+]
+
+
+@pytest.mark.parametrize('optimistic,request_count', [
+    # TODAY: 2 * (edit_open, save).  DAY: select, temporary lunch
+    # (edit_open, save), 2 * (edit_open, save) and delete of the lunch.
+    (False, 12),
+    # The same without the edit_opens
+    (True, 7),
+])
+def test_add_time_blocks_groups_by_date(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        optimistic,  # type: bool
+        request_count,  # type: int
+):  # type: (...) -> None
+    client = Client(url=server.url, optimistic=optimistic)
+    with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        server_request_count = tiima.request_count
+
+        result = connection.add_time_blocks(NEW_BLOCKS)
+
+        assert tiima.request_count - server_request_count == request_count
+    assert result.request_count == request_count
+    # Adding one by one would select a date for each block
+    assert result.requests_saved == 3
+    assert list(result.time_blocks) == [TODAY, DAY]
+    assert [x.description for x in result.time_blocks[DAY]] == ['A', 'C']
+    assert [x.description for x in result.time_blocks[TODAY]] == ['B', 'D']
+    assert [x.description for x in account.blocks_of_day(DAY)] == ['A', 'C']
+    assert not any(
+        x.reason_code == LUNCH_REASON_CODE
+        for x in account.blocks_of_day(DAY))
+
+
+def test_add_time_blocks_of_nothing(connection):
+    # type: (Connection) -> None
+    result = connection.add_time_blocks([])
+    assert (result.time_blocks, result.request_count) == ({}, 0)
+
+
+def test_delete_time_blocks_chains_deletes_of_each_date(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, date(2020, 3, 3))
+    blocks = (
+        connection.get_time_blocks_of_date(DAY) +
+        connection.get_time_blocks_of_date(date(2020, 3, 3)))
+    request_count = tiima.request_count
+
+    result = connection.delete_time_blocks(blocks)
+
+    # 2020-03-03 is selected: 3 deletes, then 2020-03-02: select and
+    # 3 deletes.  One by one, 2020-03-02 would be selected first and
+    # 2020-03-03 again after it.
+    assert tiima.request_count - request_count == 7
+    assert (result.request_count, result.requests_saved) == (7, 1)
+    assert result.time_blocks == {DAY: [], date(2020, 3, 3): []}
+    assert account.blocks == {DAY: [], date(2020, 3, 3): []}
+
+
+def test_delete_time_blocks_of_nothing(
+        tiima,  # type: FakeTiima
+        connection,  # type: Connection
+):  # type: (...) -> None
+    request_count = tiima.request_count
+
+    result = connection.delete_time_blocks([])
+
+    assert tiima.request_count == request_count
+    assert result == ({}, 0, 0)
+
+
+def test_clear_day_deletes_only_given_reason_codes(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+
+    result = connection.clear_day(DAY, ['LOU'])
+
+    assert result.request_count == 2  # Select and delete
+    assert [x.reason_code for x in result.time_blocks[DAY]] == [
+        'NTYO', 'NTYO']
+    assert [x.reason_code for x in account.blocks_of_day(DAY)] == [
+        NORMAL_REASON_CODE, NORMAL_REASON_CODE]
+
+
+def test_clear_range_skips_dates_without_blocks(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    tiima.seed(account, date(2020, 3, 6), date(2020, 3, 6))
+    request_count = tiima.request_count
+
+    result = connection.clear_range(DAY, date(2020, 3, 8))
+
+    # Totals, then select and 3 deletes for both dates with blocks
+    assert tiima.request_count - request_count == 9
+    assert list(result.time_blocks) == [DAY, date(2020, 3, 6)]
+    # One by one: 6 selects (not of the selected 2020-03-04) and deletes
+    assert (result.request_count, result.requests_saved) == (9, 3)
+    assert account.blocks_of_day(DAY) == []
+    assert account.blocks_of_day(date(2020, 3, 6)) == []
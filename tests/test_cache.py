@@ -0,0 +1,81 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime, timedelta
+from typing import List
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import Client
+from tiimaweb.cache import DayCache
+
+from .conftest import CUSTOMER, PASSWORD, TODAY, USERNAME
+
+DAY = date(2020, 3, 2)
+
+
+def test_day_cache_evicts_least_recently_used():  # type: () -> None
+    cache = DayCache(max_days=2)
+    cache.put(DAY, [])
+    cache.put(DAY + timedelta(days=1), [])
+    assert cache.get(DAY) == []
+    cache.put(DAY + timedelta(days=2), [])
+    assert cache.get(DAY) == []
+    assert cache.get(DAY + timedelta(days=1)) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_day_cache_expires_entries():  # type: () -> None
+    now = [100.0]  # type: List[float]
+    cache = DayCache(ttl=10, clock=(lambda: now[0]))
+    cache.put(DAY, [])
+    now[0] += 10
+    assert cache.get(DAY) == []
+    now[0] += 1
+    assert cache.get(DAY) is None
+
+
+def test_day_cache_disabled():  # type: () -> None
+    cache = DayCache(max_days=0)
+    cache.put(DAY, [])
+    assert not cache.enabled
+    assert cache.get(DAY) is None
+
+
+def test_cached_date_is_fetched_again_after_invalidate(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    client = Client(url=server.url, cache_max_days=None)
+    with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        blocks = connection.get_time_blocks_of_date(DAY)
+        requests_before = tiima.request_count
+        assert connection.get_time_blocks_of_date(DAY) == blocks
+        assert tiima.request_count == requests_before
+
+        tiima.add_block(
+            account, datetime(2020, 3, 2, 17), datetime(2020, 3, 2, 18))
+        assert connection.get_time_blocks_of_date(DAY) == blocks
+        connection.cache.invalidate(DAY)
+        assert len(connection.get_time_blocks_of_date(DAY)) == (
+            len(blocks) + 1)
+        assert tiima.request_count == requests_before + 1
+
+
+def test_delete_selects_date_of_cached_block(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    client = Client(url=server.url, cache_max_days=None)
+    with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        block = connection.get_time_blocks_of_date(DAY)[0]
+        connection.cache.invalidate(TODAY)
+        connection.get_time_blocks_of_date(TODAY)
+
+        blocks = connection.delete_time_block(block)
+
+        assert block not in blocks
+        assert connection.current_date == DAY
+    assert len(account.blocks_of_day(DAY)) == 2
@@ -0,0 +1,111 @@
+from __future__ import unicode_literals
+
+import io
+import json
+from datetime import date
+from typing import Any, List
+
+import pytest
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import cli
+
+from .conftest import CUSTOMER, PASSWORD, USERNAME
+
+DAY = date(2020, 3, 2)
+
+
+@pytest.fixture(autouse=True)
+def credentials(monkeypatch):  # type: (Any) -> None
+    monkeypatch.setenv('TIIMAWEB_USERNAME', USERNAME)
+    monkeypatch.setenv('TIIMAWEB_PASSWORD', PASSWORD)
+    monkeypatch.setenv('TIIMAWEB_CUSTOMER', CUSTOMER)
+    monkeypatch.delenv('TIIMAWEB_CREDENTIALS_FILE', raising=False)
+    monkeypatch.delenv('TIIMAWEB_SESSION_FILE', raising=False)
+
+
+def _write(tmpdir, name, lines):  # type: (Any, str, List[str]) -> str
+    path = '{}'.format(tmpdir.join(name))
+    with io.open(path, 'w', encoding='utf-8') as fp:
+        fp.write(''.join(x + '\n' for x in lines))
+    return path
+
+
+def test_apply_syncs_dates_of_batch_file(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        tmpdir,  # type: Any
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    path = _write(tmpdir, 'blocks.csv', [
+        'start_time,end_time,description',
+        '2020-03-02T09:00,2020-03-02T10:00,Meeting',
+    ])
+
+    cli.main(['--url', server.url, 'apply', path])
+
+    assert [x.description for x in account.blocks_of_day(DAY)] == ['Meeting']
+
+
+@pytest.mark.parametrize('options', [[], ['--start', '2020-03-02']])
+def test_apply_refuses_empty_batch_without_range(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        tmpdir,  # type: Any
+        options,  # type: List[str]
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    path = _write(tmpdir, 'blocks.jsonl', [])
+
+    with pytest.raises(SystemExit) as excinfo:
+        cli.main(['--url', server.url, 'apply', path] + options)
+
+    assert 'give both --start and --end' in '{}'.format(excinfo.value)
+    assert len(account.blocks_of_day(DAY)) == 3
+
+
+def test_apply_empty_batch_clears_range(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        tmpdir,  # type: Any
+):  # type: (...) -> None
+    tiima.seed(account, DAY, date(2020, 3, 3))
+    path = _write(tmpdir, 'blocks.jsonl', [])
+
+    cli.main([
+        '--url', server.url, 'apply', path,
+        '--start', '2020-03-02', '--end', '2020-03-02'])
+
+    assert account.blocks_of_day(DAY) == []
+    assert len(account.blocks_of_day(date(2020, 3, 3))) == 3
+
+
+def test_fleet_runs_job_file(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        tmpdir,  # type: Any
+        capsys,  # type: Any
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    path = _write(tmpdir, 'jobs.json', [json.dumps({
+        'url': server.url,
+        'accounts': [{
+            'username': USERNAME,
+            'password': PASSWORD,
+            'customer': CUSTOMER,
+            'operations': [
+                {'op': 'totals', 'start': '2020-03-02', 'end': '2020-03-02'},
+            ],
+        }],
+    })])
+
+    cli.main(['fleet', path, '--processes', '1'])
+
+    [line] = capsys.readouterr().out.splitlines()
+    result = json.loads(line)
+    assert result['error'] is None
+    assert result['results'][0]['days'][0]['duration'] == 450
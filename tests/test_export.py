@@ -0,0 +1,131 @@
+from __future__ import unicode_literals
+
+import csv
+import json
+from datetime import date, datetime
+from typing import Any, Iterator, List, Text
+
+import pytest
+import pytz
+import six
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import cli
+from tiimaweb.export import FIELDS, WRITERS, write_csv, write_jsonl
+from tiimaweb.types import TimeBlock
+
+from .conftest import CUSTOMER, PASSWORD, USERNAME
+
+TZ = pytz.timezone('Europe/Helsinki')
+
+BLOCKS = [
+    TimeBlock(
+        id='1001',
+        start_time=TZ.localize(datetime(2020, 3, 2, 8)),
+        end_time=TZ.localize(datetime(2020, 3, 2, 11, 45)),
+        reason_code='NTYO',
+        reason_text='Normal working time',
+        status='Approved',
+        description='Työ, "tärkeä"'),
+    TimeBlock(
+        id='1002',
+        start_time=TZ.localize(datetime(2020, 3, 2, 22)),
+        end_time=TZ.localize(datetime(2020, 3, 3, 1, 30)),
+        reason_code='LOU',
+        reason_text='Lunch',
+        status='Approved',
+        description=''),
+]
+
+
+def _stream(blocks):  # type: (List[TimeBlock]) -> Iterator[TimeBlock]
+    for block in blocks:
+        yield block
+
+
+def _get_text(fp):  # type: (Any) -> Text
+    value = fp.getvalue()
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def test_write_csv():  # type: () -> None
+    fp = six.StringIO()
+
+    count = write_csv(_stream(BLOCKS), fp)
+
+    assert count == 2
+    assert _get_text(fp).splitlines() == [
+        'id,start_time,end_time,duration,reason_code,reason_text,'
+        'status,description',
+        '1001,2020-03-02T08:00:00+02:00,2020-03-02T11:45:00+02:00,225,'
+        'NTYO,Normal working time,Approved,"Työ, ""tärkeä"""',
+        '1002,2020-03-02T22:00:00+02:00,2020-03-03T01:30:00+02:00,210,'
+        'LOU,Lunch,Approved,',
+    ]
+
+
+def test_write_jsonl():  # type: () -> None
+    fp = six.StringIO()
+
+    count = write_jsonl(_stream(BLOCKS), fp)
+
+    lines = _get_text(fp).splitlines()
+    assert count == 2
+    assert lines[0] == (
+        '{"id": "1001", "start_time": "2020-03-02T08:00:00+02:00", '
+        '"end_time": "2020-03-02T11:45:00+02:00", "duration": 225, '
+        '"reason_code": "NTYO", "reason_text": "Normal working time", '
+        '"status": "Approved", "description": "Työ, \\"tärkeä\\""}')
+    assert [list(json.loads(x)) for x in lines] == [FIELDS, FIELDS]
+    assert json.loads(lines[1])['duration'] == 210
+
+
+@pytest.mark.parametrize('name', sorted(WRITERS))
+def test_writers_write_nothing_but_header_for_no_blocks(
+        name,  # type: Text
+):  # type: (...) -> None
+    fp = six.StringIO()
+
+    count = WRITERS[name]([], fp)
+
+    assert count == 0
+    header = ','.join(FIELDS) + '\r\n'
+    assert _get_text(fp) == (header if name == 'csv' else '')
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'jsonl'])
+def test_export_command(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        capsys,  # type: Any
+        monkeypatch,  # type: Any
+        export_format,  # type: Text
+):  # type: (...) -> None
+    monkeypatch.setenv('TIIMAWEB_USERNAME', USERNAME)
+    monkeypatch.setenv('TIIMAWEB_PASSWORD', PASSWORD)
+    monkeypatch.setenv('TIIMAWEB_CUSTOMER', CUSTOMER)
+    monkeypatch.delenv('TIIMAWEB_CREDENTIALS_FILE', raising=False)
+    monkeypatch.delenv('TIIMAWEB_SESSION_FILE', raising=False)
+    tiima.seed(account, date(2020, 3, 2), date(2020, 3, 3))
+
+    cli.main([
+        '--url', server.url, 'export', export_format,
+        '2020-03-02', '2020-03-03'])
+
+    (out, err) = capsys.readouterr()
+    if export_format == 'csv':
+        rows = [dict(zip(FIELDS, x)) for x in csv.reader(out.splitlines())]
+        assert rows[0] == dict(zip(FIELDS, FIELDS))
+        rows = rows[1:]
+    else:
+        rows = [json.loads(x) for x in out.splitlines()]
+    assert err == 'Exported 6 time blocks\n'
+    assert [(x['start_time'][:16], x['reason_code']) for x in rows] == [
+        ('2020-03-02T08:00', 'NTYO'),
+        ('2020-03-02T11:45', 'LOU'),
+        ('2020-03-02T12:15', 'NTYO'),
+        ('2020-03-03T08:00', 'NTYO'),
+        ('2020-03-03T11:45', 'LOU'),
+        ('2020-03-03T12:15', 'NTYO'),
+    ]
@@ -0,0 +1,96 @@
+from __future__ import unicode_literals
+
+from datetime import date
+from typing import Any, Dict, List, Text
+
+import pytest
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import fleet
+from tiimaweb.client import FAILED_LOGIN_REQUEST_COUNT
+from tiimaweb.fleet import Fleet
+from tiimaweb.types import AccountJob
+
+from .conftest import CUSTOMER, PASSWORD, USERNAME
+
+DAY = date(2020, 3, 2)
+
+
+def _make_job(
+        server,  # type: FakeTiimaServer
+        operations,  # type: List[Dict[Text, Any]]
+        password=PASSWORD,  # type: Text
+):  # type: (...) -> AccountJob
+    return AccountJob(
+        url=server.url,
+        username=USERNAME,
+        password=password,
+        customer=CUSTOMER,
+        operations=operations)
+
+
+def test_request_count_includes_login_and_logout(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    operation = {
+        'op': 'fetch_range', 'start': '2020-03-02', 'end': '2020-03-03'}
+    request_count = tiima.request_count
+
+    report = Fleet(processes=1).run([_make_job(server, [operation])])
+
+    [result] = report.results
+    assert result.error is None
+    assert len(result.results[0]['time_blocks']) == 3
+    assert result.request_count == tiima.request_count - request_count
+
+
+def test_request_count_includes_failed_login(
+        tiima,  # type: FakeTiima
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    request_count = tiima.request_count
+
+    report = Fleet(processes=1).run([
+        _make_job(server, [], password='wrong')])
+
+    [result] = report.results
+    assert result.error == 'LoginFailed: Login failed'
+    assert result.request_count == tiima.request_count - request_count
+    assert result.request_count == FAILED_LOGIN_REQUEST_COUNT
+
+
+@pytest.mark.parametrize('option', [
+    'max_accounts_per_url', 'max_accounts_per_customer'])
+def test_account_caps_below_one_are_rejected(
+        option,  # type: str
+):  # type: (...) -> None
+    options = {option: 0}  # type: Dict[str, Any]
+    with pytest.raises(ValueError):
+        Fleet(**options)
+    options[option] = 1
+    Fleet(**options)
+
+
+def test_failed_accounts_do_not_stop_the_others(
+        server,  # type: FakeTiimaServer
+        monkeypatch,  # type: Any
+):  # type: (...) -> None
+    monkeypatch.setattr(fleet, 'POLL_INTERVAL', 0.01)
+    unpicklable = {
+        'op': 'totals', 'start': '2020-03-02', 'end': '2020-03-02',
+        'key': (lambda: None)}
+    jobs = [
+        _make_job(server, [unpicklable]),
+        _make_job(server, [], password='wrong'),
+        _make_job(server, []),
+    ]
+
+    report = Fleet(processes=2).run(jobs)
+
+    assert [x.error is not None for x in report.results] == [
+        True, True, False]
+    assert report.results[1].request_count == FAILED_LOGIN_REQUEST_COUNT
+    assert report.results[2].request_count > 0
@@ -0,0 +1,66 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Text, Tuple
+
+import pytest
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import Client
+from tiimaweb.types import DaySummary, TimeBlock
+
+from .conftest import CUSTOMER, PASSWORD, TODAY, USERNAME
+
+START = date(2020, 3, 2)
+END = date(2020, 3, 6)
+
+_Results = Tuple[List[DaySummary], List[List[TimeBlock]], List[TimeBlock]]
+
+
+def _run(client, tiima):  # type: (Client, FakeTiima) -> _Results
+    with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        totals = connection.get_totals_range(START, END)
+        days = [START + timedelta(days=n) for n in range(5)]
+        blocks = [connection.get_time_blocks_of_date(x) for x in days]
+        tiima.expire_sessions()  # Lean connections log in again too
+        changed = connection.add_time_block(
+            datetime(2020, 3, 3, 17), datetime(2020, 3, 3, 18), 'Extra')
+        [extra] = [x for x in changed if x.description == 'Extra']
+        connection.delete_time_block(extra)
+        return (totals, blocks, changed)
+
+
+@pytest.mark.parametrize('parser', [None, 'fragment'])
+def test_lean_mode_gives_same_results_as_normal_mode(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        parser,  # type: Optional[Text]
+):  # type: (...) -> None
+    tiima.seed(account, START, TODAY)
+
+    normal = _run(Client(url=server.url, parser=parser), tiima)
+    lean = _run(Client(url=server.url, parser=parser, lean=True), tiima)
+
+    assert lean[0] == normal[0]
+    assert lean[1] == normal[1]
+    # The ids of the added blocks differ
+    assert [x[1:] for x in lean[2]] == [x[1:] for x in normal[2]]
+    assert len(account.blocks_of_day(date(2020, 3, 3))) == 3
+
+
+def test_lean_connection_drops_responses(
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    client = Client(url=server.url, lean=True, debug_history=2)
+    with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        for n in range(3):
+            connection.get_time_blocks_of_date(START + timedelta(days=n))
+
+        page = connection.browser.get_current_page()
+        assert connection._last_response is None
+        assert page is not None
+        assert page.find('form') is None
+        assert page.find('a', id='Logout') is not None
+        assert [x.action for x in connection.debug_history] == [
+            'action_select_date', 'action_select_date']
@@ -0,0 +1,126 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from benchmarks.fakeserver import (
+    LUNCH_REASON_CODE,
+    Account,
+    FakeTiima,
+    FakeTiimaServer,
+)
+from tiimaweb import Client
+from tiimaweb.client import Connection
+from tiimaweb.mirror import Mirror
+
+from .conftest import CUSTOMER, PASSWORD, USERNAME
+
+START = date(2020, 3, 2)
+END = date(2020, 3, 6)
+
+
+def _open_mirror(tmpdir):  # type: (Any) -> Mirror
+    return Mirror(str(tmpdir.join('tiima.sqlite')))
+
+
+def test_sync_fetches_only_changed_dates(
+        tmpdir,  # type: Any
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, START, date(2020, 3, 4))
+    with _open_mirror(tmpdir) as mirror:
+        result = mirror.sync(connection, START, END)
+        assert result.checked_days == 5
+        assert result.fetched_days == 3
+
+        result = mirror.sync(connection, START, END)
+        assert result.fetched_days == 0
+        # Only the calendar totals are fetched
+        assert result.request_count == 1
+
+        tiima.add_block(
+            account, datetime(2020, 3, 6, 8), datetime(2020, 3, 6, 9))
+        result = mirror.sync(connection, START, END)
+        assert result.fetched_days == 1
+
+        result = mirror.sync(connection, START, END, force=True)
+        assert result.fetched_days == 5
+
+        assert [x.day for x in mirror.get_day_summaries(START, END)] == [
+            START + timedelta(days=n) for n in range(5)]
+        assert mirror.get_total_duration(START, END) == timedelta(
+            hours=(3 * 7.5 + 1))
+
+
+def test_sync_invalidates_cached_dates(
+        tmpdir,  # type: Any
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    tiima.add_block(account, datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 9))
+    client = Client(url=server.url, cache_max_days=None)
+    with _open_mirror(tmpdir) as mirror, \
+            client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        mirror.sync(connection, START, END)
+        connection.get_time_blocks_of_date(START)
+        tiima.add_block(
+            account, datetime(2020, 3, 2, 10), datetime(2020, 3, 2, 11))
+
+        result = mirror.sync(connection, START, END)
+
+        assert result.fetched_days == 1
+        assert len(mirror.get_time_blocks(START, START)) == 2
+
+
+def test_query_time_blocks(
+        tmpdir,  # type: Any
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, START, date(2020, 3, 3), blocks_per_day=1)
+    tiima.add_block(
+        account, datetime(2020, 3, 3, 12), datetime(2020, 3, 3, 12, 30),
+        reason_code=LUNCH_REASON_CODE)
+    with _open_mirror(tmpdir) as mirror:
+        mirror.sync(connection, START, END)
+
+        blocks = mirror.get_time_blocks(START, END)
+        lunches = mirror.get_time_blocks(START, END, reason_codes=['LOU'])
+        by_date = mirror.get_time_blocks_by_date(START, END)
+
+    assert [x.start_time.date() for x in blocks] == [
+        START, date(2020, 3, 3), date(2020, 3, 3)]
+    assert [(x.start_time.hour, x.reason_code) for x in lunches] == [
+        (12, 'LOU')]
+    assert str(blocks[0].start_time.tzinfo) == 'Europe/Helsinki'
+    assert sorted(by_date) == [START, date(2020, 3, 3)]
+    assert len(by_date[date(2020, 3, 3)]) == 2
+
+
+def test_block_crossing_midnight_is_grouped_by_synced_date(
+        tmpdir,  # type: Any
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    block = tiima.add_block(
+        account, datetime(2020, 3, 2, 22), datetime(2020, 3, 3, 2))
+    # Tiima shows the block on both of the dates it is on
+    account.blocks.setdefault(date(2020, 3, 3), []).append(block)
+    with _open_mirror(tmpdir) as mirror:
+        mirror.sync(connection, START, END)
+
+        by_date = mirror.get_time_blocks_by_date(START, END)
+        blocks = mirror.get_time_blocks(START, END)
+        second_day = mirror.get_time_blocks_by_date(
+            date(2020, 3, 3), date(2020, 3, 3))
+
+    assert sorted(by_date) == [START, date(2020, 3, 3)]
+    assert by_date[START] == by_date[date(2020, 3, 3)]
+    assert len(blocks) == 1
+    assert list(second_day) == [date(2020, 3, 3)]
+    assert second_day[date(2020, 3, 3)][0].start_time.date() == START
@@ -0,0 +1,93 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import Client
+from tiimaweb.client import Connection
+
+from .conftest import CUSTOMER, PASSWORD, TODAY, USERNAME
+
+DAY = date(2020, 3, 2)
+
+
+def _login(server):  # type: (FakeTiimaServer) -> Connection
+    client = Client(url=server.url, optimistic=True, cache_max_days=None)
+    return client.login(USERNAME, PASSWORD, CUSTOMER)
+
+
+def test_add_trusts_page_showing_the_change(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    with _login(server) as connection:
+        request_count = tiima.request_count
+        blocks = connection.add_time_block(
+            datetime(2020, 3, 4, 9), datetime(2020, 3, 4, 10))
+        assert tiima.request_count == request_count + 1
+    assert len(blocks) == 1
+    assert len(account.blocks_of_day(TODAY)) == 1
+
+
+def test_add_falls_back_to_opening_edit_panel(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    tiima.strict_edit_panel = True
+    with _login(server) as connection:
+        request_count = tiima.request_count
+        connection.add_time_block(
+            datetime(2020, 3, 4, 9), datetime(2020, 3, 4, 10))
+        # action_save, action_edit_open and action_save
+        assert tiima.request_count == request_count + 3
+        request_count = tiima.request_count
+        connection.add_time_block(
+            datetime(2020, 3, 4, 10), datetime(2020, 3, 4, 11))
+        assert tiima.request_count == request_count + 2
+    assert len(account.blocks_of_day(TODAY)) == 2
+
+
+def test_change_on_other_date_selects_it_once(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    with _login(server) as connection:
+        request_count = tiima.request_count
+        [block] = connection.add_time_block(
+            datetime(2020, 3, 2, 9), datetime(2020, 3, 2, 10))
+        assert tiima.request_count == request_count + 2
+        connection.cache.invalidate(TODAY)
+        connection.get_time_blocks_of_date(TODAY)
+
+        request_count = tiima.request_count
+        assert connection.delete_time_block(block) == []
+        assert tiima.request_count == request_count + 2
+    assert account.blocks_of_day(DAY) == []
+
+
+def test_delete_on_other_date_is_checked_from_server(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    with _login(server) as connection:
+        [block, _lunch, _block] = connection.get_time_blocks_of_date(DAY)
+        connection.cache.invalidate(TODAY)
+        connection.get_time_blocks_of_date(TODAY)
+        tiima.add_block(
+            account, datetime(2020, 3, 2, 17), datetime(2020, 3, 2, 18))
+        request_count = tiima.request_count
+
+        blocks = connection.delete_time_block(block)
+
+        assert tiima.request_count == request_count + 2
+
+        assert connection.current_date == DAY
+        assert len(blocks) == 3
+        assert block not in blocks
+        assert connection.get_time_blocks_of_date(DAY) == blocks
+    assert len(account.blocks_of_day(DAY)) == 3
@@ -0,0 +1,114 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+import pytest
+import requests
+from bs4 import BeautifulSoup
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer, Session
+from tiimaweb import Client
+from tiimaweb.parsing import FragmentParser, SoupParser
+from tiimaweb.types import DaySummary, HtmlResponse, TimeBlock
+
+from .conftest import CUSTOMER, PASSWORD, TODAY, USERNAME
+
+START = date(2020, 3, 2)
+END = date(2020, 3, 6)
+
+FRAGMENT_ELEMENTS = [
+    ('selected_date', {'name': 'input',
+                       'attrs': {'name': 'SelectedStampingDate'}}),
+    ('calendar', {'id': 'CalendarStrip'}),
+    ('time_blocks', {'class_': 'stamping_realized_stamp_scroll_box'}),
+]
+
+
+class CountingFragmentParser(FragmentParser):
+    def __init__(self):  # type: () -> None
+        super(CountingFragmentParser, self).__init__()
+        self.decode_count = 0
+
+    def decode(
+            self,
+            content,  # type: bytes
+            encoding,  # type: Optional[str]
+    ):  # type: (...) -> Text
+        self.decode_count += 1
+        return super(CountingFragmentParser, self).decode(content, encoding)
+
+
+def _seed(tiima, account):  # type: (FakeTiima, Account) -> None
+    tiima.seed(account, START, END)
+    tiima.add_block(
+        account, datetime(2020, 3, 4, 22), datetime(2020, 3, 5, 1, 30),
+        description='Night <& "shift">')
+
+
+def _make_response(tiima, account):
+    # type: (FakeTiima, Account) -> requests.Response
+    response = requests.Response()
+    response._content = tiima.render_main_page(
+        Session(account, TODAY)).encode('utf-8')
+    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    response.encoding = 'utf-8'
+    return response
+
+
+@pytest.mark.parametrize('fragment,find_args', FRAGMENT_ELEMENTS)
+def test_fragment_matches_element_of_full_soup(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        fragment,  # type: Text
+        find_args,  # type: Dict[Text, Any]
+):  # type: (...) -> None
+    _seed(tiima, account)
+    response = _make_response(tiima, account)
+    full = HtmlResponse.from_response(response, SoupParser())
+    page = HtmlResponse.from_response(response, FragmentParser())
+
+    expected = full.soup.find(**find_args)
+    soup = page.fragment(fragment)
+
+    assert expected is not None
+    assert str(soup.find(**find_args)) == str(expected)
+    assert page._soup is None  # The whole page was not parsed
+
+
+def test_page_is_decoded_once_for_all_fragments(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+):  # type: (...) -> None
+    parser = CountingFragmentParser()
+    page = HtmlResponse.from_response(_make_response(tiima, account), parser)
+
+    soups = [page.fragment(name) for (name, _) in FRAGMENT_ELEMENTS]
+
+    assert parser.decode_count == 1
+    assert all(isinstance(x, BeautifulSoup) for x in soups)
+
+
+@pytest.mark.parametrize('parser', ['soup', 'fragment'])
+def test_parsers_give_same_results_as_default(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        parser,  # type: Text
+):  # type: (...) -> None
+    _seed(tiima, account)
+
+    def fetch(client):
+        # type: (Client) -> Tuple[List[DaySummary], List[List[TimeBlock]]]
+        with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+            days = [START + timedelta(days=n) for n in range(5)]
+            return (
+                connection.get_totals_range(START, END),
+                [connection.get_time_blocks_of_date(x) for x in days])
+
+    expected = fetch(Client(url=server.url))
+    result = fetch(Client(url=server.url, parser=parser))
+
+    assert result == expected
+    # The block crossing midnight is shown on the date it starts on
+    assert expected[1][2][-1].description == 'Night <& "shift">'
@@ -0,0 +1,55 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from benchmarks.fakeserver import FakeTiima
+from tiimaweb import Client, SessionPool
+from tiimaweb.client import LOGIN_REQUEST_COUNT, Connection
+from tiimaweb.exceptions import LoginFailed
+
+from .conftest import CUSTOMER, PASSWORD, USERNAME
+
+
+class CountingRateLimiter(object):
+    def __init__(self):  # type: () -> None
+        self.count = 0
+
+    def wait(self):  # type: () -> None
+        self.count += 1
+
+
+def test_open_logs_out_sessions_when_a_login_fails(tiima, client):
+    # type: (FakeTiima, Client) -> None
+    login = client.login
+    calls = []
+
+    def failing_login(username, password, customer):
+        # type: (str, str, str) -> Connection
+        calls.append(username)
+        if len(calls) == 2:
+            raise LoginFailed('Login failed')
+        return login(username, password, customer)
+
+    client.login = failing_login  # type: ignore
+    pool = SessionPool(client, USERNAME, PASSWORD, CUSTOMER, size=3)
+    with pytest.raises(LoginFailed):
+        pool.open()
+    assert len(calls) == 3
+    assert tiima.sessions == {}
+    assert pool.connections == []
+
+
+def test_open_waits_for_each_login_request(tiima, client):
+    # type: (FakeTiima, Client) -> None
+    limiter = CountingRateLimiter()
+    pool = SessionPool(client, USERNAME, PASSWORD, CUSTOMER, size=2)
+    pool.rate_limiter = limiter  # type: ignore
+    requests_before = tiima.request_count
+    pool.open()
+    assert limiter.count == tiima.request_count - requests_before
+    assert limiter.count == 2 * LOGIN_REQUEST_COUNT
+    requests_before = tiima.request_count
+    pool.close()
+    assert limiter.count - 2 * LOGIN_REQUEST_COUNT == (
+        tiima.request_count - requests_before)
+    assert tiima.sessions == {}
@@ -0,0 +1,58 @@
+from __future__ import unicode_literals
+
+from datetime import date
+from typing import Any
+
+from benchmarks.fakeserver import Account, FakeTiima, FakeTiimaServer
+from tiimaweb import Client
+from tiimaweb.recording import Recorder, Replay, Scrubber
+
+from .conftest import CUSTOMER, PASSWORD, USERNAME
+
+DAY = date(2020, 3, 2)
+
+
+def test_scrubber_replaces_only_id_field_values():  # type: () -> None
+    scrubber = Scrubber(secrets=['acme'])
+    page = (
+        '<input type="hidden" id="SelectedRowStampId" value="2020"/>'
+        '<input name="EmployeeId" type="hidden" value=\'42\'/>'
+        '<input name="PageId" type="hidden" value="42"/>'
+        '<div class="calendar_day_of_month">2020</div>'
+        '<div class="calendar_date_hours">42:00</div>'
+        '<p>acme</p>')
+
+    assert scrubber.scrub_text(page) == (
+        '<input type="hidden" id="SelectedRowStampId" value="1"/>'
+        '<input name="EmployeeId" type="hidden" value="2"/>'
+        '<input name="PageId" type="hidden" value="42"/>'
+        '<div class="calendar_day_of_month">2020</div>'
+        '<div class="calendar_date_hours">42:00</div>'
+        '<p>REDACTED</p>')
+    assert scrubber.scrub_params({
+        'SelectedRowStampId': '2020', 'EditStampId': '0', 'Text': '2020',
+    }) == {'SelectedRowStampId': '1', 'EditStampId': '0', 'Text': '2020'}
+
+
+def test_recorded_pages_keep_dates_and_totals(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        server,  # type: FakeTiimaServer
+        tmpdir,  # type: Any
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    for (n, block) in enumerate(account.blocks_of_day(DAY)):
+        block.id = 2 + n  # Ids which are also day numbers
+    path = '{}'.format(tmpdir.join('tiima.jsonl'))
+    recorder = Recorder(path, secrets=[PASSWORD])
+    client = Client(url=server.url, transport=recorder)
+    with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+        blocks = connection.get_time_blocks_of_date(DAY)
+        totals = connection.get_totals_list(DAY)
+    assert all('{}'.format(x.id) in recorder.scrubber.ids for x in blocks)
+
+    with Replay(path).connect() as replayed:
+        replayed_blocks = replayed.get_time_blocks_of_date(DAY)
+        assert replayed.get_totals_list(DAY) == totals
+    assert [(x.start_time, x.end_time) for x in replayed_blocks] == [
+        (x.start_time, x.end_time) for x in blocks]
@@ -0,0 +1,42 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime, timedelta
+
+from benchmarks.fakeserver import LUNCH_REASON_CODE, Account, FakeTiima
+from tiimaweb.client import Connection
+from tiimaweb.report import build_report
+
+DAY = date(2020, 3, 2)
+
+
+def test_rows_have_durations_by_reason_code(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.add_block(
+        account, datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 11, 30))
+    tiima.add_block(
+        account, datetime(2020, 3, 2, 11, 30), datetime(2020, 3, 2, 12),
+        LUNCH_REASON_CODE)
+    tiima.add_block(
+        account, datetime(2020, 3, 3, 8), datetime(2020, 3, 3, 10))
+
+    report = build_report(connection, DAY, date(2020, 3, 8))
+
+    [first, second] = report.get_rows('day')
+    assert first.by_reason_code == {
+        'NTYO': timedelta(hours=3, minutes=30),
+        'LOU': timedelta(minutes=30)}
+    assert first.work == timedelta(hours=3, minutes=30)
+    assert second.by_reason_code == {'NTYO': timedelta(hours=2)}
+    [week] = report.get_rows('week')
+    assert week.by_reason_code == {
+        'NTYO': timedelta(hours=5, minutes=30),
+        'LOU': timedelta(minutes=30)}
+    assert '{}'.format(week) == (
+        '2020-W10 work 5:30 lunch 0:30 overtime 0:00 (LOU 0:30, NTYO 5:30)')
+
+    report.remove(connection.get_time_blocks_of_date(DAY)[1])
+    assert report.get_rows('day')[0].by_reason_code == {
+        'NTYO': timedelta(hours=3, minutes=30)}
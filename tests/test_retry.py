@@ -0,0 +1,106 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+from typing import Any, Text
+
+import pytest
+
+from benchmarks.fakeserver import Account, FakeTiima
+from tiimaweb.client import Connection
+from tiimaweb.exceptions import TransientError
+
+from .conftest import TODAY
+
+DAY = date(2020, 3, 2)
+
+
+def test_expired_session_is_logged_in_again(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    connection.get_time_blocks_of_date(TODAY)
+    tiima.expire_sessions()
+
+    blocks = connection.get_time_blocks_of_date(DAY)
+
+    assert len(blocks) == 3
+    assert connection.current_date == DAY
+    assert len(tiima.sessions) == 1
+
+
+def test_change_is_done_once_after_relogin(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.expire_sessions()
+
+    blocks = connection.add_time_block(
+        datetime(2020, 3, 4, 9), datetime(2020, 3, 4, 10))
+
+    assert len(blocks) == 1
+    assert len(account.blocks_of_day(TODAY)) == 1
+
+
+@pytest.mark.parametrize('failure', ['before', 'after'])
+def test_failed_change_is_retried_only_if_not_applied(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+        monkeypatch,  # type: Any
+        failure,  # type: Text
+):  # type: (...) -> None
+    failures = iter([failure])
+    monkeypatch.setattr(tiima, 'pick_failure', lambda: next(failures, None))
+
+    blocks = connection.add_time_block(
+        datetime(2020, 3, 4, 9), datetime(2020, 3, 4, 10))
+
+    assert len(blocks) == 1
+    assert len(account.blocks_of_day(TODAY)) == 1
+
+
+def test_failed_read_is_retried(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    tiima.error_rate = 0.5
+    tiima.random.seed(1)
+    connection.client.max_retries = 20
+
+    for _ in range(5):
+        connection.cache.invalidate()
+        assert len(connection.get_time_blocks_of_date(DAY)) == 3
+        connection.get_time_blocks_of_date(TODAY)
+
+
+def test_failed_read_gives_up_after_max_retries(
+        tiima,  # type: FakeTiima
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.error_rate = 1.0
+    request_count = tiima.request_count
+
+    with pytest.raises(TransientError):
+        connection.get_time_blocks_of_date(DAY)
+
+    retries = connection.client.max_retries
+    assert tiima.request_count == request_count + 1 + retries
+
+
+def test_failed_change_gives_up_after_max_retries(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.error_rate = 1.0
+
+    with pytest.raises(TransientError):
+        connection.add_time_block(
+            datetime(2020, 3, 4, 9), datetime(2020, 3, 4, 10))
+
+    assert len(account.blocks_of_day(TODAY)) <= 1
@@ -0,0 +1,63 @@
+from __future__ import unicode_literals
+
+import os
+from typing import Any
+
+from benchmarks.fakeserver import FakeTiima
+from tiimaweb import Client
+from tiimaweb.session_store import SessionStore
+
+from .conftest import CUSTOMER, PASSWORD, TODAY, USERNAME
+
+
+def _login(store, client):  # type: (SessionStore, Client) -> None
+    with store.login(client, USERNAME, PASSWORD, CUSTOMER) as connection:
+        assert connection.current_date == TODAY
+
+
+def test_login_resumes_stored_session(
+        tiima,  # type: FakeTiima
+        client,  # type: Client
+        tmpdir,  # type: Any
+):  # type: (...) -> None
+    store = SessionStore('{}'.format(tmpdir.join('session')), 'key', 1000)
+    _login(store, client)
+    session_ids = set(tiima.sessions)
+
+    _login(SessionStore(store.path, 'key', 1000), client)
+
+    assert set(tiima.sessions) == session_ids
+
+
+def test_login_replaces_expired_session(
+        tiima,  # type: FakeTiima
+        client,  # type: Client
+        tmpdir,  # type: Any
+):  # type: (...) -> None
+    store = SessionStore('{}'.format(tmpdir.join('session')), 'key', 1000)
+    _login(store, client)
+    expired = store.load()
+    tiima.expire_sessions()
+
+    connection = SessionStore(store.path, 'key', 1000).login(
+        client, USERNAME, PASSWORD, CUSTOMER)
+
+    stored = store.load()
+    assert stored and expired
+    assert stored['cookies'] != expired['cookies']
+    assert len(tiima.sessions) == 1
+    connection.__exit__(None, None, None)
+
+    _login(SessionStore(store.path, 'key', 1000), client)
+    assert len(tiima.sessions) == 1
+
+
+def test_logout_removes_stored_session(
+        tiima,  # type: FakeTiima
+        client,  # type: Client
+        tmpdir,  # type: Any
+):  # type: (...) -> None
+    store = SessionStore('{}'.format(tmpdir.join('session')), 'key', 1000)
+    store.login(client, USERNAME, PASSWORD, CUSTOMER).logout()
+    assert not os.path.exists(store.path)
+    assert tiima.sessions == {}
@@ -0,0 +1,147 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+from typing import List, Text, Tuple
+
+import pytest
+
+from benchmarks.fakeserver import NORMAL_REASON_CODE, Account, FakeTiima
+from tiimaweb.client import Connection
+
+from .conftest import TODAY
+
+DAY = date(2020, 3, 2)
+
+
+def _get_spans(account, day):
+    # type: (Account, date) -> List[Tuple[datetime, datetime, Text, Text]]
+    return [
+        (x.start.replace(tzinfo=None), x.end.replace(tzinfo=None),
+         x.reason_code, x.description)
+        for x in account.blocks_of_day(day)]
+
+
+def test_sync_day_changes_only_differing_blocks(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.add_block(
+        account, datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 11),
+        description='Work')
+    tiima.add_block(
+        account, datetime(2020, 3, 2, 11), datetime(2020, 3, 2, 12),
+        description='Old')
+    desired = [
+        (datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 11), 'Work'),
+        (datetime(2020, 3, 2, 11), datetime(2020, 3, 2, 13), 'New'),
+    ]
+
+    result = connection.sync_day(DAY, desired)
+
+    assert [x.description for x in result.deletes] == ['Old']
+    assert [x.description for x in result.adds] == ['New']
+    assert _get_spans(account, DAY) == [
+        (datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 11),
+         NORMAL_REASON_CODE, 'Work'),
+        (datetime(2020, 3, 2, 11), datetime(2020, 3, 2, 13),
+         NORMAL_REASON_CODE, 'New'),
+    ]
+    assert result.time_blocks is not None
+    assert len(result.time_blocks) == 2
+
+    again = connection.sync_day(DAY, desired)
+    assert (again.deletes, again.adds, again.request_count) == ([], [], 0)
+
+
+def test_sync_day_dry_run_changes_nothing(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    before = _get_spans(account, DAY)
+    desired = [(datetime(2020, 3, 2, 9), datetime(2020, 3, 2, 10))]
+
+    plan = connection.sync_day(DAY, desired, dry_run=True)
+
+    assert len(plan.deletes) == len(before)
+    assert len(plan.adds) == 1
+    assert plan.time_blocks is None
+    assert plan.request_count > 0
+    assert _get_spans(account, DAY) == before
+
+
+def test_sync_range_clears_dates_without_blocks(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, date(2020, 3, 3))
+    desired = [(datetime(2020, 3, 3, 9), datetime(2020, 3, 3, 10), 'Meeting')]
+
+    results = connection.sync_range(DAY, date(2020, 3, 3), desired)
+
+    assert sorted(x.day for x in results) == [DAY, date(2020, 3, 3)]
+    assert _get_spans(account, DAY) == []
+    assert _get_spans(account, date(2020, 3, 3)) == [
+        (datetime(2020, 3, 3, 9), datetime(2020, 3, 3, 10),
+         NORMAL_REASON_CODE, 'Meeting')]
+
+
+def test_sync_day_rejects_blocks_of_other_dates(
+        connection,  # type: Connection
+):  # type: (...) -> None
+    desired = [(datetime(2020, 3, 3, 9), datetime(2020, 3, 3, 10))]
+    with pytest.raises(ValueError):
+        connection.sync_day(DAY, desired)
+
+
+def test_dry_run_request_count_matches_real_sync(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, date(2020, 3, 3))
+    desired = [
+        (datetime(2020, 3, 2, 9), datetime(2020, 3, 2, 10)),
+        (datetime(2020, 3, 3, 9), datetime(2020, 3, 3, 10)),
+    ]
+    [session] = tiima.sessions.values()
+
+    plan = connection.sync_day(DAY, desired[:1], dry_run=True)
+    plans = connection.sync_range(
+        DAY, date(2020, 3, 3), desired, dry_run=True)
+
+    assert connection.current_date == TODAY
+    assert session.selected_date == TODAY
+    assert connection.sync_day(DAY, desired[:1]).request_count == (
+        plan.request_count)
+    connection.get_time_blocks_of_date(TODAY)
+    account.blocks.clear()
+    tiima.seed(account, DAY, date(2020, 3, 3))
+    results = connection.sync_range(DAY, date(2020, 3, 3), desired)
+    assert sum(x.request_count for x in results) == sum(
+        x.request_count for x in plans)
+
+
+def test_normalize_desired_block(
+        connection,  # type: Connection
+):  # type: (...) -> None
+    start = datetime(2020, 3, 2, 8)
+    end = datetime(2020, 3, 2, 9)
+
+    specs = [connection.normalize_desired_block(x) for x in [
+        (start, end),
+        (start, end, 'Work'),
+        (start, end, 'Lunch', '13'),
+    ]]
+
+    assert [(x.description, x.reason_code) for x in specs] == [
+        ('', 'NTYO'), ('Work', 'NTYO'), ('Lunch', 'LOU')]
+    assert all(x.start_time.utcoffset() is not None for x in specs)
+    assert connection.normalize_desired_block(
+        connection.add_time_block(start, end, 'Work')[0]) == specs[1]
+    for invalid in [(start,), (start, end, 1), (start, end, '', 'XX')]:
+        with pytest.raises(ValueError):
+            connection.normalize_desired_block(invalid)
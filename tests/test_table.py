@@ -0,0 +1,128 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Text, Tuple
+
+import pytest
+import pytz
+
+from benchmarks.fakeserver import LUNCH_REASON_CODE, Account, FakeTiima
+from tiimaweb.client import Connection
+from tiimaweb.table import TimeBlockTable
+from tiimaweb.types import TimeBlock
+
+TZ = pytz.timezone('Europe/Helsinki')
+
+
+def _block(block_id, start, end, reason_code='NTYO', description=''):
+    # type: (Text, datetime, datetime, Text, Text) -> TimeBlock
+    return TimeBlock(
+        id=block_id,
+        start_time=TZ.localize(start),
+        end_time=TZ.localize(end),
+        reason_code=reason_code,
+        reason_text='Normal working time',
+        status='Approved',
+        description=description)
+
+
+def _fetch_blocks(connection, start, end):
+    # type: (Connection, date, date) -> List[TimeBlock]
+    return list(connection.iter_time_blocks(start, end))
+
+
+def test_round_trip_of_fetched_blocks(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    start = date(2020, 3, 26)
+    end = date(2020, 3, 31)
+    tiima.seed(account, start, end)
+    # Over midnight and over the DST change on 2020-03-29
+    tiima.add_block(
+        account, datetime(2020, 3, 28, 22), datetime(2020, 3, 29, 6),
+        description='Night')
+    blocks = _fetch_blocks(connection, start, end)
+
+    table = TimeBlockTable.from_time_blocks(blocks)
+
+    assert len(table) == len(blocks)
+    assert table.to_time_blocks() == blocks
+    assert [x.start_time.utcoffset() for x in table] == [
+        x.start_time.utcoffset() for x in blocks]
+    assert [x.end_time.utcoffset() for x in table] == [
+        x.end_time.utcoffset() for x in blocks]
+    assert table[3] == blocks[3]
+    assert TimeBlockTable.from_time_blocks(list(table)).to_time_blocks() \
+        == blocks
+
+
+def test_round_trip_converts_to_table_time_zone():  # type: () -> None
+    utc_block = _block(
+        '1', datetime(2020, 12, 31, 22), datetime(2021, 1, 1, 1)
+    )._replace(
+        start_time=datetime(2020, 12, 31, 20, tzinfo=pytz.utc),
+        end_time=datetime(2020, 12, 31, 23, tzinfo=pytz.utc))
+
+    [block] = TimeBlockTable.from_time_blocks([utc_block]).to_time_blocks()
+
+    assert block == utc_block
+    assert str(block.start_time.tzinfo) == 'Europe/Helsinki'
+    assert (block.start_time.hour, block.end_time.hour) == (22, 1)
+
+
+def test_categorical_columns_store_distinct_values_once():  # type: () -> None
+    blocks = [
+        _block('{}'.format(n), datetime(2020, 3, 2, 8 + n),
+               datetime(2020, 3, 2, 9 + n), description=('A', 'B')[n % 2])
+        for n in range(6)]
+
+    table = TimeBlockTable.from_time_blocks(blocks)
+
+    assert table.descriptions.values == ['A', 'B']
+    assert list(table.descriptions.codes) == [0, 1, 0, 1, 0, 1]
+    assert table.statuses.values == ['Approved']
+    assert table.to_time_blocks() == blocks
+
+
+def test_times_must_be_whole_minutes():  # type: () -> None
+    block = _block(
+        '1', datetime(2020, 3, 2, 8, 0, 30), datetime(2020, 3, 2, 9))
+
+    with pytest.raises(ValueError):
+        TimeBlockTable.from_time_blocks([block])
+
+
+def test_aggregates_match_the_blocks(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    start = date(2020, 3, 2)
+    end = date(2020, 3, 13)
+    tiima.seed(account, start, end)
+    tiima.add_block(
+        account, datetime(2020, 3, 8, 23), datetime(2020, 3, 9, 1),
+        reason_code=LUNCH_REASON_CODE)
+    blocks = _fetch_blocks(connection, start, end)
+    by_day = {}  # type: Dict[date, timedelta]
+    by_week = {}  # type: Dict[Tuple[int, int], timedelta]
+    by_code = {}  # type: Dict[Text, timedelta]
+    for block in blocks:
+        day = block.start_time.date()
+        (year, week_number, _weekday) = day.isocalendar()
+        week = (year, week_number)
+        by_day[day] = by_day.get(day, timedelta(0)) + block.duration
+        by_week[week] = by_week.get(week, timedelta(0)) + block.duration
+        by_code[block.reason_code] = by_code.get(
+            block.reason_code, timedelta(0)) + block.duration
+
+    table = TimeBlockTable.from_time_blocks(blocks)
+
+    assert table.total_duration() == sum(
+        (x.duration for x in blocks), timedelta(0))
+    assert table.total_duration_by_day() == by_day
+    assert list(table.total_duration_by_day()) == sorted(by_day)
+    assert table.total_duration_by_week() == by_week
+    assert table.total_duration_by_reason_code() == by_code
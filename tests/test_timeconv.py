@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime, timedelta
+from typing import Text, Tuple
+
+import pytest
+import pytz
+
+from tiimaweb.exceptions import ParseError
+from tiimaweb.timeconv import EPOCH, TimeConverter
+
+TZ = pytz.timezone('Europe/Helsinki')
+
+_Time = Tuple[int, int, int, int]  # Month, day, hour and minute of 2020
+
+
+def _localize(day, hour, minute):  # type: (date, int, int) -> datetime
+    naive = datetime(day.year, day.month, day.day, hour, minute)
+    return TZ.normalize(TZ.localize(naive))
+
+
+@pytest.mark.parametrize('day', [
+    date(2020, 3, 28),
+    date(2020, 3, 29),  # Spring forward at 03:00
+    date(2020, 3, 30),
+    date(2020, 10, 24),
+    date(2020, 10, 25),  # Fall back at 04:00
+    date(2020, 10, 26),
+    date(2020, 2, 29),
+    date(2019, 12, 31),
+    date(2021, 1, 1),
+])
+def test_conversions_match_pytz(day):  # type: (date) -> None
+    converter = TimeConverter(TZ)
+    midnight = _localize(day, 0, 0)
+    timestamp = int((midnight - EPOCH).total_seconds()) * 1000
+
+    assert converter.get_timestamp(day) == timestamp
+    assert converter.get_midnight(timestamp) == midnight
+    assert converter.get_date(timestamp) == day
+    for hour in range(24):
+        for minute in (0, 30):
+            result = converter.localize(day, hour, minute)
+            expected = _localize(day, hour, minute)
+            assert result == expected
+            assert result.utcoffset() == expected.utcoffset()
+
+
+@pytest.mark.parametrize('text,day,start,end', [
+    ('08:00-16:00', date(2020, 3, 29), (3, 29, 8, 0), (3, 29, 16, 0)),
+    ('02:00-05:00', date(2020, 10, 25), (10, 25, 2, 0), (10, 25, 5, 0)),
+    ('22:00-02:00 (30.03.)', date(2020, 3, 29),
+     (3, 29, 22, 0), (3, 30, 2, 0)),
+    ('(28.03.) 22:00-04:00', date(2020, 3, 29),
+     (3, 28, 22, 0), (3, 29, 4, 0)),
+    ('(29.02.) 22:00-02:00', date(2020, 3, 1),
+     (2, 29, 22, 0), (3, 1, 2, 0)),
+    ('22:00-02:00 (29.02.)', date(2020, 2, 28),
+     (2, 28, 22, 0), (2, 29, 2, 0)),
+])
+def test_parse_time_range_matches_pytz(text, day, start, end):
+    # type: (Text, date, _Time, _Time) -> None
+    result = TimeConverter(TZ).parse_time_range(text, day)
+
+    assert result == (
+        _localize(date(2020, start[0], start[1]), start[2], start[3]),
+        _localize(date(2020, end[0], end[1]), end[2], end[3]))
+
+
+def test_parse_time_range_over_year_end():  # type: () -> None
+    converter = TimeConverter(TZ)
+
+    assert converter.parse_time_range(
+        '22:00-02:00 (01.01.)', date(2019, 12, 31)) == (
+            _localize(date(2019, 12, 31), 22, 0),
+            _localize(date(2020, 1, 1), 2, 0))
+    assert converter.parse_time_range(
+        '(31.12.) 22:00-02:00', date(2020, 1, 1)) == (
+            _localize(date(2019, 12, 31), 22, 0),
+            _localize(date(2020, 1, 1), 2, 0))
+
+
+@pytest.mark.parametrize('text', [
+    '8-16', '24:00-25:00', '08:60-09:00', '(30.02.) 22:00-02:00'])
+def test_parse_time_range_rejects_invalid_times(text):
+    # type: (Text) -> None
+    with pytest.raises(ParseError):
+        TimeConverter(TZ).parse_time_range(text, date(2020, 3, 1))
+
+
+def test_other_timestamps_are_converted_with_pytz():  # type: () -> None
+    converter = TimeConverter(TZ)
+    noon = _localize(date(2020, 10, 25), 12, 0)
+    timestamp = int((noon - EPOCH).total_seconds()) * 1000
+
+    assert converter.get_midnight(timestamp) == noon
+    assert noon - converter.get_midnight(
+        converter.get_timestamp(date(2020, 10, 25))) == timedelta(hours=13)
@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+
+from datetime import date, timedelta
+from typing import List, Text
+
+import pytest
+
+from benchmarks.fakeserver import Account, FakeTiima
+from tiimaweb.client import Connection, get_totals_windows, stitch_totals
+from tiimaweb.exceptions import ParseError
+from tiimaweb.types import DaySummary
+
+
+def _summaries(start, end, description=''):
+    # type: (date, date, Text) -> List[DaySummary]
+    return [
+        DaySummary(start + timedelta(days=n), timedelta(hours=1), description)
+        for n in range((end - start).days + 1)]
+
+
+@pytest.mark.parametrize('start,end,expected', [
+    (date(2020, 1, 15), date(2020, 1, 20), [date(2020, 1, 1)]),
+    (date(2020, 1, 31), date(2020, 3, 31), [date(2020, 1, 1)]),
+    (date(2020, 1, 31), date(2020, 4, 1), [
+        date(2020, 1, 1), date(2020, 4, 1)]),
+    (date(2020, 11, 15), date(2021, 5, 3), [
+        date(2020, 11, 1), date(2021, 2, 1), date(2021, 5, 1)]),
+    (date(2020, 3, 4), date(2020, 3, 4), [date(2020, 3, 1)]),
+])
+def test_get_totals_windows(
+        start,  # type: date
+        end,  # type: date
+        expected,  # type: List[date]
+):  # type: (...) -> None
+    assert get_totals_windows(start, end) == expected
+
+
+def test_stitch_totals_drops_overlap_and_days_outside_range():
+    # type: () -> None
+    # Calendar windows may show the days of the surrounding weeks too
+    windows = [
+        _summaries(date(2019, 12, 30), date(2020, 4, 5), 'first'),
+        _summaries(date(2020, 3, 30), date(2020, 7, 5), 'second'),
+    ]
+
+    result = stitch_totals(date(2020, 2, 10), date(2020, 4, 20), windows)
+
+    assert [x.day for x in result] == [
+        date(2020, 2, 10) + timedelta(days=n) for n in range(71)]
+    assert set(x.description for x in result if x.day <= date(2020, 4, 5)) \
+        == {'first'}
+    assert set(x.description for x in result if x.day > date(2020, 4, 5)) \
+        == {'second'}
+
+
+def test_stitch_totals_raises_on_missing_days():  # type: () -> None
+    windows = [
+        _summaries(date(2020, 1, 1), date(2020, 3, 30)),
+        _summaries(date(2020, 4, 2), date(2020, 6, 30)),
+    ]
+
+    with pytest.raises(ParseError) as excinfo:
+        stitch_totals(date(2020, 3, 1), date(2020, 4, 30), windows)
+
+    assert '{}'.format(excinfo.value) == (
+        'Totals missing for 2020-03-31, 2020-04-01')
+
+
+def test_get_totals_range_over_overlapping_windows(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, date(2020, 3, 25), date(2020, 4, 7))
+    start = date(2020, 1, 15)
+    end = date(2020, 5, 10)
+    request_count = connection.request_count
+
+    result = connection.get_totals_range(start, end)
+
+    assert connection.request_count - request_count == 2
+    assert [x.day for x in result] == [
+        start + timedelta(days=n) for n in range((end - start).days + 1)]
+    worked = [x.day for x in result if x.duration]
+    assert worked == [
+        x for x in (date(2020, 3, 25) + timedelta(days=n) for n in range(14))
+        if x.weekday() < 5]
+    assert all(x.duration == timedelta(hours=7, minutes=30)
+               for x in result if x.duration)
@@ -0,0 +1,75 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Text, Tuple
+
+import requests
+from mechanicalsoup import StatefulBrowser
+from mechanicalsoup.form import Form
+
+from benchmarks.fakeserver import FakeTiima, FakeTiimaServer
+from tiimaweb import Client
+from tiimaweb.transport import BaseTransport, create_transport
+
+from .conftest import CUSTOMER, PASSWORD, TODAY, USERNAME
+
+DAY = date(2020, 3, 2)
+
+
+class CapturingTransport(BaseTransport):
+    """
+    Transport capturing the request bodies of another transport.
+    """
+    def __init__(self, transport):  # type: (BaseTransport) -> None
+        self.transport = transport
+        self.bodies = []  # type: List[Tuple[Text, Optional[Text]]]
+
+    def post(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> requests.Response
+        response = self.transport.post(action, params)
+        body = response.request.body
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        self.bodies.append((action, body))
+        return response
+
+
+def _capture_bodies(name):  # type: (Text) -> List[Tuple[Text, Optional[Text]]]
+    tiima = FakeTiima(today=TODAY)
+    account = tiima.add_account(USERNAME, PASSWORD, CUSTOMER)
+    tiima.seed(account, DAY, DAY)
+    transports = []  # type: List[CapturingTransport]
+
+    def factory(browser, form, url):
+        # type: (StatefulBrowser, Form, Optional[Text]) -> BaseTransport
+        transport = CapturingTransport(
+            create_transport(name, browser, form, url))
+        transports.append(transport)
+        return transport
+
+    with FakeTiimaServer(tiima) as server:
+        client = Client(url=server.url, transport=factory)
+        with client.login(USERNAME, PASSWORD, CUSTOMER) as connection:
+            [block] = [x for x in connection.add_time_block(
+                datetime(2020, 3, 2, 17), datetime(2020, 3, 2, 18), 'Add')
+                if x.description == 'Add']
+            connection.add_time_block(
+                datetime(2020, 3, 4, 8), datetime(2020, 3, 4, 9), 'Today')
+            connection.delete_time_block(block)
+    [transport] = transports
+    return transport.bodies
+
+
+def test_fast_transport_sends_same_bodies_as_form_transport():
+    # type: () -> None
+    form_bodies = _capture_bodies('form')
+    fast_bodies = _capture_bodies('fast')
+
+    assert set(x for (x, _) in form_bodies) == {
+        'action_select_date', 'action_edit_open', 'action_save',
+        'action_delete_selected'}
+    assert all(body for (_, body) in form_bodies)
+    assert fast_bodies == form_bodies
@@ -0,0 +1,51 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+
+from benchmarks.fakeserver import Account, FakeTiima
+from tiimaweb.client import Connection
+from tiimaweb.watch import ADDED, Watcher
+
+DAY = date(2020, 3, 2)
+
+
+def test_poll_emits_changes_after_baseline(
+        tiima,  # type: FakeTiima
+        account,  # type: Account
+        connection,  # type: Connection
+):  # type: (...) -> None
+    tiima.seed(account, DAY, DAY)
+    watcher = Watcher(connection, start=date(2020, 2, 1), min_interval=1.0)
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+    assert watcher.interval == 2.0
+
+    tiima.add_block(
+        account, datetime(2020, 3, 2, 17), datetime(2020, 3, 2, 18))
+    [event] = watcher.poll()
+
+    assert (event.kind, event.day) == (ADDED, DAY)
+    assert event.time_block.start_time.hour == 17
+    assert watcher.interval == 1.0
+
+
+def test_failed_polls_back_off_before_first_success(
+        tiima,  # type: FakeTiima
+        connection,  # type: Connection
+):  # type: (...) -> None
+    watcher = Watcher(
+        connection, start=date(2020, 2, 1), min_interval=1.0,
+        max_interval=5.0)
+    tiima.error_rate = 1.0
+
+    intervals = []
+    for _ in range(4):
+        assert watcher.poll_safely() == []
+        intervals.append(watcher.interval)
+
+    assert intervals == [2.0, 4.0, 5.0, 5.0]
+    assert (watcher.poll_count, watcher.failure_count) == (0, 4)
+
+    tiima.error_rate = 0.0
+    watcher.poll_safely()
+    assert (watcher.poll_count, watcher.failure_count) == (1, 0)
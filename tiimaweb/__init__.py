@@ -1,5 +1,28 @@
-from .client import Client
+import sys
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING or sys.version_info < (3, 7):
+    from .client import Client
+    from .pool import SessionPool
+else:
+    # Import the client lazily, so that e.g. the command line tool can
+    # answer --help without importing requests, bs4 and pytz
+    _LAZY_NAMES = {
+        'Client': '.client',
+        'SessionPool': '.pool',
+    }
+
+    def __getattr__(name):  # type: (str) -> Any
+        module_name = _LAZY_NAMES.get(name)
+        if module_name is None:
+            raise AttributeError(
+                'module {!r} has no attribute {!r}'.format(__name__, name))
+        import importlib
+        value = getattr(importlib.import_module(module_name, __name__), name)
+        globals()[name] = value
+        return value
 
 __all__ = [
     'Client',
+    'SessionPool',
 ]
@@ -0,0 +1,510 @@
+"""
+Asynchronous client for asyncio applications.
+
+The AsyncClient and AsyncConnection have the same methods as the Client
+and Connection, but as coroutines, so that sessions of many accounts
+can be driven concurrently on a single event loop:
+
+  async with AsyncClient() as client:
+      async with await client.login(username, password, customer) as tiima:
+          blocks = await tiima.get_time_blocks_of_date(date(2020, 3, 4))
+
+All connections of a client share a single aiohttp connection pool,
+while each connection has its own cookies.  The responses are parsed
+with the same code as in the synchronous client, by default with the
+fragment parser.  This needs Python 3.5+ and the optional aiohttp
+package.
+
+Compared to the Client, the AsyncClient has no request rate limiting,
+no optimistic or lean mode and no batch or sync methods.  Expired
+sessions and failed actions are retried like in the Client, but a
+failing login is not retried.
+"""
+from __future__ import unicode_literals
+
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Text,
+    Tuple,
+    Type,
+    Union,
+)
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from six.moves.urllib.parse import urljoin
+
+from .client import (
+    IDEMPOTENT_ACTIONS,
+    LUNCH_REASON_CODE,
+    MAX_LUNCHLESS_DAY_LEN,
+    NORMAL_REASON_CODE,
+    BaseClient,
+    BaseConnection,
+    _has_new_block,
+    get_totals_windows,
+    stitch_totals,
+)
+from .exceptions import (
+    Error,
+    LoginFailed,
+    SessionExpired,
+    TransientError,
+    UnexpectedResponse,
+)
+from .instrumentation import Instrumentation, TimedParser, timer
+from .parsing import SoupParser, is_login_page
+from .transport import FormPayload
+from .types import DaySummary, HtmlResponse, TimeBlock
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None  # type: ignore
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+
+class AsyncClient(BaseClient):
+    def __init__(
+            self,
+            url='https://www.tiima.com',  # type: Text
+            tz=str('Europe/Helsinki'),  # type: str
+            cache_max_days=0,  # type: Optional[int]
+            cache_ttl=None,  # type: Optional[float]
+            parser='fragment',  # type: Union[Text, SoupParser]
+            instrumentation=None,  # type: Optional[Instrumentation]
+            max_retries=3,  # type: int
+            retry_backoff=0.5,  # type: float
+            retry_max_backoff=30.0,  # type: float
+            limit=100,  # type: int
+    ):  # type: (...) -> None
+        """
+        Initialize the client.
+
+        The arguments are the same as for the Client, except that there
+        is no transport, lean mode or optimistic mode to select and
+        limit sets the maximum number of simultaneous connections shared
+        by all the connections of the client (0 for unlimited).
+
+        The client should be closed when it is no longer used, e.g. by
+        using it as an async context manager.
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncClient requires the aiohttp package')
+        super(AsyncClient, self).__init__(
+            url, tz, cache_max_days, cache_ttl, parser, instrumentation,
+            max_retries, retry_backoff, retry_max_backoff)
+        self.limit = limit
+        self._connector = None  # type: Optional[aiohttp.BaseConnector]
+
+    async def __aenter__(self):  # type: (...) -> AsyncClient
+        return self
+
+    async def __aexit__(
+            self,
+            exc_type,  # type: Optional[Type[BaseException]]
+            exc_value,  # type: Optional[BaseException]
+            traceback,  # type: Optional[TracebackType]
+    ):  # type: (...) -> None
+        await self.close()
+
+    async def close(self):  # type: (...) -> None
+        if self._connector:
+            await self._connector.close()
+            self._connector = None
+
+    async def login(
+            self,
+            username,  # type: Text
+            password,  # type: Text
+            customer,  # type: Text
+    ):  # type: (...) -> AsyncConnection
+        session = self._create_session()
+        try:
+            page = await self._open_session(
+                session, username, password, customer)
+            credentials = (username, password, customer)
+            return AsyncConnection(session, self, page, credentials)
+        except BaseException:
+            await session.close()
+            raise
+
+    def _create_session(self):  # type: (...) -> aiohttp.ClientSession
+        if not self._connector:
+            # Created lazily, since it must be created in the event loop
+            self._connector = aiohttp.TCPConnector(limit=self.limit)
+        return aiohttp.ClientSession(
+            connector=self._connector,
+            connector_owner=False,
+            cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    async def _open_session(
+            self,
+            session,  # type: aiohttp.ClientSession
+            username,  # type: Text
+            password,  # type: Text
+            customer,  # type: Text
+    ):  # type: (...) -> HtmlResponse
+        """
+        Log in with the session and return the front page.
+        """
+        response = await _fetch(
+            session, self.instrumentation, 'login', 'GET', self.url)
+        response.raise_for_status()
+        assert 'login' in response.url.lower()
+
+        login_page = HtmlResponse.from_response(response, SoupParser())
+        login_form = login_page.soup.select_one('#loginForm')
+        if not login_form:
+            raise UnexpectedResponse('Cannot find login form')
+        form = FormPayload(login_form, response.url)
+        payload = form.fill({
+            'UserName': username,
+            'Password': password,
+            'CustomerIdentifier': customer,
+            'Language': 'ENG',
+        })
+        response = await _fetch(
+            session, self.instrumentation, 'login', form.method, form.url,
+            payload)
+        response.raise_for_status()
+
+        html_response = HtmlResponse.from_response(response, SoupParser())
+        if html_response.soup.find(id='loginForm'):
+            # Still on the login form, so login must have failed
+            raise LoginFailed('Login failed')
+
+        return html_response
+
+
+class AsyncConnection(BaseConnection):
+    def __init__(
+            self,
+            session,  # type: aiohttp.ClientSession
+            client,  # type: AsyncClient
+            page,  # type: HtmlResponse
+            credentials=None,  # type: Optional[Tuple[Text, Text, Text]]
+    ):  # type: (...) -> None
+        """
+        Initialize connection from a logged in session on the front page.
+
+        The credentials (username, password and customer) are used for
+        logging in again when the session expires.
+        """
+        super(AsyncConnection, self).__init__(client)
+        self.client = client  # type: AsyncClient
+        self._session = session  # type: Optional[aiohttp.ClientSession]
+        self.credentials = credentials
+        self._set_front_page(page)
+
+    def _set_front_page(self, page):  # type: (HtmlResponse) -> None
+        assert page.response is not None
+        url = page.response.url
+        soup = page.soup
+        tiima_form = soup.find('form', attrs={'name': 'tiima'})
+        if not tiima_form:
+            raise UnexpectedResponse('Cannot find tiima form')
+        self._form = FormPayload(tiima_form, url)
+        logout_link = soup.find('a', id='Logout')
+        if not logout_link:
+            raise UnexpectedResponse('Cannot find logout link')
+        self._logout_url = urljoin(url, logout_link.get('href') or '')
+        self._parse_and_store_time_blocks(page)
+
+    async def _relogin(self):  # type: (...) -> None
+        """
+        Log in again and restore the selected date.
+        """
+        if not self.credentials:
+            raise SessionExpired('Session has expired')
+        selected_date = self._current_date
+        self._last_action = 'login'
+        session = self.session
+        session.cookie_jar.clear()
+        self._set_front_page(await self.client._open_session(
+            session, *self.credentials))
+        if self._current_date != selected_date:
+            await self._select_date(selected_date)
+
+    async def __aenter__(self):  # type: (...) -> AsyncConnection
+        return self
+
+    async def __aexit__(
+            self,
+            exc_type,  # type: Optional[Type[BaseException]]
+            exc_value,  # type: Optional[BaseException]
+            traceback,  # type: Optional[TracebackType]
+    ):  # type: (...) -> None
+        await self.logout()
+
+    @property
+    def session(self):  # type: (...) -> aiohttp.ClientSession
+        if not self._session:
+            raise ValueError('Connection already logged out')
+        return self._session
+
+    async def logout(self):  # type: (...) -> None
+        session = self._session
+        if session:
+            try:
+                response = await _fetch(
+                    session, self.client.instrumentation, 'logout', 'GET',
+                    self._logout_url)
+                response.raise_for_status()
+            finally:
+                self._session = None
+                await session.close()
+
+    async def get_totals_list(
+            self,
+            start_date,  # type: date
+    ):  # type: (...) -> List[DaySummary]
+        """
+        Get list of totals for a bunch of dates.
+
+        See Connection.get_totals_list.
+        """
+        response = await self.post_action(
+            'action_previous_month', self._get_totals_params(start_date))
+        return self._parse_totals(response)
+
+    async def get_totals_range(
+            self,
+            start,  # type: date
+            end,  # type: date
+    ):  # type: (...) -> List[DaySummary]
+        """
+        Get list of totals for each date from start to end (inclusive).
+
+        See Connection.get_totals_range.
+        """
+        windows = []
+        for window_start in get_totals_windows(start, end):
+            windows.append(await self.get_totals_list(window_start))
+        return stitch_totals(start, end, windows)
+
+    async def get_time_blocks_of_date(
+            self,
+            day,  # type: date
+    ):  # type: (...) -> List[TimeBlock]
+        cached = self.cache.get(day)
+        if cached is not None:
+            return cached
+        return await self._select_date(day)
+
+    async def delete_time_block(
+            self,
+            block,  # type: TimeBlock
+    ):  # type: (...) -> List[TimeBlock]
+        day = block.start_time.date()
+        known_blocks = self._time_blocks
+        if not any(x.id == block.id for x in known_blocks):
+            # Tiima deletes only the rows of the selected date
+            known_blocks = await self._select_date(day)
+
+        if not any(x.id == block.id for x in known_blocks):
+            raise ValueError('Time block not found')
+
+        return await self._post_checked(
+            day,
+            (lambda: self.post_action('action_delete_selected', {
+                'SelectedRowStampId': block.id,
+            })),
+            (lambda blocks: all(x.id != block.id for x in blocks)))
+
+    async def add_time_block(
+            self,
+            start,  # type: datetime
+            end,  # type: datetime
+            description='',  # type: Text
+    ):  # type: (...) -> List[TimeBlock]
+        start = self._ensure_tz(start)
+        end = self._ensure_tz(end)
+        if start.date() != self._current_date:
+            await self._select_date(start.date())
+        old_set = set(self._time_blocks)
+        temp_lunch = await self._add_temporary_lunch_if_needed(
+            [(start, end)])
+        result = await self._add_time_block(start, end, description)
+        if temp_lunch:
+            result = await self.delete_time_block(temp_lunch)
+        self._check_timeblock_add(old_set, set(result), [(start, end)])
+        return result
+
+    async def _select_date(self, day):  # type: (date) -> List[TimeBlock]
+        response = await self.post_action(
+            'action_select_date', self._get_select_date_params(day))
+        result = self._parse_and_store_time_blocks(response)
+        assert self._current_date == day
+        return result
+
+    async def _add_temporary_lunch_if_needed(
+            self,
+            new_spans,  # type: List[Tuple[datetime, datetime]]
+            max_lunchless_day_len=MAX_LUNCHLESS_DAY_LEN,  # type: timedelta
+            lunch_len=timedelta(minutes=30),  # type: timedelta
+    ):  # type: (...) -> Optional[TimeBlock]
+        span = self._get_temporary_lunch_span(
+            new_spans, max_lunchless_day_len, lunch_len)
+        if not span:
+            return None
+        (start, end) = span
+        time_blocks = await self._add_time_block(start, end, type='lunch')
+        for tb in time_blocks:
+            if tb.start_time == start and tb.end_time == end:
+                return tb
+        raise Error('Temporary lunch break creation failed')
+
+    async def _add_time_block(
+            self,
+            start,  # type: datetime
+            end,  # type: datetime
+            description='',  # type: Text
+            type='normal',  # type: Text
+            reason_code=None,  # type: Optional[Text]
+    ):  # type: (...) -> List[TimeBlock]
+        reason_code = reason_code or {
+            'normal': NORMAL_REASON_CODE,
+            'lunch': LUNCH_REASON_CODE,
+        }[type]
+        params = self._get_save_params(start, end, description, reason_code)
+        old_set = set(self._time_blocks)
+
+        async def post():  # type: () -> HtmlResponse
+            await self.post_action(
+                'action_edit_open', {'EditPanelActive': '1'})
+            return await self.post_action('action_save', params)
+
+        def is_applied(blocks):  # type: (List[TimeBlock]) -> bool
+            return _has_new_block(blocks, old_set, start, end, reason_code)
+
+        return await self._post_checked(start.date(), post, is_applied)
+
+    async def _parse_blocks_or_select_date(
+            self,
+            day,  # type: date
+            page,  # type: HtmlResponse
+    ):  # type: (...) -> List[TimeBlock]
+        page_date = self._parse_selected_date(page.fragment('selected_date'))
+        if page_date.date() == day:
+            return self._parse_and_store_time_blocks(page)
+        else:
+            return await self._select_date(day)
+
+    async def post_action(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> HtmlResponse
+        """
+        Post an AJAX action through the tiima form.
+
+        See Connection.post_action.
+        """
+        retries = 0
+        while True:
+            try:
+                return await self._post_action(action, params)
+            except (SessionExpired, TransientError) as error:
+                if isinstance(error, SessionExpired):
+                    await self._relogin()
+                if (action not in IDEMPOTENT_ACTIONS or
+                        retries >= self.client.max_retries):
+                    raise
+                retries += 1
+                if isinstance(error, TransientError):
+                    await asyncio.sleep(self._get_retry_delay(retries))
+
+    async def _post_action(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> HtmlResponse
+        instrumentation = self.client.instrumentation
+        self._last_action = action
+        try:
+            response = await _fetch(
+                self.session, instrumentation, action, self._form.method,
+                self._form.url, self._form.get_payload(action, params))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            raise TransientError('{} failed: {}'.format(action, error))
+        self.request_count += 1
+        if response.status_code >= 500:
+            raise TransientError('{} failed: HTTP {}'.format(
+                action, response.status_code))
+        response.raise_for_status()
+        if is_login_page(response):
+            raise SessionExpired('Session has expired')
+        parser = self.client.parser or SoupParser()
+        if instrumentation:
+            parser = TimedParser(parser, instrumentation, action)
+        return HtmlResponse.from_response(response, parser)
+
+    async def _post_checked(
+            self,
+            day,  # type: date
+            post,  # type: Callable[[], Awaitable[HtmlResponse]]
+            is_applied,  # type: Callable[[List[TimeBlock]], bool]
+    ):  # type: (...) -> List[TimeBlock]
+        """
+        Post a non-idempotent change and return the time blocks of day.
+
+        See Connection._post_checked.
+        """
+        retries = 0
+        while True:
+            try:
+                response = await post()
+            except (SessionExpired, TransientError):
+                if retries >= self.client.max_retries:
+                    raise
+                retries += 1
+                time_blocks = await self._select_date(day)
+                if is_applied(time_blocks):
+                    return time_blocks
+                await asyncio.sleep(self._get_retry_delay(retries))
+                continue
+            return await self._parse_blocks_or_select_date(day, response)
+
+
+async def _fetch(
+        session,  # type: aiohttp.ClientSession
+        instrumentation,  # type: Optional[Instrumentation]
+        action,  # type: Text
+        method,  # type: Text
+        url,  # type: Text
+        payload=None,  # type: Optional[List[Tuple[Text, Text]]]
+):  # type: (...) -> requests.Response
+    """
+    Make a request with the session and return it as a requests Response.
+
+    The response is converted so that the same code can handle the
+    responses of the synchronous and the asynchronous connections.
+    """
+    start = timer() if instrumentation else 0.0
+    if method == 'GET':
+        request = session.request(method, url, params=payload)
+    else:
+        request = session.request(method, url, data=payload)
+    async with request as aio_response:
+        content = await aio_response.read()
+    if instrumentation:
+        instrumentation.request(action, timer() - start, len(content))
+    response = requests.Response()
+    response.status_code = aio_response.status
+    response.reason = aio_response.reason or ''
+    response.url = str(aio_response.url)
+    response.headers = CaseInsensitiveDict(aio_response.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = content
+    return response
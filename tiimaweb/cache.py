@@ -0,0 +1,74 @@
+from __future__ import unicode_literals
+
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .types import TimeBlock
+
+_clock = getattr(time, 'monotonic', time.time)
+
+_Entry = Tuple[float, List[TimeBlock]]
+
+
+class DayCache(object):
+    """
+    Cache of time blocks keyed by date.
+
+    Keeps at most max_days dates, evicting the least recently used
+    date first, and treats entries older than ttl seconds as missing.
+    A max_days of 0 disables the cache and None means no limit.
+    """
+    def __init__(
+            self,
+            max_days=None,  # type: Optional[int]
+            ttl=None,  # type: Optional[float]
+            clock=_clock,  # type: Callable[[], float]
+    ):  # type: (...) -> None
+        self.max_days = max_days
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()  # type: Dict[date, _Entry]
+
+    def __len__(self):  # type: (...) -> int
+        return len(self._entries)
+
+    @property
+    def enabled(self):  # type: (...) -> bool
+        return self.max_days != 0
+
+    def get(self, day):  # type: (date) -> Optional[List[TimeBlock]]
+        """
+        Get cached time blocks of given date or None if not cached.
+        """
+        entry = self._entries.pop(day, None)
+        if entry is None or self._is_expired(entry[0]):
+            self.misses += 1
+            return None
+        self._entries[day] = entry  # Mark as most recently used
+        self.hits += 1
+        return list(entry[1])
+
+    def put(self, day, time_blocks):  # type: (date, List[TimeBlock]) -> None
+        if not self.enabled:
+            return
+        self._entries.pop(day, None)
+        self._entries[day] = (self._clock(), list(time_blocks))
+        if self.max_days is not None:
+            while len(self._entries) > self.max_days:
+                self._entries.pop(next(iter(self._entries)))
+
+    def invalidate(self, day=None):  # type: (Optional[date]) -> None
+        """
+        Forget the cached time blocks of given date or of all dates.
+        """
+        if day is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(day, None)
+
+    def _is_expired(self, stored_at):  # type: (float) -> bool
+        return self.ttl is not None and self._clock() - stored_at > self.ttl
@@ -1,26 +1,519 @@
-from __future__ import unicode_literals
+"""
+Command line interface of tiimaweb.
 
+Without a command, asks the credentials and a date and prints the time
+blocks of the date.  The commands are scriptable and run all their
+operations in a single session, e.g.:
+
+  tiimaweb blocks 2020-03-02 2020-03-06
+  tiimaweb totals 2020-03-01 2020-03-31
+  tiimaweb add 2020-03-04T08:00 12:00 "Some work"
+  tiimaweb delete 2020-03-04 1234 1235
+  tiimaweb apply blocks.csv
+
+The fleet command runs the jobs of a job file for many accounts in
+parallel (see the fleet module) and takes the credentials from the
+job file instead:
+
+  tiimaweb fleet jobs.json --processes 8
+
+The credentials are taken from the options, a JSON credentials file
+(with "username", "password", "customer" and "url") and the
+TIIMAWEB_USERNAME, TIIMAWEB_PASSWORD, TIIMAWEB_CUSTOMER and
+TIIMAWEB_URL environment variables, in this order, and the missing
+ones are asked.  The password is never taken from the options.
+
+The client is imported only when a command is run, so that help and
+argument errors come back without loading requests, bs4 and pytz.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
 import getpass
+import io
+import json
+import os
+import re
 import sys
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Optional, Text
 
-from .client import Client
+if TYPE_CHECKING:
+    from .client import Client, Connection
+    from .types import BlockSpec
 
 if sys.version_info < (3, 0):
     input = raw_input  # noqa
 
+DEFAULT_URL = 'https://www.tiima.com'
+
+#: Names of the credentials, also the keys of the credentials file
+CREDENTIAL_NAMES = ('username', 'password', 'customer', 'url')
+
+_TIME_RE = re.compile(r'^(\d{1,2}):(\d{2})$')
+_DATETIME_RE = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2})(?::(\d{2}))?'
+    r'(Z|[+-]\d{2}:?\d{2})?$')
+
+
+def main(argv=None):  # type: (Optional[List[str]]) -> None
+    options = get_argument_parser().parse_args(argv)
+    command = getattr(options, 'command', None)
+    if command is None:
+        with connect(options, prompt_stream=None) as connection:
+            show_date(connection)
+        return
+    if not getattr(options, 'connect', True):
+        command(options)
+        return
+    with connect(options) as connection:
+        command(connection, options)
+
+
+def get_argument_parser():  # type: (...) -> argparse.ArgumentParser
+    parser = argparse.ArgumentParser(
+        prog='tiimaweb',
+        description='Tiima Web Controller',
+        epilog='Without a command, asks a date and prints its time blocks.')
+    parser.add_argument(
+        '--url', default=None,
+        help='URL of Tiima (default: {})'.format(DEFAULT_URL))
+    parser.add_argument('--username', default=None)
+    parser.add_argument('--customer', default=None)
+    parser.add_argument(
+        '--credentials-file', metavar='PATH',
+        default=os.environ.get('TIIMAWEB_CREDENTIALS_FILE'),
+        help=(
+            'JSON file with the credentials '
+            '(default: $TIIMAWEB_CREDENTIALS_FILE)'))
+    commands = parser.add_subparsers(metavar='COMMAND')
+
+    blocks = commands.add_parser(
+        'blocks', help='Print the time blocks of a date or a date range')
+    blocks.add_argument('start', type=parse_date, help='YYYY-MM-DD')
+    blocks.add_argument(
+        'end', type=parse_date, nargs='?', default=None, help='YYYY-MM-DD')
+    blocks.add_argument(
+        '--format', choices=['text', 'csv', 'jsonl'], default='text')
+    blocks.set_defaults(command=print_blocks)
+
+    totals = commands.add_parser(
+        'totals', help='Print the daily totals of a date or a date range')
+    totals.add_argument('start', type=parse_date, help='YYYY-MM-DD')
+    totals.add_argument(
+        'end', type=parse_date, nargs='?', default=None, help='YYYY-MM-DD')
+    totals.add_argument('--format', choices=['text', 'jsonl'], default='text')
+    totals.set_defaults(command=print_totals)
+
+    add = commands.add_parser('add', help='Add a time block')
+    add.add_argument('start', type=parse_datetime, help='YYYY-MM-DDTHH:MM')
+    add.add_argument(
+        'end', type=parse_datetime,
+        help='YYYY-MM-DDTHH:MM, or HH:MM on the date of the start')
+    add.add_argument('description', nargs='?', default='')
+    add.set_defaults(command=add_block)
+
+    delete = commands.add_parser(
+        'delete', help='Delete time blocks of a date')
+    delete.add_argument('date', type=parse_date, help='YYYY-MM-DD')
+    delete.add_argument('ids', nargs='*', metavar='ID')
+    delete.add_argument(
+        '--all', action='store_true',
+        help='Delete all the time blocks of the date')
+    delete.set_defaults(command=delete_blocks)
 
-def main():  # type: (...) -> None
-    client = Client()
+    apply = commands.add_parser(
+        'apply', help='Sync the time blocks to a batch file',
+        description=(
+            'Make the time blocks of the dates in a CSV, JSON or JSON '
+            'Lines batch file match the rows of the file.  The rows have '
+            'start_time, end_time and optionally description and '
+            'reason_code, so the files of the export command can be '
+            'applied as is.'))
+    apply.add_argument('file')
+    apply.add_argument(
+        '--format', choices=['csv', 'json', 'jsonl'], default=None,
+        help='Format of the file (default: by the file extension)')
+    apply.add_argument(
+        '--start', type=parse_date, default=None,
+        help='Sync the range from this date, clearing the dates not in '
+        'the file')
+    apply.add_argument(
+        '--end', type=parse_date, default=None,
+        help='Sync the range until this date, clearing the dates not in '
+        'the file')
+    apply.add_argument(
+        '--dry-run', action='store_true',
+        help='Print the changes without making them')
+    apply.set_defaults(command=apply_batch)
 
-    username = input('Username: ')
-    password = getpass.getpass()
-    customer = input('Customer: ')
+    export = commands.add_parser(
+        'export', help='Export the time blocks of a date range to stdout')
+    export.add_argument('format', choices=['csv', 'jsonl'])
+    export.add_argument('start', type=parse_date, help='YYYY-MM-DD')
+    export.add_argument('end', type=parse_date, help='YYYY-MM-DD')
+    export.set_defaults(command=export_blocks)
 
-    with client.login(username, password, customer) as connection:
-        day_str = input('Date: ')
-        day = datetime.strptime(day_str, '%Y-%m-%d').date()
-        blocks = connection.get_time_blocks_of_date(day)
-        total_time = sum((x.duration for x in blocks), timedelta(0))
+    report = commands.add_parser(
+        'report', help='Report the worked hours of a date range')
+    report.add_argument('start', type=parse_date, help='YYYY-MM-DD')
+    report.add_argument('end', type=parse_date, help='YYYY-MM-DD')
+    report.add_argument(
+        '--by', choices=['day', 'week', 'month'], default='week',
+        help='Period to aggregate by (default: %(default)s)')
+    report.set_defaults(command=print_report)
+
+    watch = commands.add_parser(
+        'watch', help='Stream the changes of the time blocks as JSON Lines')
+    watch.add_argument(
+        '--start', type=parse_date, default=None,
+        help='Start of the watched three months (YYYY-MM-DD)')
+    watch.add_argument(
+        '--min-interval', type=float, default=30.0,
+        help='Seconds between the polls (default: %(default)s)')
+    watch.add_argument(
+        '--max-interval', type=float, default=600.0,
+        help='Maximum seconds between idle polls (default: %(default)s)')
+    watch.set_defaults(command=watch_blocks)
+
+    fleet = commands.add_parser(
+        'fleet', help='Run the operations of a job file for many accounts',
+        description=(
+            'Run the operations of the accounts of a JSON job file in '
+            'parallel.  The results of the accounts are printed as JSON '
+            'Lines and a summary to stderr.  The credentials are taken '
+            'from the job file.'))
+    fleet.add_argument('job_file')
+    fleet.add_argument(
+        '--processes', type=int, default=4,
+        help='Number of worker processes (default: %(default)s)')
+    fleet.add_argument(
+        '--max-accounts-per-url', type=int, default=None,
+        help='Accounts run at the same time per server')
+    fleet.add_argument(
+        '--max-accounts-per-customer', type=int, default=None,
+        help='Accounts run at the same time per customer')
+    fleet.add_argument(
+        '--max-rate-per-url', type=float, default=None,
+        help='Requests per second per server')
+    fleet.add_argument(
+        '--max-rate-per-customer', type=float, default=None,
+        help='Requests per second per customer')
+    fleet.add_argument(
+        '--transport', default='form',
+        help='Transport of the clients (default: %(default)s)')
+    fleet.set_defaults(command=run_fleet, connect=False)
+    return parser
+
+
+def show_date(connection):  # type: (Connection) -> None
+    day = parse_date(input('Date: '))
+    blocks = connection.get_time_blocks_of_date(day)
+    total_time = sum((x.duration for x in blocks), timedelta(0))
+    print('\n'.join('{}'.format(x) for x in blocks))
+    print('Total time: {}'.format(total_time))
+
+
+def print_blocks(connection, args):
+    # type: (Connection, argparse.Namespace) -> None
+    from .export import WRITERS
+
+    blocks = connection.iter_time_blocks(args.start, args.end or args.start)
+    if args.format in WRITERS:
+        WRITERS[args.format](blocks, sys.stdout)
+        return
+    total_time = timedelta(0)
+    for block in blocks:
+        print('{}'.format(block))
+        total_time += block.duration
+    print('Total time: {}'.format(total_time))
+
+
+def print_totals(connection, args):
+    # type: (Connection, argparse.Namespace) -> None
+    from .types import format_duration
+
+    for summary in connection.get_totals_range(
+            args.start, args.end or args.start):
+        if args.format == 'jsonl':
+            print(json.dumps({
+                'day': summary.day.isoformat(),
+                'duration': int(summary.duration.total_seconds() // 60),
+                'description': summary.description,
+            }, sort_keys=True))
+        else:
+            print('{} {:>6} {}'.format(
+                summary.day, format_duration(summary.duration),
+                summary.description).rstrip())
+
+
+def add_block(connection, args):
+    # type: (Connection, argparse.Namespace) -> None
+    (start, end) = (args.start, args.end)
+    if not isinstance(start, datetime):
+        raise SystemExit('The start must have a date: {}'.format(start))
+    if isinstance(end, timedelta):  # Time of the start date
+        end = start.replace(hour=0, minute=0, second=0) + end
+    blocks = connection.add_time_block(start, end, args.description)
+    print('\n'.join('{}'.format(x) for x in blocks))
+
+
+def delete_blocks(connection, args):
+    # type: (Connection, argparse.Namespace) -> None
+    if args.all == bool(args.ids):
+        raise SystemExit('Give either the ids or --all')
+    if args.all:
+        result = connection.clear_day(args.date)
+    else:
+        blocks = connection.get_time_blocks_of_date(args.date)
+        blocks_by_id = dict((x.id, x) for x in blocks)
+        missing = [x for x in args.ids if x not in blocks_by_id]
+        if missing:
+            raise SystemExit('No such time blocks on {}: {}'.format(
+                args.date, ', '.join(missing)))
+        result = connection.delete_time_blocks(
+            blocks_by_id[x] for x in args.ids)
+    for blocks in result.time_blocks.values():
         print('\n'.join('{}'.format(x) for x in blocks))
-        print('Total time: {}'.format(total_time))
+
+
+def apply_batch(connection, args):
+    # type: (Connection, argparse.Namespace) -> None
+    desired = []  # type: List[BlockSpec]
+    for row in read_batch_file(args.file, args.format):
+        try:
+            (start, end) = (row['start_time'], row['end_time'])
+            block = (parse_datetime(start), parse_datetime(end),
+                     row.get('description') or '',
+                     row.get('reason_code') or 'NTYO')
+            desired.append(connection.normalize_desired_block(block))
+        except (KeyError, ValueError, argparse.ArgumentTypeError) as error:
+            raise SystemExit('Invalid row {}: {}'.format(row, error))
+    if not desired and not (args.start and args.end):
+        raise SystemExit(
+            'No rows in {}: give both --start and --end to clear '
+            'a date range'.format(args.file))
+    if args.start and args.end and args.start > args.end:
+        raise SystemExit('The --start date is after the --end date')
+    days = set(x.start_time.date() for x in desired)
+    if args.start or args.end:
+        start = args.start or min(days)
+        end = args.end or max(days)
+        day_syncs = connection.sync_range(
+            start, end, desired, dry_run=args.dry_run)
+    else:
+        day_syncs = [
+            connection.sync_day(
+                day, [x for x in desired if x.start_time.date() == day],
+                dry_run=args.dry_run)
+            for day in sorted(days, key=(
+                lambda x: (x != connection.current_date, x)))]
+    request_count = 0
+    for day_sync in sorted(day_syncs, key=(lambda x: x.day)):
+        request_count += day_sync.request_count
+        if day_sync.deletes or day_sync.adds:
+            print('{}: {} deleted, {} added'.format(
+                day_sync.day, len(day_sync.deletes), len(day_sync.adds)))
+    print('{} dates, {} requests{}'.format(
+        len(day_syncs), request_count, (' needed' if args.dry_run else '')))
+
+
+def export_blocks(connection, args):
+    # type: (Connection, argparse.Namespace) -> None
+    from .export import WRITERS
+
+    blocks = connection.iter_time_blocks(args.start, args.end)
+    count = WRITERS[args.format](blocks, sys.stdout)
+    sys.stderr.write('Exported {} time blocks\n'.format(count))
+
+
+def print_report(connection, args):
+    # type: (Connection, argparse.Namespace) -> None
+    from .report import build_report
+    from .types import format_duration
+
+    result = build_report(connection, args.start, args.end)
+    total = result.get_total()
+    rows = result.get_rows(args.by) + ([total] if total else [])
+    codes = sorted(result.get_total_by_reason_code())
+    line_format = '{:<12} {:>8} {:>8} {:>8} {:>6}' + ' {:>8}' * len(codes)
+    print(line_format.format(
+        args.by, 'work', 'lunch', 'overtime', 'blocks', *codes))
+    for row in rows:
+        print(line_format.format(
+            row.key, format_duration(row.work), format_duration(row.lunch),
+            format_duration(row.overtime), row.block_count, *[
+                format_duration(row.by_reason_code.get(x, timedelta(0)))
+                for x in codes]))
+
+
+def watch_blocks(connection, args):
+    # type: (Connection, argparse.Namespace) -> None
+    from .export import FIELDS, get_export_values
+    from .watch import Watcher
+
+    watcher = Watcher(
+        connection, start=args.start, min_interval=args.min_interval,
+        max_interval=args.max_interval)
+    try:
+        for event in watcher.watch():
+            item = dict(zip(FIELDS, get_export_values(event.time_block)))
+            item.update(event=event.kind, day=event.day.isoformat())
+            sys.stdout.write(json.dumps(item, sort_keys=True) + '\n')
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+def run_fleet(args):  # type: (argparse.Namespace) -> None
+    from .fleet import Fleet, load_jobs
+    from .types import AccountResult
+
+    try:
+        jobs = load_jobs(args.job_file)
+    except (IOError, OSError, KeyError, ValueError) as error:
+        raise SystemExit('Invalid job file {}: {}'.format(
+            args.job_file, error))
+    fleet = Fleet(
+        processes=args.processes,
+        max_accounts_per_url=args.max_accounts_per_url,
+        max_accounts_per_customer=args.max_accounts_per_customer,
+        max_rate_per_url=args.max_rate_per_url,
+        max_rate_per_customer=args.max_rate_per_customer,
+        client_options={str('transport'): args.transport})
+
+    def write_result(result):  # type: (AccountResult) -> None
+        print(json.dumps(result._asdict()))
+        sys.stdout.flush()
+
+    report = fleet.run(jobs, callback=write_result)
+    sys.stderr.write('{}\n'.format(report))
+    for result in report.failed:
+        sys.stderr.write('{}@{}: {}\n'.format(
+            result.username, result.customer, result.error))
+
+
+def connect(
+        args,  # type: argparse.Namespace
+        prompt_stream=sys.stderr,  # type: Optional[IO[str]]
+):  # type: (...) -> Connection
+    """
+    Log in with the credentials of the arguments.
+
+    The prompts are written to stderr by default to keep stdout clean.
+    """
+    from .client import Client  # noqa: F811
+
+    credentials = get_credentials(args)
+    client = Client(url=(credentials.pop('url', '') or DEFAULT_URL))
+    return login(client, prompt_stream, credentials)
+
+
+def get_credentials(args):  # type: (argparse.Namespace) -> Dict[Text, Text]
+    """
+    Get the credentials from the arguments, the file and the environment.
+    """
+    result = {}  # type: Dict[Text, Text]
+    sources = [vars(args)]  # type: List[Dict[Text, Any]]
+    if args.credentials_file:
+        path = os.path.expanduser(args.credentials_file)
+        with io.open(path, encoding='utf-8') as fp:
+            sources.append(json.load(fp))
+    sources.append(dict(
+        (name, os.environ.get('TIIMAWEB_{}'.format(name.upper())))
+        for name in CREDENTIAL_NAMES))
+    for name in CREDENTIAL_NAMES:
+        for source in sources:
+            if source.get(name):
+                result[name] = source[name]
+                break
+    return result
+
+
+def login(
+        client,  # type: Client
+        prompt_stream=None,  # type: Optional[IO[str]]
+        credentials=None,  # type: Optional[Dict[Text, Text]]
+):  # type: (...) -> Connection
+    credentials = credentials or {}
+    username = credentials.get('username') or prompt(
+        str('Username: '), prompt_stream)
+    password = credentials.get('password') or getpass.getpass()
+    customer = credentials.get('customer') or prompt(
+        str('Customer: '), prompt_stream)
+
+    session_file = os.environ.get('TIIMAWEB_SESSION_FILE')
+    if session_file:
+        from .session_store import SessionStore
+        store = SessionStore(session_file, secret=password)
+        return store.login(client, username, password, customer)
+    return client.login(username, password, customer)
+
+
+def read_batch_file(path, file_format=None):
+    # type: (Text, Optional[Text]) -> List[Dict[Text, Any]]
+    """
+    Read the rows of a CSV, JSON (a list of objects) or JSON Lines file.
+    """
+    if not file_format:
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        file_format = extension if extension in ('json', 'jsonl') else 'csv'
+    if file_format == 'csv':
+        import csv
+        if sys.version_info < (3, 0):  # The csv module handles only bytes
+            with open(path, 'rb') as fp:
+                return [
+                    dict((k.decode('utf-8'), (v or b'').decode('utf-8'))
+                         for (k, v) in row.items())
+                    for row in csv.DictReader(fp)]
+        with io.open(path, encoding='utf-8', newline='') as fp:
+            return [dict(row) for row in csv.DictReader(fp)]
+    with io.open(path, encoding='utf-8') as fp:
+        if file_format == 'json':
+            rows = json.load(fp)  # type: List[Dict[Text, Any]]
+            return rows
+        return [json.loads(line) for line in fp if line.strip()]
+
+
+def prompt(text, stream=None):  # type: (str, Optional[IO[str]]) -> Text
+    if stream is None:
+        return input(text)
+    stream.write(text)
+    stream.flush()
+    return input()
+
+
+def parse_date(text):  # type: (Text) -> date
+    try:
+        return datetime.strptime(text, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'invalid date (expected YYYY-MM-DD): {!r}'.format(text))
+
+
+def parse_datetime(text):  # type: (Text) -> Any
+    """
+    Parse a date and time or just a time.
+
+    A time without a date, like "16:00", is returned as a timedelta
+    from the midnight.  A date and time with a UTC offset, like in the
+    exported files, is returned as an aware datetime.
+    """
+    m = _TIME_RE.match(text)
+    if m:
+        return timedelta(hours=int(m.group(1)), minutes=int(m.group(2)))
+    m = _DATETIME_RE.match(text)
+    if not m:
+        raise argparse.ArgumentTypeError(
+            'invalid time (expected YYYY-MM-DDTHH:MM): {!r}'.format(text))
+    (year, month, day, hour, minute, second) = (
+        int(x or 0) for x in m.groups()[:6])
+    result = datetime(year, month, day, hour, minute, second)
+    offset = m.group(7)
+    if offset:
+        import pytz
+        digits = offset[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + int(digits[2:]) if digits else 0
+        sign = -1 if offset[0] == '-' else 1
+        result = pytz.FixedOffset(sign * minutes).localize(result)
+    return result
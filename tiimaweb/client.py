@@ -1,35 +1,213 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import random
 import re
+import time as _time
+from collections import OrderedDict, deque
 from copy import copy
-from datetime import date, datetime, time, timedelta
-from typing import TYPE_CHECKING, Dict, List, Optional, Set, Text, Type
+from datetime import date, datetime, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Text,
+    Tuple,
+    Type,
+    Union,
+)
 
 import pytz
+import requests
 from bs4 import BeautifulSoup
 from bs4.element import Tag
 from mechanicalsoup import StatefulBrowser
-from mechanicalsoup.utils import LinkNotFoundError
 
-from .exceptions import Error, LoginFailed, ParseError, UnexpectedResponse
-from .types import DaySummary, HtmlResponse, TimeBlock
+from .cache import DayCache
+from .exceptions import (
+    Error,
+    LoginFailed,
+    ParseError,
+    SessionExpired,
+    TransientError,
+    UnexpectedResponse,
+)
+from .instrumentation import Instrumentation, TimedParser, timer
+from .parsing import SoupParser, get_parser, is_login_page
+from .ratelimit import RateLimiter
+from .timeconv import EPOCH, TimeConverter  # noqa: F401
+from .transport import (
+    TRANSPORTS,
+    FastTransport,
+    TransportFactory,
+    copy_form_fields,
+    create_transport,
+)
+from .types import (
+    BatchResult,
+    BlockSpec,
+    DaySummary,
+    DaySync,
+    DebugRecord,
+    HtmlResponse,
+    TimeBlock,
+)
 
 if TYPE_CHECKING:
     from types import TracebackType
 
+    from .session_store import SessionStore
 
-EPOCH = datetime(1970, 1, 1, 0, 0, tzinfo=pytz.UTC)
 
+MAX_LUNCHLESS_DAY_LEN = timedelta(hours=6)
 
-class Client:
+#: HTTP requests of a login: the front page redirecting to the login
+#: page, the login page and the login form redirecting to the front page
+LOGIN_REQUEST_COUNT = 4
+
+#: HTTP requests of a failed login: the front page redirecting to the
+#: login page, the login page and the login form back on the login page
+FAILED_LOGIN_REQUEST_COUNT = 3
+
+#: HTTP requests of a logout: the logout link redirecting to the login page
+LOGOUT_REQUEST_COUNT = 2
+
+NORMAL_REASON_CODE = 'NTYO'
+LUNCH_REASON_CODE = 'LOU'
+
+#: Ids of the reason codes in the StampReasonCodeId select
+REASON_CODE_IDS = {
+    'NTYO': '1',  # Normaali työaika
+    'OA': '31',  # Oma asia
+    'YT': '39',  # Ylityö
+    'KO': '30',  # Koulutus (osapäivä)
+    'LSA': '24',  # Lapsi sairas (osapäivä)
+    'SA': '29',  # Sairausloma (osapäivä)
+    'TM': '28',  # Työmatka (osapäivä)
+    'LOU': '13',  # Lounas
+}
+
+#: Actions which can be posted again if their outcome is not known
+IDEMPOTENT_ACTIONS = {
+    'action_select_date',
+    'action_previous_month',
+    'action_edit_open',
+}
+
+# TimeBlock or (start, end[, description[, reason_code]]) tuple
+_DesiredBlock = Union[TimeBlock, Sequence[object]]
+
+
+class BaseClient(object):
+    """
+    Base of the clients with the settings shared by the connections.
+    """
     def __init__(
             self,
             url='https://www.tiima.com',  # type: Text
             tz=str('Europe/Helsinki'),  # type: str
+            cache_max_days=0,  # type: Optional[int]
+            cache_ttl=None,  # type: Optional[float]
+            parser=None,  # type: Optional[Union[Text, SoupParser]]
+            instrumentation=None,  # type: Optional[Instrumentation]
+            max_retries=3,  # type: int
+            retry_backoff=0.5,  # type: float
+            retry_max_backoff=30.0,  # type: float
     ):  # type: (...) -> None
         self.url = url
         self.tz = pytz.timezone(tz)
+        self.time_converter = TimeConverter(self.tz)
+        self.cache_max_days = cache_max_days
+        self.cache_ttl = cache_ttl
+        self.parser = get_parser(parser) if parser else None
+        self.instrumentation = instrumentation
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+
+
+class Client(BaseClient):
+    def __init__(
+            self,
+            url='https://www.tiima.com',  # type: Text
+            tz=str('Europe/Helsinki'),  # type: str
+            cache_max_days=0,  # type: Optional[int]
+            cache_ttl=None,  # type: Optional[float]
+            parser=None,  # type: Optional[Union[Text, SoupParser]]
+            instrumentation=None,  # type: Optional[Instrumentation]
+            transport='form',  # type: Union[Text, TransportFactory]
+            pool_maxsize=4,  # type: int
+            max_retries=3,  # type: int
+            retry_backoff=0.5,  # type: float
+            retry_max_backoff=30.0,  # type: float
+            lean=False,  # type: bool
+            debug_history=0,  # type: int
+            optimistic=False,  # type: bool
+    ):  # type: (...) -> None
+        """
+        Initialize the client.
+
+        The time blocks of each fetched date can be cached by the
+        connections by setting cache_max_days to the number of dates
+        to keep (None for unlimited) and optionally cache_ttl to the
+        number of seconds to keep each date.  The cache is disabled by
+        default.
+
+        The responses are parsed by MechanicalSoup by default.  Another
+        parser backend can be selected with the parser argument, e.g.
+        "fragment" for parsing only the parts of the pages that are
+        needed.  See the parsing module.
+
+        Requests and parsing can be monitored by passing an
+        Instrumentation object.  See the instrumentation module.
+
+        The actions are posted by filling the tiima form with
+        MechanicalSoup by default.  Passing transport="fast" posts a
+        payload captured from the form directly instead, keeping up to
+        pool_maxsize connections alive.  The fast transport parses the
+        responses lazily with the SoupParser, unless another parser is
+        given.  The transport can also be a factory of a custom
+        transport.  See the transport module.
+
+        Expired sessions are logged in again transparently and server
+        errors and connection failures are retried up to max_retries
+        times with exponential backoff starting from retry_backoff
+        seconds (with full jitter and capped to retry_max_backoff).
+        Saves and deletes are not simply posted again: the date is
+        selected first to check whether the change was applied.
+
+        In lean mode the connections drop the soups and the bodies of
+        the responses as soon as they are parsed and keep only the
+        logout link of the front page in the browser, which keeps the
+        memory footprint of each connection small.  Independent of the
+        mode, the last debug_history responses can be kept in the
+        debug_history of each connection as DebugRecord objects.
+
+        In optimistic mode time blocks are saved without opening the
+        edit panel first and the page returned by a save or a delete is
+        trusted.  The date is fetched again only when the outcome is not
+        known, and if the change turns out not to be applied, it is made
+        in the normal way.
+        """
+        if not callable(transport) and transport not in TRANSPORTS:
+            raise ValueError('Unknown transport: {}'.format(transport))
+        if transport == FastTransport.name and not parser:
+            parser = SoupParser()
+        super(Client, self).__init__(
+            url, tz, cache_max_days, cache_ttl, parser, instrumentation,
+            max_retries, retry_backoff, retry_max_backoff)
+        self.transport = transport
+        self.pool_maxsize = pool_maxsize
+        self.lean = lean
+        self.debug_history = debug_history
+        self.optimistic = optimistic
 
     def login(
             self,
@@ -37,8 +215,22 @@ class Client:
             password,  # type: Text
             customer,  # type: Text
     ):  # type: (...) -> Connection
+        browser = self._open_session(username, password, customer)
+        return Connection(
+            browser, self, credentials=(username, password, customer))
+
+    def _open_session(
+            self,
+            username,  # type: Text
+            password,  # type: Text
+            customer,  # type: Text
+    ):  # type: (...) -> StatefulBrowser
+        """
+        Log in with a new browser and return it on the front page.
+        """
         browser = StatefulBrowser()
-        response = browser.open(self.url)
+        response = _call_browser(
+            self.instrumentation, 'login', (lambda: browser.open(self.url)))
         response.raise_for_status()
         assert 'login' in (browser.get_url() or '').lower()
 
@@ -47,7 +239,8 @@ class Client:
         browser['Password'] = password
         browser['CustomerIdentifier'] = customer
         browser['Language'] = 'ENG'
-        response = browser.submit_selected()
+        response = _call_browser(
+            self.instrumentation, 'login', browser.submit_selected)
         response.raise_for_status()
 
         html_response = HtmlResponse.from_response(response)
@@ -55,31 +248,336 @@ class Client:
             # Still on the login form, so login must have failed
             raise LoginFailed('Login failed')
 
-        return Connection(browser, self)
+        return browser
+
+
+class BaseConnection(object):
+    """
+    Base of the connections with the parsing and the request data.
+
+    This has the parts shared by the synchronous Connection and the
+    asynchronous AsyncConnection (see the aio module).
+    """
+    def __init__(self, client):  # type: (BaseClient) -> None
+        self.client = client
+        self._last_action = 'login'
+        self.request_count = 0
+        self.cache = DayCache(client.cache_max_days, client.cache_ttl)
+        self._time_blocks = []  # type: List[TimeBlock]
+        self._current_date = date(1970, 1, 1)  # type: date
+
+    @property
+    def current_date(self):  # type: (...) -> date
+        return self._current_date
+
+    def _ensure_tz(self, dt):  # type: (datetime) -> datetime
+        if not dt.tzinfo:
+            return self.client.tz.localize(dt)
+        return dt.astimezone(self.client.tz)
+
+    def _date_to_timestamp(self, day):  # type: (date) -> Text
+        return '{}'.format(self.client.time_converter.get_timestamp(day))
+
+    def _get_select_date_params(self, day):  # type: (date) -> Dict[Text, Text]
+        return {
+            'AjaxId': 'CalendarStrip',
+            'SelectedStampingDate': self._date_to_timestamp(day),
+        }
+
+    def _get_totals_params(self, start_date):
+        # type: (date) -> Dict[Text, Text]
+        month_start = start_date.replace(day=1)
+        return {
+            'AjaxId': 'CalendarStrip',
+            'CalendarStripStartDate': self._date_to_timestamp(month_start),
+        }
+
+    def _get_save_params(
+            self,
+            start,  # type: datetime
+            end,  # type: datetime
+            description,  # type: Text
+            reason_code,  # type: Text
+    ):  # type: (...) -> Dict[Text, Text]
+        reason_code_id = REASON_CODE_IDS.get(reason_code)
+        if not reason_code_id:
+            raise ValueError('Unknown reason code: {}'.format(reason_code))
+        return {
+            'EditPanelActive': '1',
+            'EditStartTime': '{:%H:%M}'.format(start),
+            'EditStartDate': '{:%d.%m.%Y}'.format(start),
+            'EditEndTime': '{:%H:%M}'.format(end),
+            'EditEndDate': '{:%d.%m.%Y}'.format(end),
+            'EditDescription': description,
+            'EditStampType': '0',
+            'EditReasonCodeId': reason_code_id,
+        }
+
+    def _get_retry_delay(self, retries):  # type: (int) -> float
+        backoff = min(
+            self.client.retry_backoff * 2 ** (retries - 1),
+            self.client.retry_max_backoff)
+        return random.uniform(0, backoff)
+
+    def _get_temporary_lunch_span(
+            self,
+            new_spans,  # type: List[Tuple[datetime, datetime]]
+            max_lunchless_day_len=MAX_LUNCHLESS_DAY_LEN,  # type: timedelta
+            lunch_len=timedelta(minutes=30),  # type: timedelta
+    ):  # type: (...) -> Optional[Tuple[datetime, datetime]]
+        """
+        Get span for a temporary lunch break if one is needed.
+
+        A temporary lunch break is needed if adding the new spans
+        would make the current date long enough to get an automatic
+        lunch break.
+        """
+        prev_total = _total_duration(self._time_blocks)
+        new_total = prev_total + sum(
+            (end - start for (start, end) in new_spans), timedelta(0))
+        if new_total < max_lunchless_day_len:
+            return None
+
+        starts = (
+            [x.start_time for x in self._time_blocks] +
+            [start for (start, _end) in new_spans])
+        ends = (
+            [x.end_time for x in self._time_blocks] +
+            [end for (_start, end) in new_spans])
+        first_start = min(starts)
+        last_end = max(ends)
+
+        before_first_start = first_start - lunch_len
+        after_last_end = last_end + lunch_len
+        if before_first_start.date() == first_start.date():
+            start = before_first_start
+            end = first_start
+        elif after_last_end.date() == last_end.date():
+            start = last_end
+            end = after_last_end
+        else:
+            raise Error('Cannot find space for temporary lunch break')
+        return (start, end)
+
+    def _check_timeblock_add(
+            self,
+            old_set,  # type: Set[TimeBlock]
+            new_set,  # type: Set[TimeBlock]
+            new_spans,  # type: List[Tuple[datetime, datetime]]
+    ):  # type: (...) -> None
+        added_blocks = new_set - old_set
+        removed_blocks = old_set - new_set
+        if len(added_blocks) != len(new_spans) or removed_blocks:
+            raise Error(
+                'Time block adding failed: added={}, removed={}'.format(
+                    added_blocks, removed_blocks))
+        added_spans = sorted((x.start_time, x.end_time) for x in added_blocks)
+        if added_spans != sorted(new_spans):
+            raise Error(
+                'Time block adding failed: expected={}, got={}'.format(
+                    ', '.join('{}--{}'.format(*x) for x in sorted(new_spans)),
+                    ', '.join('{}'.format(x) for x in added_blocks)))
+
+    def _parse_totals(self, page):  # type: (HtmlResponse) -> List[DaySummary]
+        soup = page.fragment('calendar')
+        instrumentation = self.client.instrumentation
+        start = timer() if instrumentation else 0.0
+        result = self._parse_calendar_days(soup)
+        if instrumentation:
+            instrumentation.block_parse(self._last_action, timer() - start)
+        return result
+
+    def _parse_calendar_days(
+            self,
+            soup,  # type: BeautifulSoup
+    ):  # type: (...) -> List[DaySummary]
+        container = soup.find(id='CalendarStrip')
+        if not container:
+            raise ParseError('Cannot find CalendarStrip container')
+        calendar_strip = container.find('table')
+        if not calendar_strip:
+            raise ParseError('Cannot find CalendarStrip table')
+        tds = calendar_strip.find_all('td', attrs={'onclick': True})
+        return sorted(self._parse_calendar_day(td) for td in tds)
+
+    def _parse_calendar_day(
+            self,
+            td,  # type: Tag
+    ):  # type: (...) -> DaySummary
+        def get_text(selector):
+            # type: (Text) -> Text
+            elem = td.select_one(selector)
+            return (elem.text or '').strip() if elem else ''
+
+        onclick = td.get('onclick') or ''
+        m = re.match(r".*SelectedStampingDate.value='(\d+)'", onclick)
+        if not m:
+            raise ParseError('Cannot parse date from calendar day cell')
+        day = self._parse_timestamp(m.group(1)).date()
+        description = get_text('.calendar_date_reasoncode_indicator')
+        day_text = (
+            get_text('.calendar_day_of_month') or
+            get_text('.calendar_current_day_of_month'))
+        if not day_text or not day_text.isdigit() or int(day_text) != day.day:
+            raise ParseError('Cannot parse day number of calendar cell')
+        duration_str = get_text('.calendar_date_hours')
+        if duration_str:
+            (h_str, m_str) = duration_str.split(':')
+            duration = timedelta(hours=int(h_str), minutes=int(m_str))
+        else:
+            duration = timedelta(0)
+        return DaySummary(day, duration, description)
+
+    def _parse_and_store_time_blocks(
+            self,
+            page,  # type: HtmlResponse
+    ):  # type: (...) -> List[TimeBlock]
+        day = self._parse_selected_date(page.fragment('selected_date'))
+        self._current_date = day.date()
+        soup = page.fragment('time_blocks')
+        instrumentation = self.client.instrumentation
+        start = timer() if instrumentation else 0.0
+        self._time_blocks = result = self._parse_time_blocks(soup, day)
+        if instrumentation:
+            instrumentation.block_parse(self._last_action, timer() - start)
+        self.cache.put(self._current_date, result)
+        return result
+
+    def _parse_selected_date(
+            self,
+            soup,  # type: BeautifulSoup
+    ):  # type: (...) -> datetime
+        # Parse the selected date
+        date_input = soup.find('input', attrs={'name': 'SelectedStampingDate'})
+        if not date_input:
+            raise ParseError('Cannot find selected date input element')
+        return self._parse_timestamp(date_input.get('value'))
+
+    def _parse_timestamp(self, ts):  # type: (Optional[Text]) -> datetime
+        if not ts or not ts.isdigit():
+            raise ParseError('Cannot parse timestamp: {}'.format(ts))
+        return self.client.time_converter.get_midnight(int(ts))
+
+    def _parse_time_blocks(
+            self,
+            soup,  # type: BeautifulSoup
+            day,  # type: datetime
+    ):  # type: (...) -> List[TimeBlock]
+        container = soup.select_one('.stamping_realized_stamp_scroll_box')
+        if not container:
+            raise ParseError('Cannot find time block table container')
+        time_block_table = container.find('table')
+        if not time_block_table:
+            raise ParseError('Cannot find time block table')
+        items = self._parse_tds_of_time_block_table(time_block_table)
+        converter = self.client.time_converter
+        result = [
+            _parse_time_block_item(item, day.date(), converter)
+            for item in items]
+        return result
+
+    def _parse_tds_of_time_block_table(
+            self,
+            time_block_table,  # type: Tag
+    ):  # type: (...) -> List[Dict[Text, Tag]]
+        # Parse the time block table
+        tr_elements = time_block_table.find_all('tr', recursive=False)
+        if not tr_elements:
+            raise ParseError('No header in time block table')
+        header_tr = tr_elements[0]
+        header_row = [th for th in header_tr.find_all('th', recursive=False)]
+        other_rows = [
+            [td for td in tr.find_all('td', recursive=False)]
+            for tr in tr_elements[1:]
+        ]
+        field_texts = (x.text.strip() for x in header_row)
+        header = [TIME_BLOCK_TABLE_FIELD_NAMES[x] for x in field_texts]
+        items = [dict(zip(header, row)) for row in other_rows]
+        return items
 
 
-class Connection:
+class Connection(BaseConnection):
     def __init__(
             self,
             browser,  # type: StatefulBrowser
             client,  # type: Client
+            current_date=None,  # type: Optional[date]
+            credentials=None,  # type: Optional[Tuple[Text, Text, Text]]
     ):  # type: (...) -> None
+        """
+        Initialize connection from a browser on the front page.
+
+        If current_date is given, the page of the browser only needs
+        to have the tiima form and the time blocks are fetched by
+        selecting the date, e.g. when resuming a stored session.
+
+        The credentials (username, password and customer) are used for
+        logging in again when the session expires.
+        """
+        super(Connection, self).__init__(client)
+        self.client = client  # type: Client
         self._browser = browser  # type: Optional[StatefulBrowser]
-        self.client = client
+        self.credentials = credentials
 
         self._last_response = None  # type: Optional[HtmlResponse]
+        self.debug_history = deque(
+            maxlen=client.debug_history)  # type: Deque[DebugRecord]
+        self.rate_limiter = None  # type: Optional[RateLimiter]
+        self.session_store = None  # type: Optional[SessionStore]
+        self._edit_open_needed = False
+        self._set_browser(browser)
+        if current_date:
+            self._current_date = current_date  # Restored on relogin
+            self._select_date(current_date)
+        else:
+            self._parse_front_page()
 
+    def _set_browser(self, browser):  # type: (StatefulBrowser) -> None
+        self._browser = browser
         tiima_form = browser.select_form('[name="tiima"]')
-        self._tiima_form = type(tiima_form)(copy(tiima_form.form))
+        if self.client.lean:
+            form_copy = copy_form_fields(tiima_form.form)
+        else:
+            form_copy = copy(tiima_form.form)
+        self._tiima_form = type(tiima_form)(form_copy)
         self._tiima_form_page_url = browser.get_url()
+        self._transport = create_transport(
+            self.client.transport, browser, self._tiima_form,
+            self._tiima_form_page_url, self.client.pool_maxsize)
 
+    def _parse_front_page(self):  # type: (...) -> None
         soup = self.browser.get_current_page()
         if not soup:
             raise UnexpectedResponse('Error: Got Non-HTML front page')
+        self._time_blocks = self._parse_and_store_time_blocks(
+            HtmlResponse(None, soup))
+        if self.client.lean:
+            self._drop_front_page()
 
-        self._time_blocks = []  # type: List[TimeBlock]
-        self._current_date = date(1970, 1, 1)  # type: date
-        self._time_blocks = self._parse_and_store_time_blocks(soup)
+    def _drop_front_page(self):  # type: (...) -> None
+        """
+        Replace the front page of the browser with just its logout link.
+        """
+        browser = self.browser
+        page = browser.get_current_page()
+        logout_link = page.find('a', id='Logout') if page else None
+        if logout_link:
+            browser.open_fake_page(
+                '{}'.format(logout_link), url=browser.get_url())
+
+    def _relogin(self):  # type: (...) -> None
+        """
+        Log in again and restore the selected date.
+        """
+        if not self.credentials:
+            raise SessionExpired('Session has expired')
+        selected_date = self._current_date
+        self._last_action = 'login'
+        self._wait_for_rate_limit(LOGIN_REQUEST_COUNT)
+        self._set_browser(self.client._open_session(*self.credentials))
+        self._parse_front_page()
+        if self._current_date != selected_date:
+            self._select_date(selected_date)
 
     def __enter__(self):  # type: (...) -> Connection
         return self
@@ -90,7 +588,12 @@ class Connection:
             exc_value,  # type: Optional[Exception]
             traceback,  # type: Optional[TracebackType]
     ):  # type: (...) -> None
-        self.logout()
+        if self.session_store and self._browser:
+            # Keep the session alive for the next run
+            self.session_store.save(self)
+            self._browser = None
+        else:
+            self.logout()
 
     @property
     def browser(self):  # type: (...) -> StatefulBrowser
@@ -100,9 +603,15 @@ class Connection:
 
     def logout(self):  # type: (...) -> None
         if self._browser:
-            response = self.browser.follow_link(id='Logout')
+            self._wait_for_rate_limit(LOGOUT_REQUEST_COUNT)
+            browser = self.browser
+            response = _call_browser(
+                self.client.instrumentation, 'logout',
+                (lambda: browser.follow_link(id='Logout')))
             response.raise_for_status()
             self._browser = None
+            if self.session_store:
+                self.session_store.clear()
 
     def get_totals_list(
             self,
@@ -116,34 +625,76 @@ class Connection:
         starts from the first day of month of the given start date and
         containts entries for three months in total.
         """
-        month_start = start_date.replace(day=1)
-        response = self.post_action('action_previous_month', {
-            'AjaxId': 'CalendarStrip',
-            'CalendarStripStartDate': self._date_to_timestamp(month_start),
-        })
-        return self._parse_calendar_days(response.soup)
+        response = self.post_action(
+            'action_previous_month', self._get_totals_params(start_date))
+        return self._parse_totals(response)
+
+    def get_totals_range(
+            self,
+            start,  # type: date
+            end,  # type: date
+    ):  # type: (...) -> List[DaySummary]
+        """
+        Get list of totals for each date from start to end (inclusive).
+
+        Fetches the fewest three month windows covering the range with
+        get_totals_list and stitches them to a sorted list with exactly
+        one DaySummary per date.
+        """
+        windows = [self.get_totals_list(x) for x in get_totals_windows(
+            start, end)]
+        return stitch_totals(start, end, windows)
 
     def get_time_blocks_of_date(
             self,
             day,  # type: date
     ):  # type: (...) -> List[TimeBlock]
+        cached = self.cache.get(day)
+        if cached is not None:
+            return cached
         return self._select_date(day)
 
+    def iter_time_blocks(
+            self,
+            start,  # type: date
+            end,  # type: date
+    ):  # type: (...) -> Iterator[TimeBlock]
+        """
+        Iterate time blocks of each date from start to end (inclusive).
+
+        The dates are fetched one at a time as the iteration proceeds
+        and the page of each date is dropped as soon as it is parsed,
+        so the memory use does not grow with the length of the range.
+        """
+        day = start
+        while day <= end:
+            time_blocks = self.get_time_blocks_of_date(day)
+            self._last_response = None
+            for time_block in time_blocks:
+                yield time_block
+            day += timedelta(days=1)
+
     def delete_time_block(
             self,
             block,  # type: TimeBlock
     ):  # type: (...) -> List[TimeBlock]
-        if not any(x.id == block.id for x in self._time_blocks):
-            self._select_date(block.start_time.date())
+        day = block.start_time.date()
+        known_blocks = self._time_blocks
+        if not any(x.id == block.id for x in known_blocks):
+            # Tiima deletes only the rows of the selected date
+            known_blocks = self._select_date(day)
 
-        if not any(x.id == block.id for x in self._time_blocks):
+        if not any(x.id == block.id for x in known_blocks):
             raise ValueError('Time block not found')
 
-        response = self.post_action('action_delete_selected', {
-            'SelectedRowStampId': block.id,
-        })
-        day = block.start_time.date()
-        return self._parse_blocks_or_select_date(day, response.soup)
+        def post():  # type: () -> HtmlResponse
+            return self.post_action('action_delete_selected', {
+                'SelectedRowStampId': block.id,
+            })
+
+        return self._post_checked(
+            day, post, (lambda blocks: all(x.id != block.id for x in blocks)),
+            optimistic_post=post)
 
     def add_time_block(
             self,
@@ -156,62 +707,467 @@ class Connection:
         if start.date() != self._current_date:
             self._select_date(start.date())
         old_set = set(self._time_blocks)
-        temp_lunch = self._add_temporary_lunch_if_needed(start, end)
+        temp_lunch = self._add_temporary_lunch_if_needed([(start, end)])
         result = self._add_time_block(start, end, description)
         if temp_lunch:
             result = self.delete_time_block(temp_lunch)
-        self._check_timeblock_add(old_set, set(result), start, end)
+        self._check_timeblock_add(old_set, set(result), [(start, end)])
         return result
 
-    def _ensure_tz(self, dt):  # type: (datetime) -> datetime
-        if not dt.tzinfo:
-            return self.client.tz.localize(dt)
-        return dt.astimezone(self.client.tz)
+    def add_time_blocks(
+            self,
+            blocks,  # type: Iterable[Sequence[object]]
+    ):  # type: (...) -> BatchResult
+        """
+        Add many time blocks with as few requests as possible.
+
+        The blocks are given as (start, end) or (start, end,
+        description) tuples.  They are grouped by date and the dates
+        are processed so that no date is selected more than once: the
+        currently selected date first and then the rest in ascending
+        order.  A temporary lunch break is added at most once per date
+        and the added blocks of each date are checked with a single
+        diff.
+
+        The returned BatchResult contains the resulting time blocks of
+        each touched date, the number of requests made and the number
+        of requests saved compared to calling add_time_block for each
+        block in the given order.
+        """
+        items = [self._normalize_new_block(x) for x in blocks]
+        by_date = {}  # type: Dict[date, List[Tuple[datetime, datetime, Text]]]
+        for item in items:
+            by_date.setdefault(item[0].date(), []).append(item)
+        days = sorted(by_date, key=(lambda x: (x != self._current_date, x)))
+
+        initial_date = self._current_date
+        initial_totals = {}  # type: Dict[date, timedelta]
+        request_count_before = self.request_count
+        result = OrderedDict()  # type: Dict[date, List[TimeBlock]]
+        for day in days:
+            day_items = sorted(by_date[day])
+            if day != self._current_date:
+                self._select_date(day)
+            old_set = set(self._time_blocks)
+            initial_totals[day] = _total_duration(self._time_blocks)
+            spans = [(start, end) for (start, end, _) in day_items]
+            temp_lunch = self._add_temporary_lunch_if_needed(spans)
+            for (start, end, description) in day_items:
+                day_result = self._add_time_block(start, end, description)
+            if temp_lunch:
+                day_result = self.delete_time_block(temp_lunch)
+            self._check_timeblock_add(old_set, set(day_result), spans)
+            result[day] = day_result
+
+        request_count = self.request_count - request_count_before
+        sequential_count = self._count_sequential_add_requests(
+            items, initial_date, initial_totals)
+        return BatchResult(
+            time_blocks=result,
+            request_count=request_count,
+            requests_saved=max(sequential_count - request_count, 0),
+        )
+
+    def delete_time_blocks(
+            self,
+            blocks,  # type: Iterable[TimeBlock]
+    ):  # type: (...) -> BatchResult
+        """
+        Delete many time blocks with as few requests as possible.
+
+        The blocks are grouped by date and the dates are processed so
+        that no date is selected more than once: the currently selected
+        date first and then the rest in ascending order.  The deletes
+        of each date are chained off the page returned by the previous
+        delete, which already has the remaining time blocks.
+
+        The returned BatchResult contains the resulting time blocks of
+        each touched date, the number of requests made and the number
+        of requests saved compared to calling delete_time_block for
+        each block in the given order.
+        """
+        blocks = list(blocks)
+        by_date = {}  # type: Dict[date, List[TimeBlock]]
+        for block in blocks:
+            by_date.setdefault(block.start_time.date(), []).append(block)
+        days = sorted(by_date, key=(lambda x: (x != self._current_date, x)))
+
+        sequential_count = self._count_sequential_delete_requests(
+            blocks, self._current_date)
+        request_count_before = self.request_count
+        result = OrderedDict()  # type: Dict[date, List[TimeBlock]]
+        for day in days:
+            if day != self._current_date:
+                self._select_date(day)
+            known_ids = set(x.id for x in self._time_blocks)
+            for block in by_date[day]:
+                if block.id not in known_ids:
+                    raise ValueError('Time block not found: {}'.format(block))
+            day_result = self._time_blocks
+            for block in by_date[day]:
+                day_result = self.delete_time_block(block)
+            result[day] = day_result
+
+        request_count = self.request_count - request_count_before
+        return BatchResult(
+            time_blocks=result,
+            request_count=request_count,
+            requests_saved=max(sequential_count - request_count, 0),
+        )
+
+    def clear_day(
+            self,
+            day,  # type: date
+            reason_codes=None,  # type: Optional[Iterable[Text]]
+    ):  # type: (...) -> BatchResult
+        """
+        Delete the time blocks of a date.
+
+        If reason_codes are given, e.g. ["NTYO", "LOU"] or their ids,
+        only the time blocks with those reason codes are deleted.
+        """
+        request_count_before = self.request_count
+        (time_blocks, _delete_count) = self._clear_day(day, reason_codes)
+        return BatchResult(
+            time_blocks=OrderedDict([(day, time_blocks)]),
+            request_count=(self.request_count - request_count_before),
+            requests_saved=0,
+        )
+
+    def clear_range(
+            self,
+            start,  # type: date
+            end,  # type: date
+            reason_codes=None,  # type: Optional[Iterable[Text]]
+    ):  # type: (...) -> BatchResult
+        """
+        Delete the time blocks of a date range.
+
+        Both ends of the range are inclusive.  The totals of the range
+        are fetched first and the dates with a zero total and no reason
+        code indicators are skipped, since they have no time blocks.
+        The rest are cleared like with clear_day, the currently
+        selected date first.
+
+        The requests saved are counted against selecting each date of
+        the range and deleting its blocks one by one.
+        """
+        if reason_codes is not None:
+            reason_codes = [_get_reason_code(x) for x in reason_codes]
+        initial_date = self._current_date
+        request_count_before = self.request_count
+        days = [
+            x.day for x in self.get_totals_range(start, end)
+            if x.duration or x.description]
+        days.sort(key=(lambda x: (x != self._current_date, x)))
+        result = OrderedDict()  # type: Dict[date, List[TimeBlock]]
+        sequential_count = sum(
+            1 for n in range((end - start).days + 1)
+            if start + timedelta(days=n) != initial_date)
+        for day in days:
+            (result[day], delete_count) = self._clear_day(day, reason_codes)
+            sequential_count += delete_count
+
+        request_count = self.request_count - request_count_before
+        return BatchResult(
+            time_blocks=result,
+            request_count=request_count,
+            requests_saved=max(sequential_count - request_count, 0),
+        )
+
+    def _clear_day(
+            self,
+            day,  # type: date
+            reason_codes,  # type: Optional[Iterable[Text]]
+    ):  # type: (...) -> Tuple[List[TimeBlock], int]
+        """
+        Clear a date and return its time blocks and the delete count.
+        """
+        if day == self._current_date:
+            current = self._time_blocks
+        else:
+            current = self._select_date(day)
+        blocks = _filter_by_reason_codes(current, reason_codes)
+        result = self.delete_time_blocks(blocks)
+        return (result.time_blocks.get(day, current), len(blocks))
+
+    def sync_day(
+            self,
+            day,  # type: date
+            desired_blocks,  # type: Iterable[_DesiredBlock]
+            dry_run=False,  # type: bool
+    ):  # type: (...) -> DaySync
+        """
+        Make the time blocks of a date match the desired blocks.
+
+        The desired blocks are given as TimeBlock objects or as (start,
+        end), (start, end, description) or (start, end, description,
+        reason_code) tuples, where the reason code is e.g. "NTYO" or
+        its id "1" (see REASON_CODE_IDS).  They are compared to the
+        current time blocks of the date by start, end, reason code and
+        description, and only the blocks which differ are deleted and
+        added.
+
+        Deletes are done first.  If the date will have a lunch break,
+        it is added before the other blocks, so that no temporary
+        lunch break is needed.
+
+        Returns a DaySync with the planned deletes and adds, the
+        resulting time blocks and the number of requests made.  With
+        dry_run nothing is changed and the returned plan has the number
+        of requests needed instead and None as the time blocks.  A dry
+        run may need to select the date to get its time blocks, but it
+        selects the previously selected date again afterwards.
+        """
+        selected_date = self._current_date
+        try:
+            return self._sync_day(day, desired_blocks, dry_run)
+        finally:
+            if dry_run:
+                self._reselect_date(selected_date)
+
+    def _sync_day(
+            self,
+            day,  # type: date
+            desired_blocks,  # type: Iterable[_DesiredBlock]
+            dry_run,  # type: bool
+    ):  # type: (...) -> DaySync
+        desired = [self.normalize_desired_block(x) for x in desired_blocks]
+        for spec in desired:
+            if spec.start_time.date() != day:
+                raise ValueError('Time block not on {}: {}'.format(day, spec))
+        request_count_before = self.request_count
+        if day == self._current_date:
+            current = self._time_blocks
+        else:
+            current = self.get_time_blocks_of_date(day)
+        plan = self._plan_day_sync(day, current, desired)
+        if dry_run:
+            # Count the action_select_date of getting the time blocks too
+            return plan._replace(request_count=(
+                plan.request_count +
+                self.request_count - request_count_before))
+        if not (plan.deletes or plan.adds):
+            return plan._replace(
+                request_count=(self.request_count - request_count_before),
+                time_blocks=current)
+
+        if day != self._current_date:
+            plan = self._plan_day_sync(day, self._select_date(day), desired)
+        result = self._time_blocks
+        for block in plan.deletes:
+            result = self.delete_time_block(block)
+        spans = [(x.start_time, x.end_time) for x in plan.adds]
+        temp_lunch = (
+            self._add_temporary_lunch_if_needed(spans)
+            if plan.temporary_lunch else None)
+        for spec in plan.adds:
+            result = self._add_time_block(
+                spec.start_time, spec.end_time, spec.description,
+                reason_code=spec.reason_code)
+        if temp_lunch:
+            result = self.delete_time_block(temp_lunch)
+
+        if _count_specs(_block_to_spec(x) for x in result) != (
+                _count_specs(desired)):
+            raise Error('Time block sync of {} failed: got {}'.format(
+                day, ', '.join('{}'.format(x) for x in result)))
+        return plan._replace(
+            request_count=(self.request_count - request_count_before),
+            time_blocks=result)
+
+    def sync_range(
+            self,
+            start,  # type: date
+            end,  # type: date
+            desired_blocks,  # type: Iterable[_DesiredBlock]
+            dry_run=False,  # type: bool
+    ):  # type: (...) -> List[DaySync]
+        """
+        Make the time blocks of a date range match the desired blocks.
+
+        Both ends of the range are inclusive.  The desired blocks are
+        grouped by the date of their start and each date of the range
+        is synced with sync_day, the currently selected date first.
+        Dates of the range without desired blocks are cleared.  A dry
+        run selects the previously selected date again at the end.
+        """
+        by_date = {}  # type: Dict[date, List[BlockSpec]]
+        for block in desired_blocks:
+            spec = self.normalize_desired_block(block)
+            day = spec.start_time.date()
+            if not (start <= day <= end):
+                raise ValueError('Time block not in range: {}'.format(spec))
+            by_date.setdefault(day, []).append(spec)
+        days = [
+            start + timedelta(days=n) for n in range((end - start).days + 1)]
+        selected_date = self._current_date
+        days.sort(key=(lambda x: (x != selected_date, x)))
+        try:
+            return [
+                self._sync_day(day, by_date.get(day, []), dry_run)
+                for day in days]
+        finally:
+            if dry_run:
+                self._reselect_date(selected_date)
+
+    def _reselect_date(self, day):  # type: (date) -> None
+        """
+        Select a date again, if another date got selected meanwhile.
+        """
+        if self._current_date != day:
+            self._select_date(day)
+
+    def _plan_day_sync(
+            self,
+            day,  # type: date
+            current,  # type: List[TimeBlock]
+            desired,  # type: List[BlockSpec]
+    ):  # type: (...) -> DaySync
+        unmatched = _count_specs(desired)
+        deletes = []  # type: List[TimeBlock]
+        for block in current:
+            spec = _block_to_spec(block)
+            if unmatched.get(spec, 0) > 0:
+                unmatched[spec] -= 1
+            else:
+                deletes.append(block)
+        adds = [x for x in desired if unmatched.get(x, 0) > 0]
+        for spec in adds:
+            unmatched[spec] -= 1
+        # Add lunch breaks first to avoid the automatic lunch break
+        adds.sort(key=(lambda x: (
+            x.reason_code != LUNCH_REASON_CODE, x.start_time, x.end_time)))
+
+        kept = [x for x in current if x not in deletes]
+        has_lunch = (
+            any(x.reason_code == LUNCH_REASON_CODE for x in kept) or
+            any(x.reason_code == LUNCH_REASON_CODE for x in adds))
+        new_total = _total_duration(kept) + sum(
+            (x.end_time - x.start_time for x in adds), timedelta(0))
+        temporary_lunch = bool(
+            adds and not has_lunch and new_total >= MAX_LUNCHLESS_DAY_LEN)
+
+        add_count = self._get_add_request_count()
+        request_count = (
+            len(deletes) +  # action_delete_selected
+            add_count * len(adds) +  # action_edit_open and action_save
+            (add_count + 1 if temporary_lunch else 0))  # And delete
+        if request_count and day != self._current_date:
+            request_count += 1  # action_select_date
+        return DaySync(
+            day=day,
+            deletes=deletes,
+            adds=adds,
+            temporary_lunch=temporary_lunch,
+            request_count=request_count,
+            time_blocks=None)
+
+    def normalize_desired_block(
+            self,
+            block,  # type: _DesiredBlock
+    ):  # type: (...) -> BlockSpec
+        """
+        Normalize a desired time block of sync_day to a BlockSpec.
+
+        See sync_day for the accepted forms of the block.  Naive times
+        are localized to the time zone of the client.  Raises
+        ValueError for an invalid block.
+        """
+        if isinstance(block, TimeBlock):
+            return _block_to_spec(block)._replace(
+                start_time=self._ensure_tz(block.start_time),
+                end_time=self._ensure_tz(block.end_time))
+        if len(block) == 4:
+            reason_code = _get_reason_code(block[3])
+            (start, end, description) = self._normalize_new_block(block[:3])
+        else:
+            reason_code = NORMAL_REASON_CODE
+            (start, end, description) = self._normalize_new_block(block)
+        return BlockSpec(start, end, description, reason_code)
+
+    def _normalize_new_block(
+            self,
+            block,  # type: Sequence[object]
+    ):  # type: (...) -> Tuple[datetime, datetime, Text]
+        if len(block) not in (2, 3):
+            raise ValueError('Invalid time block: {!r}'.format(block))
+        (start, end) = (block[0], block[1])
+        description = block[2] if len(block) == 3 else ''
+        if not isinstance(start, datetime) or not isinstance(end, datetime):
+            raise ValueError('Invalid time block: {!r}'.format(block))
+        if not isinstance(description, Text):
+            raise ValueError('Invalid description: {!r}'.format(description))
+        return (self._ensure_tz(start), self._ensure_tz(end), description)
+
+    def _count_sequential_add_requests(
+            self,
+            items,  # type: List[Tuple[datetime, datetime, Text]]
+            current_date,  # type: date
+            totals,  # type: Dict[date, timedelta]
+    ):  # type: (...) -> int
+        """
+        Count requests needed for adding the items one by one.
+
+        Simulates calling add_time_block for each item in the given
+        order, starting with the given current date and the given
+        initial totals of each date.
+        """
+        totals = dict(totals)
+        add_count = self._get_add_request_count()
+        count = 0
+        for (start, end, _) in items:
+            if start.date() != current_date:
+                current_date = start.date()
+                count += 1  # action_select_date
+            totals[current_date] += end - start
+            if totals[current_date] >= MAX_LUNCHLESS_DAY_LEN:
+                count += add_count + 1  # Temporary lunch and its delete
+            count += add_count  # action_edit_open and action_save
+        return count
+
+    def _count_sequential_delete_requests(
+            self,
+            blocks,  # type: List[TimeBlock]
+            current_date,  # type: date
+    ):  # type: (...) -> int
+        """
+        Count requests needed for deleting the blocks one by one.
+        """
+        count = 0
+        for block in blocks:
+            if block.start_time.date() != current_date:
+                current_date = block.start_time.date()
+                count += 1  # action_select_date
+            count += 1  # action_delete_selected
+        return count
+
+    def _get_add_request_count(self):  # type: (...) -> int
+        """
+        Get number of requests needed for adding a time block.
+        """
+        if self.client.optimistic and not self._edit_open_needed:
+            return 1  # action_save
+        return 2  # action_edit_open and action_save
 
     def _select_date(self, day):  # type: (date) -> List[TimeBlock]
-        response = self.post_action('action_select_date', {
-            'AjaxId': 'CalendarStrip',
-            'SelectedStampingDate': self._date_to_timestamp(day),
-        })
-        result = self._parse_and_store_time_blocks(response.soup)
+        response = self.post_action(
+            'action_select_date', self._get_select_date_params(day))
+        result = self._parse_and_store_time_blocks(response)
         assert self._current_date == day
         return result
 
-    def _date_to_timestamp(self, day):  # type: (date) -> Text
-        dt = self._ensure_tz(datetime.combine(day, time(0, 0)))
-        unix_time = (dt - EPOCH).total_seconds()
-        date_value = '{}'.format(int(unix_time * 1000))
-        return date_value
-
     def _add_temporary_lunch_if_needed(
             self,
-            new_start,  # type: datetime
-            new_end,  # type: datetime
-            max_lunchless_day_len=timedelta(hours=6),  # type: timedelta
+            new_spans,  # type: List[Tuple[datetime, datetime]]
+            max_lunchless_day_len=MAX_LUNCHLESS_DAY_LEN,  # type: timedelta
             lunch_len=timedelta(minutes=30),  # type: timedelta
     ):  # type: (...) -> Optional[TimeBlock]
-        prev_total = (
-            sum((x.duration for x in self._time_blocks), timedelta(0)))
-        new_total = prev_total + (new_end - new_start)
-        if new_total < max_lunchless_day_len:
+        span = self._get_temporary_lunch_span(
+            new_spans, max_lunchless_day_len, lunch_len)
+        if not span:
             return None
-
-        starts = [x.start_time for x in self._time_blocks] + [new_start]
-        ends = [x.end_time for x in self._time_blocks] + [new_end]
-        first_start = min(starts)
-        last_end = max(ends)
-
-        before_first_start = first_start - lunch_len
-        after_last_end = last_end + lunch_len
-        if before_first_start.date() == first_start.date():
-            start = before_first_start
-            end = first_start
-        elif after_last_end.date() == last_end.date():
-            start = last_end
-            end = after_last_end
-        else:
-            raise Error('Cannot find space for temporary lunch break')
-
+        (start, end) = span
         time_blocks = self._add_time_block(start, end, type='lunch')
         for tb in time_blocks:
             if tb.start_time == start and tb.end_time == end:
@@ -224,48 +1180,41 @@ class Connection:
             end,  # type: datetime
             description='',  # type: Text
             type='normal',  # type: Text
+            reason_code=None,  # type: Optional[Text]
     ):  # type: (...) -> List[TimeBlock]
-        reason_code = {'normal': '1', 'lunch': '13'}[type]
-        self.post_action('action_edit_open', {'EditPanelActive': '1'})
-        response = self.post_action('action_save', {
-            'EditPanelActive': '1',
-            'EditStartTime': '{:%H:%M}'.format(start),
-            'EditStartDate': '{:%d.%m.%Y}'.format(start),
-            'EditEndTime': '{:%H:%M}'.format(end),
-            'EditEndDate': '{:%d.%m.%Y}'.format(end),
-            'EditDescription': description,
-            'EditStampType': '0',
-            'EditReasonCodeId': reason_code,
-        })
-        return self._parse_blocks_or_select_date(start.date(), response.soup)
+        reason_code = reason_code or {
+            'normal': NORMAL_REASON_CODE,
+            'lunch': LUNCH_REASON_CODE,
+        }[type]
+        params = self._get_save_params(start, end, description, reason_code)
+        old_set = set(self._time_blocks)
+        optimistic = self.client.optimistic and not self._edit_open_needed
 
-    def _check_timeblock_add(
-            self,
-            old_set,  # type: Set[TimeBlock]
-            new_set,  # type: Set[TimeBlock]
-            new_block_start,  # type: datetime
-            new_block_end,  # type: datetime
-    ):  # type: (...) -> None
-        added_blocks = new_set - old_set
-        removed_blocks = old_set - new_set
-        if len(added_blocks) != 1 or removed_blocks:
-            raise Error(
-                'Time block adding failed: added={}, removed={}'.format(
-                    added_blocks, removed_blocks))
-        tb = list(added_blocks)[0]
-        if tb.start_time != new_block_start or tb.end_time != new_block_end:
-            raise Error(
-                'Time block adding failed: expected={}--{}, got={}'.format(
-                    new_block_start, new_block_end, tb))
+        def save():  # type: () -> HtmlResponse
+            return self.post_action('action_save', params)
+
+        def post():  # type: () -> HtmlResponse
+            if optimistic:
+                # Saving without opening the edit panel did not work
+                self._edit_open_needed = True
+            self.post_action('action_edit_open', {'EditPanelActive': '1'})
+            return save()
+
+        def is_applied(blocks):  # type: (List[TimeBlock]) -> bool
+            return _has_new_block(blocks, old_set, start, end, reason_code)
+
+        return self._post_checked(
+            start.date(), post, is_applied,
+            optimistic_post=(save if optimistic else None))
 
     def _parse_blocks_or_select_date(
             self,
             day,  # type: date
-            soup,  # type: BeautifulSoup
+            page,  # type: HtmlResponse
     ):  # type: (...) -> List[TimeBlock]
-        soup_date = self._parse_selected_date(soup)
-        if soup_date == day:
-            return self._parse_and_store_time_blocks(soup)
+        page_date = self._parse_selected_date(page.fragment('selected_date'))
+        if page_date.date() == day:
+            return self._parse_and_store_time_blocks(page)
         else:
             return self._select_date(day)
 
@@ -280,6 +1229,11 @@ class Connection:
         The tiima form already has quite much prefilled data and
         additional field data can be passed with the params argument.
 
+        If the session has expired, logs in again with the credentials
+        of the connection.  Idempotent actions are retried on expired
+        sessions, server errors and connection failures, the rest
+        raise SessionExpired or TransientError after logging in again.
+
         The fields in the tiima form are:
 
             <input name="FieldAction" type="hidden" value=""/>
@@ -312,119 +1266,132 @@ class Connection:
             <input name="lmi" type="hidden" value=""/>
             <input name="DebugDeleteRawStampId" type="hidden" value=""/>
         """
-        form = type(self._tiima_form)(copy(self._tiima_form.form))
-        form.new_control('text', 'AjaxRequest', '1')
-        form['FieldAction'] = action
-        form['UserLanguage'] = '3'  # 1 = Finnish, 2 = Swedish, 3 = English
-        for (name, value) in params.items():
+        retries = 0
+        while True:
             try:
-                form.set(name, value, force=True)
-            except LinkNotFoundError:
-                form.new_control('text', name, value=value)
-        response = self.browser.submit(form, url=self._tiima_form_page_url)
+                return self._post_action(action, params)
+            except (SessionExpired, TransientError) as error:
+                if isinstance(error, SessionExpired):
+                    self._relogin()
+                if (action not in IDEMPOTENT_ACTIONS or
+                        retries >= self.client.max_retries):
+                    raise
+                retries += 1
+                if isinstance(error, TransientError):
+                    self._sleep_before_retry(retries)
+
+    def _post_action(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> HtmlResponse
+        self._wait_for_rate_limit()
+        instrumentation = self.client.instrumentation
+        self._last_action = action
+        start = timer() if instrumentation else 0.0
+        try:
+            response = self._transport.post(action, params)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            raise TransientError('{} failed: {}'.format(action, error))
+        if instrumentation:
+            instrumentation.request(
+                action, timer() - start, len(response.content))
+        self.request_count += 1
+        if response.status_code >= 500:
+            raise TransientError('{} failed: HTTP {}'.format(
+                action, response.status_code))
         response.raise_for_status()
-        self._last_response = result = HtmlResponse.from_response(response)
+        if is_login_page(response):
+            raise SessionExpired('Session has expired')
+        parser = self.client.parser
+        if not parser:
+            start = timer() if instrumentation else 0.0
+            self.browser.add_soup(response, self.browser.soup_config)
+            if instrumentation:
+                instrumentation.html_parse(action, timer() - start)
+        elif instrumentation:
+            parser = TimedParser(parser, instrumentation, action)
+        result = HtmlResponse.from_response(response, parser)
+        if self.client.debug_history:
+            self.debug_history.append(DebugRecord(
+                action, response.status_code, response.url, response.content))
+        if not self.client.lean:
+            self._last_response = result
         return result
 
-    def _parse_calendar_days(
-            self,
-            soup,  # type: BeautifulSoup
-    ):  # type: (...) -> List[DaySummary]
-        container = soup.find(id='CalendarStrip')
-        if not container:
-            raise ParseError('Cannot find CalendarStrip container')
-        calendar_strip = container.find('table')
-        if not calendar_strip:
-            raise ParseError('Cannot find CalendarStrip table')
-        tds = calendar_strip.find_all('td', attrs={'onclick': True})
-        return sorted(self._parse_calendar_day(td) for td in tds)
+    def _wait_for_rate_limit(self, request_count=1):  # type: (int) -> None
+        if self.rate_limiter:
+            for _ in range(request_count):
+                self.rate_limiter.wait()
 
-    def _parse_calendar_day(
-            self,
-            td,  # type: Tag
-    ):  # type: (...) -> DaySummary
-        def get_text(selector):
-            # type: (Text) -> Text
-            elem = td.select_one(selector)
-            return (elem.text or '').strip() if elem else ''
+    def _sleep_before_retry(self, retries):  # type: (int) -> None
+        _time.sleep(self._get_retry_delay(retries))
 
-        onclick = td.get('onclick') or ''
-        m = re.match(r".*SelectedStampingDate.value='(\d+)'", onclick)
-        if not m:
-            raise ParseError('Cannot parse date from calendar day cell')
-        day = self._parse_timestamp(m.group(1)).date()
-        description = get_text('.calendar_date_reasoncode_indicator')
-        day_text = (
-            get_text('.calendar_day_of_month') or
-            get_text('.calendar_current_day_of_month'))
-        if not day_text or not day_text.isdigit() or int(day_text) != day.day:
-            raise ParseError('Cannot parse day number of calendar cell')
-        duration_str = get_text('.calendar_date_hours')
-        if duration_str:
-            (h_str, m_str) = duration_str.split(':')
-            duration = timedelta(hours=int(h_str), minutes=int(m_str))
-        else:
-            duration = timedelta(0)
-        return DaySummary(day, duration, description)
-
-    def _parse_and_store_time_blocks(
+    def _post_checked(
             self,
-            soup,  # type: BeautifulSoup
+            day,  # type: date
+            post,  # type: Callable[[], HtmlResponse]
+            is_applied,  # type: Callable[[List[TimeBlock]], bool]
+            optimistic_post=None,  # type: Optional[Callable[[], HtmlResponse]]
     ):  # type: (...) -> List[TimeBlock]
-        day = self._parse_selected_date(soup)
-        self._current_date = day.date()
-        self._time_blocks = result = self._parse_time_blocks(soup, day)
-        return result
-
-    def _parse_selected_date(
-            self,
-            soup,  # type: BeautifulSoup
-    ):  # type: (...) -> datetime
-        # Parse the selected date
-        date_input = soup.find('input', attrs={'name': 'SelectedStampingDate'})
-        if not date_input:
-            raise ParseError('Cannot find selected date input element')
-        return self._parse_timestamp(date_input.get('value'))
+        """
+        Post a non-idempotent change and return the time blocks of day.
 
-    def _parse_timestamp(self, ts):  # type: (Optional[Text]) -> datetime
-        if not ts or not ts.isdigit():
-            raise ParseError('Cannot parse timestamp: {}'.format(ts))
-        utc_datetime = EPOCH + timedelta(seconds=(int(ts) / 1000.0))
-        return utc_datetime.astimezone(self.client.tz)
+        If the outcome of the post is not known, because of an expired
+        session, a server error or a connection failure, the date is
+        selected again and the post is retried only if is_applied
+        tells the change is not in the time blocks.
 
-    def _parse_time_blocks(
+        In optimistic mode the optimistic_post is tried first, if it is
+        given.  See _post_optimistic.
+        """
+        if optimistic_post and self.client.optimistic:
+            time_blocks = self._post_optimistic(
+                day, optimistic_post, is_applied)
+            if time_blocks is not None:
+                return time_blocks
+        retries = 0
+        while True:
+            try:
+                response = post()
+            except (SessionExpired, TransientError):
+                if retries >= self.client.max_retries:
+                    raise
+                retries += 1
+                time_blocks = self._select_date(day)
+                if is_applied(time_blocks):
+                    return time_blocks
+                self._sleep_before_retry(retries)
+                continue
+            return self._parse_blocks_or_select_date(day, response)
+
+    def _post_optimistic(
             self,
-            soup,  # type: BeautifulSoup
-            day,  # type: datetime
-    ):  # type: (...) -> List[TimeBlock]
-        container = soup.select_one('.stamping_realized_stamp_scroll_box')
-        if not container:
-            raise ParseError('Cannot find time block table container')
-        time_block_table = container.find('table')
-        if not time_block_table:
-            raise ParseError('Cannot find time block table')
-        items = self._parse_tds_of_time_block_table(time_block_table)
-        result = [_parse_time_block_item(item, day) for item in items]
-        return result
+            day,  # type: date
+            post,  # type: Callable[[], HtmlResponse]
+            is_applied,  # type: Callable[[List[TimeBlock]], bool]
+    ):  # type: (...) -> Optional[List[TimeBlock]]
+        """
+        Post a change and trust the returned page of the date.
 
-    def _parse_tds_of_time_block_table(
-            self,
-            time_block_table,  # type: Tag
-    ):  # type: (...) -> List[Dict[Text, Tag]]
-        # Parse the time block table
-        tr_elements = time_block_table.find_all('tr', recursive=False)
-        if not tr_elements:
-            raise ParseError('No header in time block table')
-        header_tr = tr_elements[0]
-        header_row = [th for th in header_tr.find_all('th', recursive=False)]
-        other_rows = [
-            [td for td in tr.find_all('td', recursive=False)]
-            for tr in tr_elements[1:]
-        ]
-        field_texts = (x.text.strip() for x in header_row)
-        header = [TIME_BLOCK_TABLE_FIELD_NAMES[x] for x in field_texts]
-        items = [dict(zip(header, row)) for row in other_rows]
-        return items
+        Returns the time blocks of the page if they show the change, or
+        None if they do not.  The date is selected again to check the
+        change only if the outcome is not known or the returned page is
+        of another date, which the callers avoid by selecting the date
+        first.
+        """
+        try:
+            page = post()
+        except (SessionExpired, TransientError):
+            page = None
+        if page is not None:
+            page_date = self._parse_selected_date(
+                page.fragment('selected_date')).date()
+            time_blocks = self._parse_and_store_time_blocks(page)
+            if page_date == day:
+                return time_blocks if is_applied(time_blocks) else None
+        time_blocks = self._select_date(day)
+        return time_blocks if is_applied(time_blocks) else None
 
 
 TIME_BLOCK_TABLE_FIELD_NAMES = {
@@ -447,9 +1414,128 @@ TIME_BLOCK_TABLE_FIELD_NAMES = {
 }
 
 
+def _call_browser(
+        instrumentation,  # type: Optional[Instrumentation]
+        action,  # type: Text
+        call,  # type: Callable[[], requests.Response]
+):  # type: (...) -> requests.Response
+    """
+    Call the browser and report the requests made to instrumentation.
+
+    The browser follows redirects and builds the soup itself, so the
+    network time is taken from the elapsed times of the responses and
+    the rest of the time is counted as HTML parse time.
+    """
+    if not instrumentation:
+        return call()
+    start = timer()
+    response = call()
+    duration = timer() - start
+    network_time = 0.0
+    for r in list(response.history) + [response]:
+        elapsed = r.elapsed.total_seconds()
+        network_time += elapsed
+        instrumentation.request(action, elapsed, len(r.content))
+    instrumentation.html_parse(action, max(duration - network_time, 0.0))
+    return response
+
+
+def get_totals_windows(start, end):  # type: (date, date) -> List[date]
+    """
+    Get start dates of the totals windows covering the given range.
+
+    Each window of get_totals_list covers three months starting from
+    the first day of the month of its start date.
+    """
+    result = []  # type: List[date]
+    window_start = start.replace(day=1)
+    while window_start <= end:
+        result.append(window_start)
+        (years, month) = divmod(window_start.month + 2, 12)
+        window_start = date(window_start.year + years, month + 1, 1)
+    return result
+
+
+def stitch_totals(
+        start,  # type: date
+        end,  # type: date
+        windows,  # type: Iterable[Iterable[DaySummary]]
+):  # type: (...) -> List[DaySummary]
+    """
+    Stitch totals windows to a gap-free list of totals of a range.
+
+    Days outside of the range and overlapping days are dropped.  A
+    ParseError is raised if the windows miss any day of the range.
+    """
+    by_date = {}  # type: Dict[date, DaySummary]
+    for window in windows:
+        for summary in window:
+            if start <= summary.day <= end:
+                by_date.setdefault(summary.day, summary)
+    expected_count = (end - start).days + 1
+    if len(by_date) != expected_count:
+        missing = [
+            start + timedelta(days=n) for n in range(expected_count)
+            if start + timedelta(days=n) not in by_date]
+        raise ParseError('Totals missing for {}'.format(
+            ', '.join('{}'.format(x) for x in missing)))
+    return [by_date[x] for x in sorted(by_date)]
+
+
+def _get_reason_code(value):  # type: (object) -> Text
+    """
+    Get reason code (e.g. "NTYO") of a reason code or its id (e.g. "1").
+    """
+    for (code, code_id) in REASON_CODE_IDS.items():
+        if value in (code, code_id):
+            return code
+    raise ValueError('Invalid reason code: {!r}'.format(value))
+
+
+def _filter_by_reason_codes(
+        blocks,  # type: List[TimeBlock]
+        reason_codes,  # type: Optional[Iterable[Text]]
+):  # type: (...) -> List[TimeBlock]
+    if reason_codes is None:
+        return list(blocks)
+    codes = set(_get_reason_code(x) for x in reason_codes)
+    return [x for x in blocks if x.reason_code in codes]
+
+
+def _block_to_spec(block):  # type: (TimeBlock) -> BlockSpec
+    return BlockSpec(
+        block.start_time, block.end_time,
+        block.description, block.reason_code)
+
+
+def _count_specs(specs):  # type: (Iterable[BlockSpec]) -> Dict[BlockSpec, int]
+    result = {}  # type: Dict[BlockSpec, int]
+    for spec in specs:
+        result[spec] = result.get(spec, 0) + 1
+    return result
+
+
+def _has_new_block(
+        blocks,  # type: Iterable[TimeBlock]
+        old_blocks,  # type: Set[TimeBlock]
+        start,  # type: datetime
+        end,  # type: datetime
+        reason_code,  # type: Text
+):  # type: (...) -> bool
+    return any(
+        x.start_time == start and x.end_time == end and
+        x.reason_code == reason_code and x not in old_blocks
+        for x in blocks)
+
+
+def _total_duration(blocks):  # type: (Iterable[TimeBlock]) -> timedelta
+    return sum((x.duration for x in blocks), timedelta(0))
+
+
 def _parse_time_block_item(
         item,  # type: Dict[Text, Tag]
-        day,  # type: datetime
+        day,  # type: date
+        converter,  # type: TimeConverter
 ):  # type: (...) -> TimeBlock
     def get_text(td):  # type: (Tag) -> Text
         text = td.text.strip() or td.get('title')
@@ -466,36 +1552,7 @@ def _parse_time_block_item(
     (text, code) = reason.rstrip(')').rsplit('(', 1)
 
     times_str = data.pop('time_range')
-    m = re.match((
-        r'(\((?P<start_date>[0-9.]+)\) )?'
-        r'(?P<start>[0-9:]+)-(?P<end>[0-9:]+)'
-        r'( \((?P<end_date>[0-9.]+)\))?'), times_str)
-    if not m:
-        raise ParseError('Cannot parse times: {}'.format(times_str))
-
-    start = datetime.strptime(m.group(str('start')), '%H:%M').time()
-    end = datetime.strptime(m.group(str('end')), '%H:%M').time()
-
-    start_time = day + timedelta(hours=start.hour, minutes=start.minute)
-    end_time = day + timedelta(hours=end.hour, minutes=end.minute)
-
-    if m.group(str('start_date')):
-        sd = datetime.strptime(m.group(str('start_date')), '%d.%m.').date()
-        year_delta = 1 if (sd.month == 12 and start_time.month == 1) else 0
-        start_time = start_time.replace(
-            year=(start_time.year - year_delta),
-            month=sd.month,
-            day=sd.day,
-        )
-
-    if m.group(str('end_date')):
-        ed = datetime.strptime(m.group(str('end_date')), '%d.%m.').date()
-        year_delta = 1 if (ed.month == 1 and end_time.month == 12) else 0
-        end_time = end_time.replace(
-            year=(end_time.year + year_delta),
-            month=ed.month,
-            day=ed.day,
-        )
+    (start_time, end_time) = converter.parse_time_range(times_str, day)
 
     return TimeBlock(
         id=Text(id_value),
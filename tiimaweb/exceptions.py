@@ -12,3 +12,11 @@ class ParseError(Error):
 
 class UnexpectedResponse(Error):
     pass
+
+
+class SessionExpired(Error):
+    pass
+
+
+class TransientError(Error):
+    pass
@@ -0,0 +1,98 @@
+"""
+Streaming export of time blocks as CSV or JSON Lines.
+
+The writers consume an iterable of time blocks and write each block as
+soon as it is received, so they can be fed with iter_time_blocks to
+export any range in constant memory:
+
+  blocks = connection.iter_time_blocks(date(2020, 1, 1), date(2020, 12, 31))
+  write_csv(blocks, sys.stdout)
+"""
+from __future__ import unicode_literals
+
+import csv
+import json
+from collections import OrderedDict
+from typing import IO, Any, Callable, Dict, Iterable, List, Text
+
+import six
+
+from .types import TimeBlock
+
+FIELDS = [
+    'id',
+    'start_time',
+    'end_time',
+    'duration',
+    'reason_code',
+    'reason_text',
+    'status',
+    'description',
+]
+
+
+def get_export_values(time_block):  # type: (TimeBlock) -> List[Text]
+    """
+    Get values of the exported fields of a time block as text.
+
+    The times are in ISO 8601 format and the duration is in minutes.
+    """
+    return [
+        time_block.id,
+        time_block.start_time.isoformat(),
+        time_block.end_time.isoformat(),
+        '{}'.format(int(time_block.duration.total_seconds() // 60)),
+        time_block.reason_code,
+        time_block.reason_text,
+        time_block.status,
+        time_block.description,
+    ]
+
+
+def write_csv(
+        time_blocks,  # type: Iterable[TimeBlock]
+        fp,  # type: IO[Any]
+):  # type: (...) -> int
+    """
+    Write the time blocks as CSV with a header row.
+
+    Returns the number of time blocks written.
+    """
+    writer = csv.writer(fp)
+    writer.writerow(_encode_row(FIELDS))
+    count = 0
+    for time_block in time_blocks:
+        writer.writerow(_encode_row(get_export_values(time_block)))
+        count += 1
+    return count
+
+
+def write_jsonl(
+        time_blocks,  # type: Iterable[TimeBlock]
+        fp,  # type: IO[Any]
+):  # type: (...) -> int
+    """
+    Write the time blocks as JSON objects, one per line.
+
+    Returns the number of time blocks written.
+    """
+    count = 0
+    for time_block in time_blocks:
+        item = OrderedDict()  # type: Dict[Text, object]
+        for (name, value) in zip(FIELDS, get_export_values(time_block)):
+            item[name] = int(value) if name == 'duration' else value
+        fp.write(json.dumps(item, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def _encode_row(values):  # type: (List[Text]) -> List[Any]
+    if six.PY2:  # The csv module of Python 2 handles only bytes
+        return [x.encode('utf-8') for x in values]
+    return values
+
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+}  # type: Dict[Text, Callable[[Iterable[TimeBlock], IO[Any]], int]]
@@ -0,0 +1,399 @@
+"""
+Running operations for many accounts over a process pool.
+
+A job file lists the accounts and the operations to run for each of
+them as JSON:
+
+  {
+    "url": "https://www.tiima.com",
+    "accounts": [
+      {
+        "username": "alice",
+        "password_env": "ALICE_PASSWORD",
+        "customer": "acme",
+        "operations": [
+          {"op": "fetch_range", "start": "2020-01-01", "end": "2020-01-31"},
+          {"op": "totals", "start": "2020-01-01", "end": "2020-03-31"},
+          {"op": "sync_range", "start": "2020-02-03", "end": "2020-02-04",
+           "blocks": [["2020-02-03T08:00", "2020-02-03T16:00", "Work"]]}
+        ]
+      }
+    ]
+  }
+
+The password is given either directly with "password" or with the
+name of an environment variable in "password_env".  The url can also
+be given per account.
+
+Each account is run in a worker process with a Connection of its own
+and the operations of the account are run in order.  A failing
+account does not affect the others: its error is reported in its
+AccountResult.  The number of accounts run at the same time and the
+request rates can be capped per server URL and per customer:
+
+  fleet = Fleet(processes=8, max_accounts_per_customer=2,
+                max_rate_per_url=20.0)
+  report = fleet.run(load_jobs('jobs.json'))
+  print(report)  # 100 accounts (0 failed), ... requests/s
+"""
+from __future__ import unicode_literals
+
+import json
+import multiprocessing
+import os
+from collections import deque
+from datetime import date, datetime
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Text,
+    Tuple,
+)
+
+from six.moves import queue
+
+from .client import (
+    FAILED_LOGIN_REQUEST_COUNT,
+    LOGIN_REQUEST_COUNT,
+    LOGOUT_REQUEST_COUNT,
+    Client,
+    Connection,
+)
+from .exceptions import LoginFailed
+from .export import FIELDS, get_export_values
+from .instrumentation import timer
+from .ratelimit import ChainedRateLimiter, ProcessRateLimiter, RateLimiter
+from .types import AccountJob, AccountResult, FleetReport
+
+DEFAULT_URL = 'https://www.tiima.com'
+
+#: Names of the supported operations
+OPERATIONS = ('fetch_range', 'totals', 'sync_range')
+
+#: Seconds between checks for account jobs which failed in the pool
+POLL_INTERVAL = 0.5
+
+_LimiterKey = Tuple[Text, ...]
+
+# State of the worker processes, set by _init_worker
+_worker_limiters = {}  # type: Dict[_LimiterKey, RateLimiter]
+_worker_client_options = {}  # type: Dict[str, Any]
+_worker_clients = {}  # type: Dict[Text, Client]
+
+
+class Fleet(object):
+    """
+    Runner of account jobs over a process pool.
+
+    At most max_accounts_per_url accounts of the same server and
+    max_accounts_per_customer accounts of the same customer are run at
+    the same time.  The request rates (requests per second) of all the
+    processes are capped by max_rate_per_url and max_rate_per_customer.
+    The client_options are passed to the Client of each worker.
+    """
+    def __init__(
+            self,
+            processes=4,  # type: int
+            max_accounts_per_url=None,  # type: Optional[int]
+            max_accounts_per_customer=None,  # type: Optional[int]
+            max_rate_per_url=None,  # type: Optional[float]
+            max_rate_per_customer=None,  # type: Optional[float]
+            client_options=None,  # type: Optional[Dict[str, Any]]
+    ):  # type: (...) -> None
+        if processes < 1:
+            raise ValueError('Number of processes must be at least 1')
+        for (name, limit) in [
+                ('accounts per URL', max_accounts_per_url),
+                ('accounts per customer', max_accounts_per_customer)]:
+            if limit is not None and limit < 1:
+                raise ValueError(
+                    'Maximum number of {} must be at least 1'.format(name))
+        self.processes = processes
+        self.max_accounts_per_url = max_accounts_per_url
+        self.max_accounts_per_customer = max_accounts_per_customer
+        self.max_rate_per_url = max_rate_per_url
+        self.max_rate_per_customer = max_rate_per_customer
+        self.client_options = client_options or {}
+
+    def run(
+            self,
+            jobs,  # type: Iterable[AccountJob]
+            callback=None,  # type: Optional[Callable[[AccountResult], None]]
+    ):  # type: (...) -> FleetReport
+        """
+        Run the jobs and return a report of their results.
+
+        The callback, if given, is called with the result of each
+        account as soon as it is finished.  The results of the report
+        are in the order of the jobs.
+        """
+        jobs = list(jobs)
+        start = timer()
+        results = [None] * len(jobs)  # type: List[Optional[AccountResult]]
+        pending = deque(enumerate(jobs))  # type: Deque[Tuple[int, AccountJob]]
+        running = {}  # type: Dict[_LimiterKey, int]
+        started = {}  # type: Dict[int, Tuple[Any, float]]
+        done = queue.Queue()  # type: queue.Queue[Tuple[int, AccountResult]]
+        pool = multiprocessing.Pool(
+            self.processes, _init_worker,
+            (self._create_rate_limiters(jobs), self.client_options))
+        try:
+            active = 0
+            while pending or active:
+                for (index, job) in list(pending):
+                    if active >= self.processes:
+                        break
+                    if not self._can_start(job, running):
+                        continue
+                    pending.remove((index, job))
+                    self._count_running(job, running, 1)
+                    active += 1
+                    async_result = pool.apply_async(
+                        run_account_job, (job,),
+                        callback=_put_with_index(done, index))
+                    started[index] = (async_result, timer())
+                (index, result) = _wait_for_result(done, started, jobs)
+                del started[index]
+                active -= 1
+                self._count_running(jobs[index], running, -1)
+                results[index] = result
+                if callback:
+                    callback(result)
+        finally:
+            pool.terminate()
+            pool.join()
+        return FleetReport(
+            results=[x for x in results if x is not None],
+            duration=(timer() - start))
+
+    def _can_start(
+            self,
+            job,  # type: AccountJob
+            running,  # type: Dict[_LimiterKey, int]
+    ):  # type: (...) -> bool
+        for (key, limit) in [
+                (_url_key(job), self.max_accounts_per_url),
+                (_customer_key(job), self.max_accounts_per_customer)]:
+            if limit is not None and running.get(key, 0) >= limit:
+                return False
+        return True
+
+    def _count_running(
+            self,
+            job,  # type: AccountJob
+            running,  # type: Dict[_LimiterKey, int]
+            delta,  # type: int
+    ):  # type: (...) -> None
+        for key in [_url_key(job), _customer_key(job)]:
+            running[key] = running.get(key, 0) + delta
+
+    def _create_rate_limiters(
+            self,
+            jobs,  # type: List[AccountJob]
+    ):  # type: (...) -> Dict[_LimiterKey, RateLimiter]
+        limiters = {}  # type: Dict[_LimiterKey, RateLimiter]
+        for job in jobs:
+            for (key, rate) in [
+                    (_url_key(job), self.max_rate_per_url),
+                    (_customer_key(job), self.max_rate_per_customer)]:
+                if rate is not None and key not in limiters:
+                    limiters[key] = ProcessRateLimiter(rate)
+        return limiters
+
+
+def load_jobs(path):  # type: (Text) -> List[AccountJob]
+    """
+    Load account jobs from a JSON job file.
+    """
+    with open(path) as fp:
+        data = json.load(fp)
+    default_url = data.get('url', DEFAULT_URL)
+    jobs = []
+    for account in data['accounts']:
+        password = account.get('password')
+        if password is None:
+            password = os.environ.get(account['password_env'])
+            if password is None:
+                raise ValueError('Environment variable {} is not set'.format(
+                    account['password_env']))
+        operations = account.get('operations', [])
+        for operation in operations:
+            if operation.get('op') not in OPERATIONS:
+                raise ValueError('Unknown operation: {}'.format(
+                    operation.get('op')))
+        jobs.append(AccountJob(
+            url=account.get('url', default_url),
+            username=account['username'],
+            password=password,
+            customer=account['customer'],
+            operations=operations))
+    return jobs
+
+
+def run_account_job(job):  # type: (AccountJob) -> AccountResult
+    """
+    Run the operations of a single account in a worker process.
+
+    All errors are caught and reported in the result.  The request
+    count includes the requests of the login, also when it fails with
+    wrong credentials, and the logout.
+    """
+    start = timer()
+    results = []  # type: List[Dict[Text, Any]]
+    connection = None  # type: Optional[Connection]
+    error = None  # type: Optional[Text]
+    request_count = 0
+    try:
+        connection = _login(job)
+        request_count += LOGIN_REQUEST_COUNT
+        for operation in job.operations:
+            results.append(_run_operation(connection, operation))
+    except Exception as exception:
+        if connection is None and isinstance(exception, LoginFailed):
+            request_count += FAILED_LOGIN_REQUEST_COUNT
+        error = _format_error(exception)
+    finally:
+        if connection:
+            request_count += connection.request_count
+            try:
+                connection.logout()
+            except Exception:
+                pass  # The results are already in
+            request_count += LOGOUT_REQUEST_COUNT
+    return AccountResult(
+        url=job.url,
+        username=job.username,
+        customer=job.customer,
+        results=results,
+        error=error,
+        request_count=request_count,
+        duration=(timer() - start))
+
+
+def _login(job):  # type: (AccountJob) -> Connection
+    client = _worker_clients.get(job.url)
+    if not client:
+        client = _worker_clients[job.url] = Client(
+            url=job.url, **_worker_client_options)
+    limiters = [
+        _worker_limiters[key] for key in [_url_key(job), _customer_key(job)]
+        if key in _worker_limiters]
+    rate_limiter = ChainedRateLimiter(limiters) if limiters else None
+    if rate_limiter:
+        for _ in range(LOGIN_REQUEST_COUNT):
+            rate_limiter.wait()
+    connection = client.login(job.username, job.password, job.customer)
+    connection.rate_limiter = rate_limiter
+    return connection
+
+
+def _run_operation(
+        connection,  # type: Connection
+        operation,  # type: Dict[Text, Any]
+):  # type: (...) -> Dict[Text, Any]
+    name = operation['op']
+    start = _parse_date(operation['start'])
+    end = _parse_date(operation['end'])
+    result = {'op': name}  # type: Dict[Text, Any]
+    if name == 'fetch_range':
+        result['time_blocks'] = [
+            dict(zip(FIELDS, get_export_values(x)))
+            for x in connection.iter_time_blocks(start, end)]
+    elif name == 'totals':
+        result['days'] = [{
+            'day': x.day.isoformat(),
+            'duration': int(x.duration.total_seconds() // 60),
+            'description': x.description,
+        } for x in connection.get_totals_range(start, end)]
+    elif name == 'sync_range':
+        blocks = [
+            [_parse_datetime(x[0]), _parse_datetime(x[1])] + list(x[2:])
+            for x in operation.get('blocks', [])]
+        day_syncs = connection.sync_range(
+            start, end, blocks, dry_run=operation.get('dry_run', False))
+        result['changed_days'] = [
+            x.day.isoformat() for x in day_syncs if x.deletes or x.adds]
+        result['deletes'] = sum(len(x.deletes) for x in day_syncs)
+        result['adds'] = sum(len(x.adds) for x in day_syncs)
+    else:
+        raise ValueError('Unknown operation: {}'.format(name))
+    return result
+
+
+def _init_worker(
+        limiters,  # type: Dict[_LimiterKey, RateLimiter]
+        client_options,  # type: Dict[str, Any]
+):  # type: (...) -> None
+    _worker_limiters.clear()
+    _worker_limiters.update(limiters)
+    _worker_client_options.clear()
+    _worker_client_options.update(client_options)
+    _worker_clients.clear()
+
+
+def _wait_for_result(
+        done,  # type: queue.Queue[Tuple[int, AccountResult]]
+        started,  # type: Dict[int, Tuple[Any, float]]
+        jobs,  # type: List[AccountJob]
+):  # type: (...) -> Tuple[int, AccountResult]
+    """
+    Wait for the result of the next finished account job.
+
+    A job which failed in the pool instead of returning a result, e.g.
+    because its result could not be pickled, is not passed to the
+    callback of apply_async, so the started jobs are checked for
+    failures while waiting.  Its error is reported in a failed result.
+    """
+    while True:
+        try:
+            return done.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            pass
+        for (index, (async_result, start)) in sorted(started.items()):
+            if async_result.ready() and not async_result.successful():
+                try:
+                    async_result.get()
+                    error = 'Account job failed'  # type: Text
+                except Exception as exception:
+                    error = _format_error(exception)
+                job = jobs[index]
+                return (index, AccountResult(
+                    url=job.url,
+                    username=job.username,
+                    customer=job.customer,
+                    results=[],
+                    error=error,
+                    request_count=0,
+                    duration=(timer() - start)))
+
+
+def _format_error(exception):  # type: (Exception) -> Text
+    return '{}: {}'.format(type(exception).__name__, exception)
+
+
+def _put_with_index(
+        results,  # type: queue.Queue[Tuple[int, AccountResult]]
+        index,  # type: int
+):  # type: (...) -> Callable[[AccountResult], None]
+    return (lambda result: results.put((index, result)))
+
+
+def _url_key(job):  # type: (AccountJob) -> _LimiterKey
+    return ('url', job.url)
+
+
+def _customer_key(job):  # type: (AccountJob) -> _LimiterKey
+    return ('customer', job.url, job.customer)
+
+
+def _parse_date(text):  # type: (Text) -> date
+    return datetime.strptime(text, '%Y-%m-%d').date()
+
+
+def _parse_datetime(text):  # type: (Text) -> datetime
+    return datetime.strptime(text, '%Y-%m-%dT%H:%M')
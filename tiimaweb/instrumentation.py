@@ -0,0 +1,223 @@
+"""
+Instrumentation of the requests and parsing done by the client.
+
+Pass an Instrumentation object to the Client to collect statistics of
+each request and parse, and optionally to get called back with each
+event.  The measure context manager groups the statistics of a block
+of code, e.g. a single high-level call:
+
+  instrumentation = Instrumentation()
+  client = Client(instrumentation=instrumentation)
+  with client.login(username, password, customer) as tiima:
+      with instrumentation.measure('add_time_block') as stats:
+          tiima.add_time_block(start, end)
+      print(stats)  # add_time_block: 5 requests, 1.2 s network, ...
+
+Without instrumentation the client skips all the bookkeeping.
+"""
+from __future__ import unicode_literals
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from timeit import default_timer
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Text,
+)
+
+from bs4 import BeautifulSoup
+
+from .parsing import SoupParser
+
+REQUEST = 'request'
+HTML_PARSE = 'html_parse'
+BLOCK_PARSE = 'block_parse'
+
+Event = NamedTuple('Event', [
+    ('kind', Text),  # REQUEST, HTML_PARSE or BLOCK_PARSE
+    ('action', Text),
+    ('duration', float),  # seconds
+    ('size', int),  # bytes of the response, or 0 for parse events
+])
+
+timer = default_timer
+
+
+class ActionStats(object):
+    """
+    Statistics of requests and parsing of a single action.
+
+    The block parse time contains parsing of TimeBlock and DaySummary
+    objects out of the soups, excluding the HTML parse time.
+    """
+    def __init__(self):  # type: (...) -> None
+        self.requests = 0
+        self.network_time = 0.0
+        self.response_bytes = 0
+        self.html_parse_time = 0.0
+        self.block_parse_time = 0.0
+
+    def __str__(self):  # type: (...) -> str
+        return str(
+            '{} request{}, {:.3f} s network, {} bytes, '
+            '{:.1f} ms HTML parsing, {:.1f} ms block parsing').format(
+                self.requests, '' if self.requests == 1 else 's',
+                self.network_time, self.response_bytes,
+                1000 * self.html_parse_time, 1000 * self.block_parse_time)
+
+    def add_event(self, event):  # type: (Event) -> None
+        if event.kind == REQUEST:
+            self.requests += 1
+            self.network_time += event.duration
+            self.response_bytes += event.size
+        elif event.kind == HTML_PARSE:
+            self.html_parse_time += event.duration
+        elif event.kind == BLOCK_PARSE:
+            self.block_parse_time += event.duration
+
+    def add(self, other):  # type: (ActionStats) -> None
+        self.requests += other.requests
+        self.network_time += other.network_time
+        self.response_bytes += other.response_bytes
+        self.html_parse_time += other.html_parse_time
+        self.block_parse_time += other.block_parse_time
+
+
+class Stats(object):
+    """
+    Statistics of requests and parsing grouped by action.
+    """
+    def __init__(self, name=''):  # type: (Text) -> None
+        self.name = name
+        self.actions = OrderedDict()  # type: Dict[Text, ActionStats]
+
+    def __str__(self):  # type: (...) -> str
+        prefix = '{}: '.format(self.name) if self.name else ''
+        return str('{}{}').format(prefix, self.total)
+
+    @property
+    def total(self):  # type: (...) -> ActionStats
+        result = ActionStats()
+        for action_stats in self.actions.values():
+            result.add(action_stats)
+        return result
+
+    def add_event(self, event):  # type: (Event) -> None
+        action_stats = self.actions.get(event.action)
+        if action_stats is None:
+            action_stats = self.actions[event.action] = ActionStats()
+        action_stats.add_event(event)
+
+
+class Instrumentation(object):
+    """
+    Collector of request and parse events.
+
+    All events are added to the stats attribute, to the stats of the
+    active measure blocks of the current thread and passed to the
+    hooks.
+    """
+    def __init__(
+            self,
+            hooks=(),  # type: Iterable[Callable[[Event], None]]
+    ):  # type: (...) -> None
+        self.stats = Stats()
+        self.hooks = list(hooks)  # type: List[Callable[[Event], None]]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add_hook(self, hook):  # type: (Callable[[Event], None]) -> None
+        self.hooks.append(hook)
+
+    @contextmanager
+    def measure(self, name=''):  # type: (Text) -> Iterator[Stats]
+        """
+        Collect the stats of the events of the with block.
+        """
+        stats = Stats(name)
+        active = self._get_active_stats()
+        active.append(stats)
+        try:
+            yield stats
+        finally:
+            active.remove(stats)
+
+    def _get_active_stats(self):  # type: (...) -> List[Stats]
+        active = getattr(self._local, 'active', None)
+        if active is None:
+            active = self._local.active = []
+        return active
+
+    def add_event(self, event):  # type: (Event) -> None
+        with self._lock:
+            self.stats.add_event(event)
+        for stats in self._get_active_stats():
+            stats.add_event(event)
+        for hook in self.hooks:
+            hook(event)
+
+    def request(self, action, duration, size):
+        # type: (Text, float, int) -> None
+        self.add_event(Event(REQUEST, action, duration, size))
+
+    def html_parse(self, action, duration):  # type: (Text, float) -> None
+        self.add_event(Event(HTML_PARSE, action, duration, 0))
+
+    def block_parse(self, action, duration):  # type: (Text, float) -> None
+        self.add_event(Event(BLOCK_PARSE, action, duration, 0))
+
+
+class TimedParser(SoupParser):
+    """
+    Wrapper of a parser reporting the parse times to instrumentation.
+    """
+    def __init__(
+            self,
+            parser,  # type: SoupParser
+            instrumentation,  # type: Instrumentation
+            action,  # type: Text
+    ):  # type: (...) -> None
+        super(TimedParser, self).__init__(parser.features)
+        self.parser = parser
+        self.instrumentation = instrumentation
+        self.action = action
+        if hasattr(parser, 'parse_fragment'):
+            self.decode = self._decode
+            self.parse_fragment = self._parse_fragment
+
+    def parse(
+            self,
+            content,  # type: bytes
+            encoding=None,  # type: Optional[str]
+    ):  # type: (...) -> BeautifulSoup
+        start = timer()
+        result = self.parser.parse(content, encoding)
+        self.instrumentation.html_parse(self.action, timer() - start)
+        return result
+
+    def _decode(
+            self,
+            content,  # type: bytes
+            encoding,  # type: Optional[str]
+    ):  # type: (...) -> Text
+        start = timer()
+        result = self.parser.decode(content, encoding)  # type: ignore
+        self.instrumentation.html_parse(self.action, timer() - start)
+        return result  # type: ignore
+
+    def _parse_fragment(
+            self,
+            text,  # type: Text
+            fragment,  # type: Text
+    ):  # type: (...) -> Optional[BeautifulSoup]
+        start = timer()
+        result = self.parser.parse_fragment(text, fragment)  # type: ignore
+        self.instrumentation.html_parse(self.action, timer() - start)
+        return result  # type: ignore
@@ -0,0 +1,260 @@
+"""
+Local SQLite mirror of the time blocks and day summaries of an account.
+
+The mirror is synced incrementally: the calendar totals of the synced
+range are fetched three months per request and only the dates whose
+total duration or reason code indicator differs from the mirrored
+summary are fetched again.  Dates never synced before are treated as
+empty, so the first sync fetches only the dates which have something
+in them.  Queries are then answered locally:
+
+  mirror = Mirror('tiima.sqlite')
+  with client.login(username, password, customer) as tiima:
+      mirror.sync(tiima, date(2020, 1, 1), date(2020, 12, 31))
+  blocks = mirror.get_time_blocks(date(2020, 3, 1), date(2020, 3, 31))
+
+Note that changes which keep the total duration and the indicator of
+a date intact (e.g. an edited description) are not detected.  Use
+force=True to fetch every date of the range.
+"""
+from __future__ import unicode_literals
+
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Text,
+    Tuple,
+    Type,
+)
+
+import pytz
+
+from .timeconv import EPOCH
+from .types import DaySummary, SyncResult, TimeBlock
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+    from .client import Connection
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS day_summary (
+        day TEXT PRIMARY KEY,
+        duration INTEGER NOT NULL,
+        description TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS time_block (
+        day TEXT NOT NULL,
+        id TEXT NOT NULL,
+        start_time INTEGER NOT NULL,
+        end_time INTEGER NOT NULL,
+        reason_code TEXT NOT NULL,
+        reason_text TEXT NOT NULL,
+        status TEXT NOT NULL,
+        description TEXT NOT NULL,
+        PRIMARY KEY (day, id)
+    )
+    """,
+]
+
+
+class Mirror(object):
+    """
+    Local mirror of time blocks and day summaries in an SQLite file.
+
+    The time blocks are stored by the date they are shown on, so a
+    block crossing midnight can be stored on two dates, and their
+    times are returned in the given time zone.
+    """
+    def __init__(
+            self,
+            path,  # type: Text
+            tz=str('Europe/Helsinki'),  # type: str
+    ):  # type: (...) -> None
+        self.path = path
+        self.tz = pytz.timezone(tz)
+        self.db = sqlite3.connect(path)
+        with self.db:
+            for statement in SCHEMA:
+                self.db.execute(statement)
+
+    def __enter__(self):  # type: (...) -> Mirror
+        return self
+
+    def __exit__(
+            self,
+            exc_type,  # type: Optional[Type[BaseException]]
+            exc_value,  # type: Optional[Exception]
+            traceback,  # type: Optional[TracebackType]
+    ):  # type: (...) -> None
+        self.close()
+
+    def close(self):  # type: (...) -> None
+        self.db.close()
+
+    def sync(
+            self,
+            connection,  # type: Connection
+            start,  # type: date
+            end,  # type: date
+            force=False,  # type: bool
+    ):  # type: (...) -> SyncResult
+        """
+        Sync the mirror with Tiima for the given date range.
+
+        Both ends of the range are inclusive.  Returns a SyncResult
+        with the number of dates checked against the calendar totals,
+        the number of dates fetched and the number of requests made.
+        """
+        request_count_before = connection.request_count
+        known = self.get_day_summaries(start, end)
+        known_by_date = dict((x.day, x) for x in known)
+        checked = fetched = 0
+        for summary in connection.get_totals_range(start, end):
+            checked += 1
+            old = known_by_date.get(summary.day)
+            if old is None:
+                old = DaySummary(summary.day, timedelta(0), '')
+            if force or summary != old:
+                connection.cache.invalidate(summary.day)
+                blocks = connection.get_time_blocks_of_date(summary.day)
+                self._store_day(summary, blocks)
+                fetched += 1
+        return SyncResult(
+            checked_days=checked,
+            fetched_days=fetched,
+            request_count=(connection.request_count - request_count_before))
+
+    def _store_day(
+            self,
+            summary,  # type: DaySummary
+            blocks,  # type: List[TimeBlock]
+    ):  # type: (...) -> None
+        day = summary.day.isoformat()
+        with self.db:
+            self.db.execute('DELETE FROM time_block WHERE day = ?', (day,))
+            self.db.executemany(
+                'INSERT INTO time_block VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [(
+                    day, x.id,
+                    _to_epoch(x.start_time), _to_epoch(x.end_time),
+                    x.reason_code, x.reason_text, x.status, x.description,
+                ) for x in blocks])
+            self.db.execute(
+                'INSERT OR REPLACE INTO day_summary VALUES (?, ?, ?)', (
+                    day, int(summary.duration.total_seconds()),
+                    summary.description))
+
+    def get_day_summaries(
+            self,
+            start,  # type: date
+            end,  # type: date
+    ):  # type: (...) -> List[DaySummary]
+        """
+        Get the mirrored day summaries of the given date range.
+
+        Dates never synced are not included.
+        """
+        rows = self.db.execute(
+            'SELECT day, duration, description FROM day_summary'
+            ' WHERE day BETWEEN ? AND ? ORDER BY day',
+            (start.isoformat(), end.isoformat()))
+        return [
+            DaySummary(_parse_date(day), timedelta(seconds=duration), desc)
+            for (day, duration, desc) in rows]
+
+    def get_time_blocks(
+            self,
+            start,  # type: date
+            end,  # type: date
+            reason_codes=None,  # type: Optional[Iterable[Text]]
+    ):  # type: (...) -> List[TimeBlock]
+        """
+        Get the mirrored time blocks of the given date range.
+
+        The blocks can be filtered by reason codes.  A block shown on
+        two dates of the range is returned once.
+        """
+        result = []  # type: List[TimeBlock]
+        for (_day, block) in self._query_time_blocks(start, end, reason_codes):
+            if not result or result[-1] != block:
+                result.append(block)
+        return result
+
+    def get_time_blocks_by_date(
+            self,
+            start,  # type: date
+            end,  # type: date
+    ):  # type: (...) -> Dict[date, List[TimeBlock]]
+        """
+        Get the mirrored time blocks of the given date range by date.
+
+        The blocks are grouped by the date they were synced on, which
+        is the same as the date of their start time, except for the
+        blocks which continue from the previous date.
+        """
+        result = {}  # type: Dict[date, List[TimeBlock]]
+        for (day, block) in self._query_time_blocks(start, end):
+            result.setdefault(day, []).append(block)
+        return result
+
+    def _query_time_blocks(
+            self,
+            start,  # type: date
+            end,  # type: date
+            reason_codes=None,  # type: Optional[Iterable[Text]]
+    ):  # type: (...) -> List[Tuple[date, TimeBlock]]
+        query = (
+            'SELECT day, id, start_time, end_time, reason_code, reason_text,'
+            ' status, description FROM time_block WHERE day BETWEEN ? AND ?')
+        params = [start.isoformat(), end.isoformat()]  # type: List[object]
+        if reason_codes is not None:
+            codes = list(reason_codes)
+            query += ' AND reason_code IN ({})'.format(
+                ', '.join('?' for _ in codes))
+            params.extend(codes)
+        rows = self.db.execute(
+            query + ' ORDER BY start_time, id, day', params)
+        return [
+            (_parse_date(day), TimeBlock(
+                id=block_id,
+                start_time=self._from_epoch(start_time),
+                end_time=self._from_epoch(end_time),
+                reason_code=reason_code,
+                reason_text=reason_text,
+                status=status,
+                description=description))
+            for (day, block_id, start_time, end_time, reason_code,
+                 reason_text, status, description) in rows]
+
+    def get_total_duration(
+            self,
+            start,  # type: date
+            end,  # type: date
+    ):  # type: (...) -> timedelta
+        """
+        Get the sum of the mirrored day totals of the given date range.
+        """
+        (seconds,) = self.db.execute(
+            'SELECT COALESCE(SUM(duration), 0) FROM day_summary'
+            ' WHERE day BETWEEN ? AND ?',
+            (start.isoformat(), end.isoformat())).fetchone()
+        return timedelta(seconds=seconds)
+
+    def _from_epoch(self, seconds):  # type: (int) -> datetime
+        return (EPOCH + timedelta(seconds=seconds)).astimezone(self.tz)
+
+
+def _to_epoch(dt):  # type: (datetime) -> int
+    return int((dt - EPOCH).total_seconds())
+
+
+def _parse_date(text):  # type: (Text) -> date
+    return datetime.strptime(text, '%Y-%m-%d').date()
@@ -0,0 +1,167 @@
+"""
+Parser backends for turning Tiima responses into soups.
+
+By default the responses are parsed by MechanicalSoup, which builds a
+full BeautifulSoup tree of every page.  A parser backend can be given
+to the Client to parse the responses lazily and differently instead:
+
+  * SoupParser builds a full tree, like MechanicalSoup does.
+
+  * FragmentParser cuts out only the element the client is about to
+    read (the selected date input, the calendar strip or the time
+    block table) and parses just that.  If the element is not found,
+    the whole page is parsed instead.
+"""
+from __future__ import unicode_literals
+
+import re
+from typing import Dict, Optional, Pattern, Text, Union
+
+import requests
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+
+
+class SoupParser(object):
+    """
+    Parser which builds a full BeautifulSoup tree of the page.
+    """
+    name = 'soup'
+
+    def __init__(self, features='lxml'):  # type: (str) -> None
+        self.features = features
+
+    def parse(
+            self,
+            content,  # type: bytes
+            encoding=None,  # type: Optional[str]
+    ):  # type: (...) -> BeautifulSoup
+        return BeautifulSoup(
+            content, self.features, from_encoding=encoding)
+
+
+class FragmentParser(SoupParser):
+    """
+    Parser which builds soups of single page fragments.
+
+    The page is decoded to text once with decode and the fragments
+    are then cut out of the text by parse_fragment.
+    """
+    name = 'fragment'
+
+    def decode(
+            self,
+            content,  # type: bytes
+            encoding,  # type: Optional[str]
+    ):  # type: (...) -> Text
+        return UnicodeDammit(
+            content, [encoding] if encoding else [], is_html=True
+        ).unicode_markup or ''
+
+    def parse_fragment(
+            self,
+            text,  # type: Text
+            fragment,  # type: Text
+    ):  # type: (...) -> Optional[BeautifulSoup]
+        """
+        Parse a single fragment of the decoded page.
+
+        Returns None if the fragment is not found.
+        """
+        fragment_text = extract_fragment(text, fragment)
+        if fragment_text is None:
+            return None
+        return BeautifulSoup(fragment_text, self.features)
+
+
+def _attribute_tag_re(attribute_re):  # type: (Text) -> Pattern[Text]
+    """
+    Compile regex matching a start tag which has the given attribute.
+
+    The tag name is captured as the "tag" group.
+    """
+    return re.compile(
+        r'<(?P<tag>[a-z][a-z0-9]*)(?=[\s/>])[^>]*?\s' + attribute_re +
+        r'[^>]*>', re.IGNORECASE)
+
+
+FRAGMENT_START_TAGS = {
+    'selected_date': _attribute_tag_re(
+        r'name\s*=\s*(?P<q>["\']?)SelectedStampingDate(?P=q)(?=[\s/>])'),
+    'calendar': _attribute_tag_re(
+        r'id\s*=\s*(?P<q>["\']?)CalendarStrip(?P=q)(?=[\s/>])'),
+    'time_blocks': _attribute_tag_re(
+        r'class\s*=\s*(?P<q>["\'])(?:[^"\']*\s)?'
+        r'stamping_realized_stamp_scroll_box(?:\s[^"\']*)?(?P=q)'),
+}  # type: Dict[Text, Pattern[Text]]
+
+VOID_ELEMENTS = {'input', 'br', 'hr', 'img', 'meta', 'link'}
+
+_tag_re_cache = {}  # type: Dict[Text, Pattern[Text]]
+
+
+def extract_fragment(text, fragment):  # type: (Text, Text) -> Optional[Text]
+    """
+    Extract a fragment from the given HTML text.
+
+    Finds the first start tag matching the FRAGMENT_START_TAGS regex
+    of the given fragment and cuts out the whole element starting from
+    it.  Returns None if there is no match.
+    """
+    m = FRAGMENT_START_TAGS[fragment].search(text)
+    if not m:
+        return None
+    tag = m.group('tag').lower()
+    if tag in VOID_ELEMENTS:
+        return m.group(0)
+    return text[m.start():_find_element_end(text, tag, m.end())]
+
+
+def _find_element_end(text, tag, pos):  # type: (Text, Text, int) -> int
+    tag_re = _tag_re_cache.get(tag)
+    if not tag_re:
+        tag_re = _tag_re_cache[tag] = re.compile(
+            r'<(/?)' + re.escape(tag) + r'(?=[\s/>])[^>]*>', re.IGNORECASE)
+    depth = 1
+    for m in tag_re.finditer(text, pos):
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return m.end()
+    return len(text)
+
+
+_LOGIN_FORM_RE = re.compile(br'id\s*=\s*["\']?loginForm["\'\s/>]')
+
+
+def is_login_page(response):  # type: (requests.Response) -> bool
+    return bool(_LOGIN_FORM_RE.search(response.content))
+
+
+def is_html(response):  # type: (requests.Response) -> bool
+    if 'text/html' in response.headers.get('Content-Type', ''):
+        return True
+    start = response.content[:50].lstrip().lower()
+    return start.startswith(b'<html') or start.startswith(b'<!doctype')
+
+
+def get_response_encoding(response):
+    # type: (requests.Response) -> Optional[str]
+    if 'charset' in response.headers.get('Content-Type', ''):
+        return response.encoding
+    return None  # Let the parser sniff the encoding from the content
+
+
+PARSERS = {
+    SoupParser.name: SoupParser,
+    FragmentParser.name: FragmentParser,
+}
+
+
+def get_parser(parser):
+    # type: (Union[Text, SoupParser]) -> SoupParser
+    if isinstance(parser, SoupParser):
+        return parser
+    parser_class = PARSERS.get(parser)
+    if not parser_class:
+        raise ValueError('Unknown parser: {}'.format(parser))
+    return parser_class()
@@ -0,0 +1,194 @@
+from __future__ import unicode_literals
+
+from datetime import date, timedelta
+from multiprocessing.pool import ThreadPool
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Text,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from six.moves import queue
+
+from .client import (
+    LOGIN_REQUEST_COUNT,
+    Client,
+    Connection,
+    get_totals_windows,
+    stitch_totals,
+)
+from .ratelimit import get_shared_rate_limiter
+from .types import DaySummary, TimeBlock
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class SessionPool(object):
+    """
+    Pool of independent logged in sessions of a single account.
+
+    Tiima keeps the selected date as server side state of a session, so
+    a single Connection can only do one thing at a time.  The pool logs
+    in several times and spreads work over the sessions on a thread
+    pool.  All pools talking to the same server share a request rate
+    limit if max_rate (requests per second) is given.
+    """
+    def __init__(
+            self,
+            client,  # type: Client
+            username,  # type: Text
+            password,  # type: Text
+            customer,  # type: Text
+            size=4,  # type: int
+            max_rate=None,  # type: Optional[float]
+    ):  # type: (...) -> None
+        if size < 1:
+            raise ValueError('Pool size must be at least 1')
+        self.client = client
+        self.size = size
+        self.rate_limiter = get_shared_rate_limiter(client.url, max_rate)
+        self._credentials = (username, password, customer)
+        self._connections = []  # type: List[Connection]
+        self._idle = queue.Queue()  # type: queue.Queue[Connection]
+        self._threads = None  # type: Optional[ThreadPool]
+
+    def __enter__(self):  # type: (...) -> SessionPool
+        self.open()
+        return self
+
+    def __exit__(
+            self,
+            exc_type,  # type: Optional[Type[BaseException]]
+            exc_value,  # type: Optional[Exception]
+            traceback,  # type: Optional[TracebackType]
+    ):  # type: (...) -> None
+        self.close()
+
+    @property
+    def connections(self):  # type: (...) -> List[Connection]
+        return list(self._connections)
+
+    def open(self):  # type: (...) -> None
+        """
+        Log in all sessions of the pool concurrently.
+
+        If any of the logins fails, the sessions which did log in are
+        logged out before raising the error.
+        """
+        if self._threads:
+            return
+        self._threads = ThreadPool(self.size)
+        results = [
+            self._threads.apply_async(self._login)
+            for _ in range(self.size)]
+        error = None  # type: Optional[Exception]
+        for result in results:
+            try:
+                self._add_connection(result.get())
+            except Exception as login_error:
+                error = error or login_error
+        if error:
+            try:
+                self.close()
+            except Exception:
+                pass  # Report the login error instead
+            raise error
+
+    def close(self):  # type: (...) -> None
+        """
+        Log out all sessions and stop the worker threads.
+        """
+        connections = self._connections
+        self._connections = []
+        self._idle = queue.Queue()
+        error = None  # type: Optional[Exception]
+        try:
+            for connection in connections:
+                try:
+                    connection.logout()
+                except Exception as logout_error:
+                    error = error or logout_error
+        finally:
+            if self._threads:
+                self._threads.close()
+                self._threads.join()
+                self._threads = None
+        if error:
+            raise error
+
+    def _login(self):  # type: (...) -> Connection
+        if self.rate_limiter:
+            for _ in range(LOGIN_REQUEST_COUNT):
+                self.rate_limiter.wait()
+        return self.client.login(*self._credentials)
+
+    def _add_connection(self, connection):  # type: (Connection) -> None
+        connection.rate_limiter = self.rate_limiter
+        self._connections.append(connection)
+        self._idle.put(connection)
+
+    def map(
+            self,
+            func,  # type: Callable[[Connection, T], R]
+            items,  # type: Iterable[T]
+    ):  # type: (...) -> List[R]
+        """
+        Call func(connection, item) for each item concurrently.
+
+        Each call gets a connection of its own for the duration of the
+        call.  The results are returned in the order of the items.
+        """
+        self.open()
+        assert self._threads
+
+        def run(item):  # type: (T) -> R
+            connection = self._idle.get()
+            try:
+                return func(connection, item)
+            finally:
+                self._idle.put(connection)
+
+        return self._threads.map(run, list(items), chunksize=1)
+
+    def get_time_blocks_range(
+            self,
+            start,  # type: date
+            end,  # type: date
+    ):  # type: (...) -> List[Tuple[date, List[TimeBlock]]]
+        """
+        Get time blocks of each date from start to end (inclusive).
+
+        The dates are fetched concurrently over the sessions of the
+        pool.  Returns a list of (date, time_blocks) pairs in date
+        order.
+        """
+        days = [
+            start + timedelta(days=n)
+            for n in range((end - start).days + 1)]
+        results = self.map(Connection.get_time_blocks_of_date, days)
+        return list(zip(days, results))
+
+    def get_totals_range(
+            self,
+            start,  # type: date
+            end,  # type: date
+    ):  # type: (...) -> List[DaySummary]
+        """
+        Get list of totals for each date from start to end (inclusive).
+
+        Same as Connection.get_totals_range, but the three month
+        windows are fetched concurrently over the sessions of the pool.
+        """
+        windows = self.map(
+            Connection.get_totals_list, get_totals_windows(start, end))
+        return stitch_totals(start, end, windows)
@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+
+import multiprocessing
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Text
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class RateLimiter(object):
+    """
+    Thread-safe limiter for the rate of requests.
+
+    Each call to wait blocks until the caller may issue the next
+    request so that at most `rate` requests per second are made in
+    total by all threads using the same limiter.
+    """
+    def __init__(
+            self,
+            rate,  # type: float
+            clock=_clock,  # type: Callable[[], float]
+            sleep=time.sleep,  # type: Callable[[float], None]
+    ):  # type: (...) -> None
+        if rate <= 0:
+            raise ValueError('Rate must be positive')
+        self.rate = rate
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):  # type: (...) -> None
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            self._sleep(slot - now)
+
+
+class ProcessRateLimiter(RateLimiter):
+    """
+    Rate limiter shared by processes.
+
+    The next free slot is kept in shared memory, so all the processes
+    which get the limiter when they are started (e.g. as an initializer
+    argument of a process pool) share the same limit.
+    """
+    def __init__(
+            self,
+            rate,  # type: float
+            clock=_clock,  # type: Callable[[], float]
+            sleep=time.sleep,  # type: Callable[[float], None]
+    ):  # type: (...) -> None
+        super(ProcessRateLimiter, self).__init__(rate, clock, sleep)
+        self._shared_next_slot = multiprocessing.Value(str('d'), 0.0)
+
+    def __getstate__(self):  # type: (...) -> Dict[str, Any]
+        state = dict(self.__dict__)
+        del state['_lock']  # Not needed, since the value has its own
+        return state
+
+    def __setstate__(self, state):  # type: (Dict[str, Any]) -> None
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def wait(self):  # type: (...) -> None
+        with self._shared_next_slot.get_lock():
+            now = self._clock()
+            slot = max(now, self._shared_next_slot.value)
+            self._shared_next_slot.value = slot + 1.0 / self.rate
+        if slot > now:
+            self._sleep(slot - now)
+
+
+class ChainedRateLimiter(RateLimiter):
+    """
+    Rate limiter waiting for each of the given limiters in turn.
+
+    Useful for applying several limits at once, e.g. a limit per server
+    and a limit per customer.
+    """
+    def __init__(
+            self,
+            limiters,  # type: Iterable[RateLimiter]
+    ):  # type: (...) -> None
+        self.limiters = list(limiters)
+        if not self.limiters:
+            raise ValueError('At least one limiter is required')
+        super(ChainedRateLimiter, self).__init__(
+            min(x.rate for x in self.limiters))
+
+    def wait(self):  # type: (...) -> None
+        for limiter in self.limiters:
+            limiter.wait()
+
+
+_shared_limiters = {}  # type: Dict[Text, RateLimiter]
+_shared_limiters_lock = threading.Lock()
+
+
+def get_shared_rate_limiter(
+        key,  # type: Text
+        rate,  # type: Optional[float]
+):  # type: (...) -> Optional[RateLimiter]
+    """
+    Get a process wide rate limiter for the given key.
+
+    The key is usually a server URL so that all users of the same
+    server share the same limit.  If the limiter already exists, its
+    rate is lowered to the given rate if needed, but never raised.
+    Returns None if rate is None.
+    """
+    if rate is None:
+        return None
+    with _shared_limiters_lock:
+        limiter = _shared_limiters.get(key)
+        if limiter is None:
+            limiter = _shared_limiters[key] = RateLimiter(rate)
+        elif rate < limiter.rate:
+            limiter.rate = rate
+        return limiter
@@ -0,0 +1,348 @@
+"""
+Recording and replaying the actions posted by connections.
+
+A Recorder is a transport factory (see the transport module) which
+writes the front pages, the actions posted by the connections of a
+client and their responses to a cassette file, one JSON object per
+line:
+
+  recorder = Recorder('tiima.jsonl', secrets=[username, password])
+  client = Client(transport=recorder)
+  with client.login(username, password, customer) as tiima:
+      tiima.get_time_blocks_of_date(date(2020, 3, 4))
+
+The ids of the time blocks, the employee and the company are replaced
+with sequential fake ids and the given secrets with REDACTED before
+writing, so that the cassettes can be shared, e.g. as a benchmark
+corpus.  The cookies and the login requests are not recorded at all.
+
+A Replay serves the recorded responses back without any server:
+
+  replay = Replay('tiima.jsonl')
+  tiima = replay.connect()
+  tiima.get_time_blocks_of_date(date(2020, 3, 4))
+
+The responses are looked up by the action and its parameters.  Posting
+the same action again returns the next recorded response of it, or the
+last one when they run out.
+"""
+from __future__ import unicode_literals
+
+import io
+import json
+import re
+import threading
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Match,
+    Optional,
+    Text,
+    Tuple,
+    Union,
+)
+
+import requests
+from mechanicalsoup import StatefulBrowser
+from mechanicalsoup.form import Form
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .client import Client, Connection
+from .exceptions import Error
+from .transport import BaseTransport, TransportFactory, create_transport
+
+#: Names (or element ids) of the fields holding ids to scrub
+ID_FIELDS = (
+    'SelectedRowStampId',
+    'EditStampId',
+    'DebugDeleteRawStampId',
+    'EmployeeId',
+    'companyIdentifierTiima',
+)
+
+REDACTED = 'REDACTED'
+
+Record = Dict[Text, Any]
+
+_INPUT_TAG_RE = re.compile(r'<input\b[^>]*>', re.IGNORECASE)
+_ATTRIBUTE_RE = re.compile(
+    r'''\b(name|id|value)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''',
+    re.IGNORECASE)
+
+
+class Scrubber(object):
+    """
+    Replacer of ids and secrets in recorded pages and parameters.
+
+    The ids are replaced only in the values of the id fields, so that
+    other numbers of the pages, like dates and totals, are kept.  Each
+    distinct id is replaced by the same fake id everywhere, so that the
+    recorded parameters still match the recorded pages.
+    """
+    def __init__(self, secrets=()):  # type: (Iterable[Text]) -> None
+        self.secrets = sorted(
+            (x for x in secrets if x), key=len, reverse=True)
+        self.ids = {}  # type: Dict[Text, Text]
+
+    def scrub_text(self, text):  # type: (Text) -> Text
+        text = _INPUT_TAG_RE.sub(self._scrub_input_tag, text)
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        return text
+
+    def scrub_params(self, params):
+        # type: (Dict[Text, Text]) -> Dict[Text, Text]
+        return dict(
+            (name, (self._get_fake_id(value) if name in ID_FIELDS
+                    else self.scrub_text(value)))
+            for (name, value) in params.items())
+
+    def _scrub_input_tag(self, match):  # type: (Match[Text]) -> Text
+        tag = match.group(0)
+        attributes = dict(
+            (name.lower(), (quoted or single_quoted or unquoted))
+            for (name, quoted, single_quoted, unquoted)
+            in _ATTRIBUTE_RE.findall(tag))
+        if not (attributes.get('name') in ID_FIELDS or
+                attributes.get('id') in ID_FIELDS):
+            return tag
+        fake_id = self._get_fake_id(attributes.get('value', ''))
+        return _ATTRIBUTE_RE.sub((
+            lambda m: (
+                '{}="{}"'.format(m.group(1), fake_id)
+                if m.group(1).lower() == 'value' else m.group(0))), tag)
+
+    def _get_fake_id(self, value):  # type: (Text) -> Text
+        if value in ('', '0'):
+            return value
+        fake_id = self.ids.get(value)
+        if not fake_id:
+            fake_id = self.ids[value] = '{}'.format(len(self.ids) + 1)
+        return fake_id
+
+
+class Recorder(object):
+    """
+    Transport factory recording the actions to a cassette file.
+
+    The actions are posted with the given transport (a name or a
+    factory) and the records are appended to the file as they happen.
+    The file is truncated when the recorder is created.
+    """
+    def __init__(
+            self,
+            path,  # type: Text
+            transport='form',  # type: Union[Text, TransportFactory]
+            secrets=(),  # type: Iterable[Text]
+            pool_maxsize=4,  # type: int
+    ):  # type: (...) -> None
+        self.path = path
+        self.transport = transport
+        self.pool_maxsize = pool_maxsize
+        self.scrubber = Scrubber(secrets)
+        self._lock = threading.Lock()
+        with io.open(path, 'w', encoding='utf-8'):
+            pass
+
+    def __call__(
+            self,
+            browser,  # type: StatefulBrowser
+            form,  # type: Form
+            url,  # type: Optional[Text]
+    ):  # type: (...) -> RecordingTransport
+        transport = create_transport(
+            self.transport, browser, form, url, self.pool_maxsize)
+        page = browser.get_current_page()
+        if page is not None:
+            self.write({
+                'type': 'page',
+                'url': browser.get_url(),
+                'body': '{}'.format(page),
+            })
+        return RecordingTransport(self, transport)
+
+    def record_action(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+            response,  # type: requests.Response
+    ):  # type: (...) -> None
+        self.write({
+            'type': 'action',
+            'action': action,
+            'params': params,
+            'status': response.status_code,
+            'url': response.url,
+            'content_type': response.headers.get('Content-Type', ''),
+            'body': response.text,
+        })
+
+    def write(self, record):  # type: (Record) -> None
+        with self._lock:
+            record = dict(record, body=self.scrubber.scrub_text(
+                record['body']))
+            if 'params' in record:
+                record['params'] = self.scrubber.scrub_params(
+                    record['params'])
+            with io.open(self.path, 'a', encoding='utf-8') as fp:
+                fp.write('{}\n'.format(
+                    json.dumps(record, ensure_ascii=False, sort_keys=True)))
+
+
+class RecordingTransport(BaseTransport):
+    """
+    Transport recording the actions posted with another transport.
+    """
+    name = 'recording'
+
+    def __init__(
+            self,
+            recorder,  # type: Recorder
+            transport,  # type: BaseTransport
+    ):  # type: (...) -> None
+        self.recorder = recorder
+        self.transport = transport
+
+    def post(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> requests.Response
+        response = self.transport.post(action, params)
+        self.recorder.record_action(action, params, response)
+        return response
+
+
+class Replay(object):
+    """
+    Transport factory serving the responses of a cassette file.
+    """
+    def __init__(self, path):  # type: (Text) -> None
+        self.pages = []  # type: List[Record]
+        self.responses = {}  # type: Dict[Tuple[Text, Text], List[Record]]
+        self._positions = {}  # type: Dict[Tuple[Text, Text], int]
+        for record in read_records(path):
+            if record['type'] == 'page':
+                self.pages.append(record)
+            elif record['type'] == 'action':
+                key = _get_key(record['action'], record['params'])
+                self.responses.setdefault(key, []).append(record)
+
+    def __call__(
+            self,
+            browser,  # type: StatefulBrowser
+            form,  # type: Form
+            url,  # type: Optional[Text]
+    ):  # type: (...) -> ReplayTransport
+        return ReplayTransport(self)
+
+    def connect(self, client=None):  # type: (Optional[Client]) -> Connection
+        """
+        Create a connection on the first recorded front page.
+
+        The connection works offline: even its logout request is
+        answered locally.  The client, if given, must use this replay
+        as its transport.
+        """
+        if client is None:
+            client = Client(transport=self)
+        elif client.transport is not self:
+            raise ValueError('Client is not using this replay as transport')
+        if not self.pages:
+            raise Error('No front page recorded')
+        browser = StatefulBrowser()
+        adapter = _OfflineAdapter()
+        browser.session.mount('http://', adapter)
+        browser.session.mount('https://', adapter)
+        browser.open_fake_page(self.pages[0]['body'], self.pages[0]['url'])
+        return Connection(browser, client)
+
+    def get_record(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> Record
+        key = _get_key(action, params)
+        records = self.responses.get(key)
+        if not records:
+            raise Error('No recorded response for {} with {}'.format(
+                action, params))
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        return records[min(position, len(records) - 1)]
+
+
+class ReplayTransport(BaseTransport):
+    """
+    Transport serving recorded responses.
+    """
+    name = 'replay'
+
+    def __init__(self, replay):  # type: (Replay) -> None
+        self.replay = replay
+
+    def post(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> requests.Response
+        return make_response(self.replay.get_record(action, params))
+
+
+def read_records(path):  # type: (Text) -> List[Record]
+    """
+    Read the records of a cassette file.
+    """
+    with io.open(path, encoding='utf-8') as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+
+def make_response(record):  # type: (Record) -> requests.Response
+    """
+    Make a response from a recorded action.
+
+    The body is always encoded as UTF-8, whatever the recorded
+    character set was.
+    """
+    content_type = (record.get('content_type') or 'text/html').split(';')[0]
+    response = requests.Response()
+    response.status_code = record.get('status', 200)
+    response.url = record.get('url', '')
+    response.headers = CaseInsensitiveDict({
+        'Content-Type': '{}; charset=utf-8'.format(content_type)})
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = record['body'].encode('utf-8')
+    return response
+
+
+class _OfflineAdapter(BaseAdapter):
+    """
+    Adapter answering every request with an empty page.
+    """
+    def send(
+            self,
+            request,  # type: requests.PreparedRequest
+            stream=False,  # type: bool
+            timeout=None,  # type: Any
+            verify=True,  # type: Any
+            cert=None,  # type: Any
+            proxies=None,  # type: Any
+    ):  # type: (...) -> requests.Response
+        response = make_response({
+            'url': request.url,
+            'body': '<html><body></body></html>',
+        })
+        response.request = request
+        return response
+
+    def close(self):  # type: (...) -> None
+        pass
+
+
+def _get_key(action, params):
+    # type: (Text, Dict[Text, Text]) -> Tuple[Text, Text]
+    return (action, json.dumps(params, sort_keys=True))
@@ -0,0 +1,211 @@
+"""
+Reports of worked hours aggregated by reason code and period.
+
+A Report keeps the total durations of its time blocks by reason code
+for each day, ISO week and month.  The aggregates are updated as blocks
+are added or removed, so keeping a report up to date, e.g. with the
+events of a Watcher, never rescans the other blocks:
+
+  report = Report()
+  report.extend(connection.iter_time_blocks(start, end))
+  report.apply(watcher.poll())
+  for row in report.get_rows('week'):
+      print(row)  # 2020-W10 work 37:30 lunch 2:30 overtime 1:00 (LOU...)
+
+The blocks are counted on the date of their start time.  The lunch
+breaks (LOU) are not counted as work and the overtime (YT) is counted
+both as work and separately.
+"""
+from __future__ import unicode_literals
+
+from datetime import date, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Text,
+    Tuple,
+)
+
+from .types import BlockEvent, ReportRow, TimeBlock
+
+if TYPE_CHECKING:
+    from .client import Connection
+
+LUNCH_REASON_CODE = 'LOU'
+OVERTIME_REASON_CODE = 'YT'
+
+#: Names of the periods the durations are aggregated by
+PERIODS = ('day', 'week', 'month')
+
+_Key = Tuple[Text, Text]  # (period, period key), e.g. ("week", "2020-W10")
+
+
+def get_period_key(period, day):  # type: (Text, date) -> Text
+    """
+    Get key of the period containing the date, e.g. "2020-W10".
+    """
+    if period == 'day':
+        return day.isoformat()
+    elif period == 'week':
+        (year, week, _weekday) = day.isocalendar()
+        return '{:04d}-W{:02d}'.format(year, week)
+    elif period == 'month':
+        return '{:04d}-{:02d}'.format(day.year, day.month)
+    raise ValueError('Unknown period: {}'.format(period))
+
+
+class Report(object):
+    """
+    Incrementally updated aggregates of time block durations.
+
+    The blocks are identified by their ids: adding a block with a
+    known id replaces the old block.
+    """
+    def __init__(self):  # type: (...) -> None
+        self.time_blocks = {}  # type: Dict[Text, TimeBlock]
+        self._ids_by_date = {}  # type: Dict[date, Set[Text]]
+        self._minutes = {}  # type: Dict[_Key, Dict[Text, int]]
+        self._counts = {}  # type: Dict[_Key, int]
+        self._reason_minutes = {}  # type: Dict[Text, int]
+
+    def __len__(self):  # type: (...) -> int
+        return len(self.time_blocks)
+
+    def add(self, time_block):  # type: (TimeBlock) -> None
+        old = self.time_blocks.get(time_block.id)
+        if old is not None:
+            self._update(old, -1)
+        self.time_blocks[time_block.id] = time_block
+        self._update(time_block, 1)
+
+    def remove(self, time_block):  # type: (TimeBlock) -> None
+        old = self.time_blocks.pop(time_block.id, None)
+        if old is not None:
+            self._update(old, -1)
+
+    def extend(self, time_blocks):  # type: (Iterable[TimeBlock]) -> None
+        for time_block in time_blocks:
+            self.add(time_block)
+
+    def apply(self, events):  # type: (Iterable[BlockEvent]) -> None
+        """
+        Apply added and removed block events, e.g. of a Watcher.
+        """
+        for event in events:
+            if event.kind == 'removed':
+                self.remove(event.time_block)
+            else:
+                self.add(event.time_block)
+
+    def set_day(
+            self,
+            day,  # type: date
+            time_blocks,  # type: Iterable[TimeBlock]
+    ):  # type: (...) -> None
+        """
+        Replace the time blocks of a date.
+
+        Only the blocks which differ from the current ones are removed
+        and added.
+        """
+        new_blocks = dict((x.id, x) for x in time_blocks)
+        for block_id in list(self._ids_by_date.get(day, ())):
+            old = self.time_blocks[block_id]
+            if new_blocks.get(block_id) != old:
+                self.remove(old)
+        for time_block in new_blocks.values():
+            if self.time_blocks.get(time_block.id) != time_block:
+                self.add(time_block)
+
+    def get_total_by_reason_code(self):  # type: (...) -> Dict[Text, timedelta]
+        return dict(
+            (code, timedelta(minutes=minutes))
+            for (code, minutes) in self._reason_minutes.items())
+
+    def get_rows(self, period='week'):  # type: (Text) -> List[ReportRow]
+        """
+        Get the aggregates of each period (day, week or month) in order.
+        """
+        if period not in PERIODS:
+            raise ValueError('Unknown period: {}'.format(period))
+        return [
+            self._get_row(key)
+            for key in sorted(x for x in self._counts if x[0] == period)]
+
+    def get_total(self):  # type: (...) -> Optional[ReportRow]
+        """
+        Get the aggregates of all the blocks, or None if there are none.
+        """
+        if not self.time_blocks:
+            return None
+        return _make_row('total', self._reason_minutes, len(self))
+
+    def _get_row(self, key):  # type: (_Key) -> ReportRow
+        return _make_row(key[1], self._minutes[key], self._counts[key])
+
+    def _update(self, time_block, sign):  # type: (TimeBlock, int) -> None
+        day = time_block.start_time.date()
+        ids = self._ids_by_date.setdefault(day, set())
+        if sign > 0:
+            ids.add(time_block.id)
+        else:
+            ids.discard(time_block.id)
+            if not ids:
+                del self._ids_by_date[day]
+        code = time_block.reason_code
+        minutes = sign * int(time_block.duration.total_seconds() // 60)
+        _add_minutes(self._reason_minutes, code, minutes)
+        for period in PERIODS:
+            key = (period, get_period_key(period, day))
+            count = self._counts.get(key, 0) + sign
+            if count:
+                self._counts[key] = count
+                _add_minutes(self._minutes.setdefault(key, {}), code, minutes)
+            else:
+                self._counts.pop(key, None)
+                self._minutes.pop(key, None)
+
+
+def _add_minutes(sums, code, minutes):
+    # type: (Dict[Text, int], Text, int) -> None
+    total = sums.get(code, 0) + minutes
+    if total:
+        sums[code] = total
+    else:
+        sums.pop(code, None)
+
+
+def _make_row(key, minutes, count):
+    # type: (Text, Dict[Text, int], int) -> ReportRow
+    total = sum(minutes.values())
+    lunch = minutes.get(LUNCH_REASON_CODE, 0)
+    return ReportRow(
+        key=key,
+        work=timedelta(minutes=(total - lunch)),
+        lunch=timedelta(minutes=lunch),
+        overtime=timedelta(minutes=minutes.get(OVERTIME_REASON_CODE, 0)),
+        block_count=count,
+        by_reason_code=dict(
+            (code, timedelta(minutes=x)) for (code, x) in minutes.items()))
+
+
+def build_report(
+        connection,  # type: Connection
+        start,  # type: date
+        end,  # type: date
+):  # type: (...) -> Report
+    """
+    Build a report of a date range of a connection.
+
+    Fetches the totals of the range first and the time blocks only of
+    the dates which have something in them.
+    """
+    report = Report()
+    for summary in connection.get_totals_range(start, end):
+        if summary.duration or summary.description:
+            report.extend(connection.get_time_blocks_of_date(summary.day))
+    return report
@@ -0,0 +1,196 @@
+"""
+Encrypted storage of logged in sessions.
+
+A session store lets short-lived processes, like the command line
+tool or batch jobs, reuse a logged in Tiima session instead of logging
+in on every run:
+
+  store = SessionStore('~/.tiimaweb-session', secret=password)
+  with store.login(client, username, password, customer) as tiima:
+      ...
+
+The login method resumes the stored session, if there is one for the
+same server, user and customer, and checks it with a single request.
+If the session has expired, it logs in normally and stores the new
+session.  Exiting the with block stores the session instead of logging
+out, while calling logout ends the session and removes the file.
+
+The cookies, the tiima form and its page URL are stored encrypted with
+a key derived from the secret with PBKDF2.  This needs the optional
+cryptography package.
+"""
+from __future__ import unicode_literals
+
+import base64
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Text
+
+from mechanicalsoup import StatefulBrowser
+
+from .client import Client, Connection
+from .exceptions import SessionExpired, UnexpectedResponse
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:  # pragma: no cover
+    Fernet = None  # type: ignore
+
+FILE_MAGIC = b'TWS1'
+SALT_LENGTH = 16
+FORMAT_VERSION = 1
+
+_Session = Dict[Text, Any]
+
+
+class SessionStore(object):
+    """
+    File storing a logged in session encrypted with a secret.
+    """
+    def __init__(
+            self,
+            path,  # type: Text
+            secret,  # type: Text
+            iterations=200000,  # type: int
+    ):  # type: (...) -> None
+        if Fernet is None:
+            raise ImportError(
+                'SessionStore requires the cryptography package')
+        self.path = os.path.expanduser(path)
+        self.secret = secret
+        self.iterations = iterations
+        self._identity = None  # type: Optional[List[Text]]
+        self._salt = None  # type: Optional[bytes]
+        self._fernets = {}  # type: Dict[bytes, Fernet]
+
+    def login(
+            self,
+            client,  # type: Client
+            username,  # type: Text
+            password,  # type: Text
+            customer,  # type: Text
+    ):  # type: (...) -> Connection
+        """
+        Resume the stored session or log in and store the session.
+        """
+        identity = [client.url, username, customer]
+        session = self.load()
+        connection = None  # type: Optional[Connection]
+        if session and session['identity'] == identity:
+            try:
+                connection = _resume(client, session)
+            except SessionExpired:
+                self.clear()
+            else:
+                connection.credentials = (username, password, customer)
+        self._identity = identity
+        if not connection:
+            connection = client.login(username, password, customer)
+            self.save(connection)
+        connection.session_store = self
+        return connection
+
+    def load(self):  # type: (...) -> Optional[_Session]
+        """
+        Load the stored session.
+
+        Returns None if there is no stored session or it cannot be
+        decrypted with the secret.
+        """
+        try:
+            with open(self.path, 'rb') as fp:
+                data = fp.read()
+        except (IOError, OSError):
+            return None
+        if not data.startswith(FILE_MAGIC):
+            return None
+        salt = data[len(FILE_MAGIC):len(FILE_MAGIC) + SALT_LENGTH]
+        token = data[len(FILE_MAGIC) + SALT_LENGTH:]
+        try:
+            content = self._get_fernet(salt).decrypt(token)
+        except InvalidToken:
+            return None
+        self._salt = salt
+        session = json.loads(content.decode('utf-8'))  # type: _Session
+        if session.get('version') != FORMAT_VERSION:
+            return None
+        return session
+
+    def save(self, connection):  # type: (Connection) -> None
+        """
+        Store the session of a connection returned by login.
+        """
+        if not self._identity:
+            raise ValueError('Identity of the session is not known')
+        browser = connection.browser
+        page = browser.get_current_page()
+        logout_link = page.find('a', id='Logout') if page else None
+        if not logout_link:
+            raise UnexpectedResponse('Cannot find logout link')
+        session = {
+            'version': FORMAT_VERSION,
+            'identity': self._identity,
+            'saved_at': time.time(),
+            'cookies': [{
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'expires': cookie.expires,
+                'secure': cookie.secure,
+            } for cookie in browser.session.cookies],
+            'form': '{}'.format(connection._tiima_form.form),
+            'form_page_url': connection._tiima_form_page_url,
+            'logout_url': browser.absolute_url(logout_link.get('href') or ''),
+            'current_date': connection.current_date.isoformat(),
+        }  # type: _Session
+        salt = self._salt = self._salt or os.urandom(SALT_LENGTH)
+        token = self._get_fernet(salt).encrypt(
+            json.dumps(session).encode('utf-8'))
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(FILE_MAGIC + salt + token)
+
+    def clear(self):  # type: (...) -> None
+        """
+        Remove the stored session.
+        """
+        self._salt = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _get_fernet(self, salt):  # type: (bytes) -> Fernet
+        fernet = self._fernets.get(salt)
+        if fernet:
+            return fernet
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=self.iterations)
+        key = kdf.derive(self.secret.encode('utf-8'))
+        fernet = self._fernets[salt] = Fernet(base64.urlsafe_b64encode(key))
+        return fernet
+
+
+def _resume(client, session):  # type: (Client, _Session) -> Connection
+    """
+    Resume a stored session.
+
+    No credentials are given to the connection, so that an expired
+    session raises SessionExpired instead of logging in again.
+    """
+    browser = StatefulBrowser()
+    for cookie in session['cookies']:
+        browser.session.cookies.set(**cookie)
+    browser.open_fake_page(
+        '<html><body><a id="Logout" href="{}">Logout</a>{}</body></html>'
+        .format(session['logout_url'], session['form']),
+        url=session['form_page_url'])
+    current_date = datetime.strptime(
+        session['current_date'], '%Y-%m-%d').date()
+    return Connection(browser, client, current_date=current_date)
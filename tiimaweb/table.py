@@ -0,0 +1,178 @@
+"""
+Compact columnar storage of time blocks for bulk analytics.
+
+A TimeBlockTable stores the start and end times as epoch minutes in
+arrays and the reason codes, reason texts, statuses and descriptions
+as categorical columns, which store each distinct value only once.
+The aggregates are computed over the columns without building any
+TimeBlock or datetime objects:
+
+  table = TimeBlockTable.from_time_blocks(blocks)
+  table.total_duration_by_reason_code()  # {'NTYO': timedelta(...), ...}
+  table.total_duration_by_week()  # {(2020, 10): timedelta(...), ...}
+
+The table converts back to TimeBlock objects losslessly, as long as
+the times are whole minutes, which is always the case with Tiima.
+"""
+from __future__ import unicode_literals
+
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Text, Tuple
+
+import pytz
+
+from .timeconv import EPOCH
+from .types import TimeBlock
+
+
+class CategoricalColumn(object):
+    """
+    Column storing each distinct value once and a code per row.
+    """
+    __slots__ = ('values', 'codes', '_index')
+
+    def __init__(self):  # type: (...) -> None
+        self.values = []  # type: List[Text]
+        self.codes = array(str('I'))
+        self._index = {}  # type: Dict[Text, int]
+
+    def __len__(self):  # type: (...) -> int
+        return len(self.codes)
+
+    def __getitem__(self, index):  # type: (int) -> Text
+        return self.values[self.codes[index]]
+
+    def append(self, value):  # type: (Text) -> None
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+
+class TimeBlockTable(object):
+    """
+    Columnar table of time blocks.
+
+    The dates of the blocks are the dates of their start times in the
+    given time zone, which is also the time zone of the returned times.
+    """
+    def __init__(
+            self,
+            tz=str('Europe/Helsinki'),  # type: str
+    ):  # type: (...) -> None
+        self.tz = pytz.timezone(tz)
+        self.ids = []  # type: List[Text]
+        self.start_minutes = array(str('l'))
+        self.end_minutes = array(str('l'))
+        self.day_ordinals = array(str('l'))
+        self.reason_codes = CategoricalColumn()
+        self.reason_texts = CategoricalColumn()
+        self.statuses = CategoricalColumn()
+        self.descriptions = CategoricalColumn()
+
+    @classmethod
+    def from_time_blocks(
+            cls,
+            time_blocks,  # type: Iterable[TimeBlock]
+            tz=str('Europe/Helsinki'),  # type: str
+    ):  # type: (...) -> TimeBlockTable
+        table = cls(tz)
+        table.extend(time_blocks)
+        return table
+
+    def __len__(self):  # type: (...) -> int
+        return len(self.ids)
+
+    def __iter__(self):  # type: (...) -> Iterator[TimeBlock]
+        for index in range(len(self.ids)):
+            yield self[index]
+
+    def __getitem__(self, index):  # type: (int) -> TimeBlock
+        return TimeBlock(
+            id=self.ids[index],
+            start_time=self._from_epoch_minutes(self.start_minutes[index]),
+            end_time=self._from_epoch_minutes(self.end_minutes[index]),
+            reason_code=self.reason_codes[index],
+            reason_text=self.reason_texts[index],
+            status=self.statuses[index],
+            description=self.descriptions[index])
+
+    def append(self, time_block):  # type: (TimeBlock) -> None
+        start_minute = _to_epoch_minutes(time_block.start_time)
+        end_minute = _to_epoch_minutes(time_block.end_time)
+        day = time_block.start_time.astimezone(self.tz).date()
+        self.ids.append(time_block.id)
+        self.start_minutes.append(start_minute)
+        self.end_minutes.append(end_minute)
+        self.day_ordinals.append(day.toordinal())
+        self.reason_codes.append(time_block.reason_code)
+        self.reason_texts.append(time_block.reason_text)
+        self.statuses.append(time_block.status)
+        self.descriptions.append(time_block.description)
+
+    def extend(self, time_blocks):  # type: (Iterable[TimeBlock]) -> None
+        for time_block in time_blocks:
+            self.append(time_block)
+
+    def to_time_blocks(self):  # type: (...) -> List[TimeBlock]
+        return list(self)
+
+    def total_duration(self):  # type: (...) -> timedelta
+        return timedelta(minutes=(
+            sum(self.end_minutes) - sum(self.start_minutes)))
+
+    def total_duration_by_day(self):  # type: (...) -> Dict[date, timedelta]
+        """
+        Get total duration of the blocks of each date, sorted by date.
+        """
+        return OrderedDict(
+            (date.fromordinal(ordinal), timedelta(minutes=minutes))
+            for (ordinal, minutes) in sorted(self._sum_by_day().items()))
+
+    def total_duration_by_week(self):
+        # type: (...) -> Dict[Tuple[int, int], timedelta]
+        """
+        Get total duration of each ISO week, sorted by the week.
+
+        The weeks are given as (ISO year, ISO week number) tuples.
+        """
+        result = OrderedDict()  # type: Dict[Tuple[int, int], timedelta]
+        for (ordinal, minutes) in sorted(self._sum_by_day().items()):
+            (year, week, _weekday) = date.fromordinal(ordinal).isocalendar()
+            key = (year, week)
+            result[key] = result.get(key, timedelta(0)) + timedelta(
+                minutes=minutes)
+        return result
+
+    def total_duration_by_reason_code(self):
+        # type: (...) -> Dict[Text, timedelta]
+        """
+        Get total duration of the blocks of each reason code.
+        """
+        column = self.reason_codes
+        sums = [0] * len(column.values)
+        for (code, start, end) in zip(
+                column.codes, self.start_minutes, self.end_minutes):
+            sums[code] += end - start
+        return dict(
+            (value, timedelta(minutes=minutes))
+            for (value, minutes) in zip(column.values, sums))
+
+    def _sum_by_day(self):  # type: (...) -> Dict[int, int]
+        sums = {}  # type: Dict[int, int]
+        for (ordinal, start, end) in zip(
+                self.day_ordinals, self.start_minutes, self.end_minutes):
+            sums[ordinal] = sums.get(ordinal, 0) + end - start
+        return sums
+
+    def _from_epoch_minutes(self, minutes):  # type: (int) -> datetime
+        return (EPOCH + timedelta(minutes=minutes)).astimezone(self.tz)
+
+
+def _to_epoch_minutes(dt):  # type: (datetime) -> int
+    if dt.second or dt.microsecond:
+        raise ValueError('Time is not a whole minute: {}'.format(dt))
+    return int((dt - EPOCH).total_seconds()) // 60
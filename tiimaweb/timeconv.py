@@ -0,0 +1,166 @@
+"""
+Conversions between local dates, times and Tiima timestamps.
+
+Tiima identifies dates by the epoch milliseconds of their local
+midnight and shows the times of the time blocks as local wall clock
+times.  Converting these with pytz for every request, calendar cell
+and table row is slow, so a TimeConverter precomputes the midnights of
+all the dates of a year, in both directions, the first time a date of
+the year is needed:
+
+  converter = TimeConverter(pytz.timezone('Europe/Helsinki'))
+  converter.get_timestamp(date(2020, 3, 29))  # 1585432800000
+  converter.get_midnight(1585432800000)  # 2020-03-29 00:00+02:00
+
+The local times of a date are made with the UTC offset of its midnight,
+except on the dates of a DST transition, which are localized with pytz.
+"""
+from __future__ import unicode_literals
+
+import re
+import threading
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Dict, Optional, Set, Text, Tuple
+
+import pytz
+
+from .exceptions import ParseError
+
+EPOCH = datetime(1970, 1, 1, 0, 0, tzinfo=pytz.UTC)
+
+_ONE_DAY = timedelta(days=1)
+
+_TIME_RANGE_RE = re.compile(
+    r'(?:\((\d{1,2})\.(\d{1,2})\.\) )?'
+    r'(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})'
+    r'(?: \((\d{1,2})\.(\d{1,2})\.\))?')
+
+
+class TimeConverter(object):
+    """
+    Precomputed conversions between local dates and epoch milliseconds.
+
+    Dates of a year are added on demand, a year at a time.  Timestamps
+    other than the local midnights are converted with pytz.
+    """
+    def __init__(self, tz):  # type: (pytz.BaseTzInfo) -> None
+        self.tz = tz
+        self._timestamps = {}  # type: Dict[date, int]
+        self._midnights = {}  # type: Dict[int, datetime]
+        self._tzinfos = {}  # type: Dict[date, Optional[tzinfo]]
+        self._years = set()  # type: Set[int]
+        self._lock = threading.Lock()
+
+    def get_timestamp(self, day):  # type: (date) -> int
+        """
+        Get epoch milliseconds of the local midnight of a date.
+        """
+        timestamp = self._timestamps.get(day)
+        if timestamp is None:
+            self._add_year(day.year)
+            timestamp = self._timestamps[day]
+        return timestamp
+
+    def get_midnight(self, timestamp):  # type: (int) -> datetime
+        """
+        Get local time of epoch milliseconds, usually a midnight.
+        """
+        midnight = self._midnights.get(timestamp)
+        if midnight is not None:
+            return midnight
+        result = self._convert(timestamp)
+        self._add_year(result.year)
+        return self._midnights.get(timestamp, result)
+
+    def get_date(self, timestamp):  # type: (int) -> date
+        return self.get_midnight(timestamp).date()
+
+    def localize(self, day, hour, minute):
+        # type: (date, int, int) -> datetime
+        """
+        Get the local time of a wall clock time on a date.
+        """
+        day_tzinfo = self._tzinfos.get(day)
+        if day_tzinfo is None:
+            self._add_year(day.year)
+            day_tzinfo = self._tzinfos[day]
+        if day_tzinfo is None:  # DST transition
+            naive = datetime(day.year, day.month, day.day, hour, minute)
+            return self.tz.normalize(self.tz.localize(naive))
+        return datetime(
+            day.year, day.month, day.day, hour, minute, tzinfo=day_tzinfo)
+
+    def parse_time_range(self, text, day):
+        # type: (Text, date) -> Tuple[datetime, datetime]
+        """
+        Parse the time range of a time block row shown on a date.
+
+        The range is like "08:00-16:00", or like "(31.12.) 22:00-02:00"
+        or "22:00-02:00 (01.01.)" when it starts or ends on another
+        date.  Those dates are taken to be in the year of the shown date
+        or, over the turn of the year, in the previous or next year.
+        """
+        m = _TIME_RANGE_RE.match(text)
+        if not m:
+            raise ParseError('Cannot parse times: {}'.format(text))
+        (sd, sm, sh, smin, eh, emin, ed, em) = m.groups()
+        (start_hour, start_minute) = (int(sh), int(smin))
+        (end_hour, end_minute) = (int(eh), int(emin))
+        if (start_hour > 23 or start_minute > 59 or
+                end_hour > 23 or end_minute > 59):
+            raise ParseError('Cannot parse times: {}'.format(text))
+        start_day = end_day = day
+        if sd:
+            year = day.year - (1 if int(sm) == 12 and day.month == 1 else 0)
+            start_day = _make_date(year, sm, sd, text)
+        if ed:
+            year = day.year + (1 if int(em) == 1 and day.month == 12 else 0)
+            end_day = _make_date(year, em, ed, text)
+        return (
+            self.localize(start_day, start_hour, start_minute),
+            self.localize(end_day, end_hour, end_minute))
+
+    def _convert(self, timestamp):  # type: (int) -> datetime
+        utc_datetime = EPOCH + timedelta(milliseconds=timestamp)
+        return utc_datetime.astimezone(self.tz)
+
+    def _add_year(self, year):  # type: (int) -> None
+        with self._lock:
+            if year in self._years:
+                return
+            timestamps = {}  # type: Dict[date, int]
+            midnights = {}  # type: Dict[int, datetime]
+            tzinfos = {}  # type: Dict[date, Optional[tzinfo]]
+            day = date(year, 1, 1)
+            previous = self._localize_midnight(day)
+            while day.year == year:
+                next_day = day + _ONE_DAY
+                midnight = previous
+                previous = self._localize_midnight(next_day)
+                timestamp = _to_timestamp(midnight)
+                timestamps[day] = timestamp
+                midnights[timestamp] = midnight
+                is_transition = previous.utcoffset() != midnight.utcoffset()
+                tzinfos[day] = None if is_transition else midnight.tzinfo
+                day = next_day
+            self._timestamps.update(timestamps)
+            self._midnights.update(midnights)
+            self._tzinfos.update(tzinfos)
+            self._years.add(year)
+
+    def _localize_midnight(self, day):  # type: (date) -> datetime
+        naive = datetime(day.year, day.month, day.day)
+        return self.tz.normalize(self.tz.localize(naive))
+
+
+def _to_timestamp(dt):  # type: (datetime) -> int
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000
+
+
+def _make_date(year, month, day, text):
+    # type: (int, Text, Text, Text) -> date
+    try:
+        return date(year, int(month), int(day))
+    except ValueError:
+        raise ParseError('Cannot parse times: {}'.format(text))
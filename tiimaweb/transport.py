@@ -0,0 +1,325 @@
+"""
+Transports for posting actions through the tiima form.
+
+The FormTransport (the default) fills a copy of the tiima form with
+MechanicalSoup for each request.  The FastTransport captures the form
+fields once into a plain payload template and posts it directly with
+the requests session of the browser, sending the same request bodies
+without rebuilding any soups.
+
+Instead of a name, a Client can also be given a transport factory: a
+callable taking the browser, the tiima form and its page URL and
+returning a BaseTransport.  See the recording module for an example.
+"""
+from __future__ import unicode_literals
+
+from copy import copy
+from typing import Callable, Dict, List, Optional, Text, Tuple, Union
+
+import requests
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+from mechanicalsoup import StatefulBrowser
+from mechanicalsoup.form import Form
+from mechanicalsoup.utils import LinkNotFoundError
+from requests.adapters import HTTPAdapter
+from six.moves.urllib.parse import urljoin
+
+
+def get_action_fields(action):  # type: (Text) -> List[Tuple[Text, Text]]
+    """
+    Get the fields set for every action.
+    """
+    return [
+        ('FieldAction', action),
+        ('UserLanguage', '3'),  # 1 = Finnish, 2 = Swedish, 3 = English
+    ]
+
+
+class BaseTransport(object):
+    """
+    Base of the transports.
+    """
+    name = ''
+
+    def post(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> requests.Response
+        """
+        Post an action with the given parameters and return the response.
+        """
+        raise NotImplementedError
+
+
+class FormTransport(BaseTransport):
+    """
+    Transport submitting a filled copy of the form with MechanicalSoup.
+    """
+    name = 'form'
+
+    def __init__(
+            self,
+            browser,  # type: StatefulBrowser
+            form,  # type: Form
+            url,  # type: Optional[Text]
+    ):  # type: (...) -> None
+        self.browser = browser
+        self.form = form
+        self.url = url
+
+    def post(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> requests.Response
+        form = type(self.form)(copy(self.form.form))
+        form.new_control('text', 'AjaxRequest', '1')
+        for (name, value) in get_action_fields(action):
+            form[name] = value
+        for (name, value) in params.items():
+            try:
+                form.set(name, value, force=True)
+            except LinkNotFoundError:
+                form.new_control('text', name, value=value)
+        # Same as self.browser.submit, but without building the soup
+        return self.browser._request(form.form, self.url)
+
+
+class FastTransport(BaseTransport):
+    """
+    Transport posting a prefilled payload with the requests session.
+
+    The fields of the form are captured once to a FormPayload when the
+    transport is created, so the request bodies are the same as with
+    the FormTransport without rebuilding the form for each request.
+
+    The requests session of the browser is used, so the cookies are
+    shared with the browser.  Its connection pool for the form URL is
+    configured to keep pool_maxsize connections alive.
+    """
+    name = 'fast'
+
+    def __init__(
+            self,
+            browser,  # type: StatefulBrowser
+            form,  # type: Form
+            url,  # type: Optional[Text]
+            pool_maxsize=4,  # type: int
+    ):  # type: (...) -> None
+        self.session = browser.session
+        self.payload = FormPayload(form.form, url)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount(_get_origin(self.payload.url), adapter)
+
+    def post(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> requests.Response
+        payload = self.payload.get_payload(action, params)
+        if self.payload.method == 'GET':
+            return self.session.request(
+                self.payload.method, self.payload.url, params=payload)
+        return self.session.request(
+            self.payload.method, self.payload.url, data=payload)
+
+
+class FormPayload(object):
+    """
+    Payload template captured from the fields of a form.
+
+    Sets the fields in the same way as MechanicalSoup would set them in
+    the form, so the payloads are the same as MechanicalSoup would
+    submit.  Setting checkboxes or radio buttons is not supported.
+    """
+    def __init__(
+            self,
+            form,  # type: Tag
+            url,  # type: Optional[Text]
+    ):  # type: (...) -> None
+        self.method = str(form.get('method') or 'get').upper()
+        self.url = urljoin(url or '', form.get('action') or '')
+        self.fields = capture_form_fields(form)
+
+    def fill(
+            self,
+            values,  # type: Dict[Text, Text]
+    ):  # type: (...) -> List[Tuple[Text, Text]]
+        """
+        Get payload of the form with the given fields set.
+        """
+        fields = [x.copy() for x in self.fields]
+        for (name, value) in values.items():
+            if not _set_field(fields, name, value):
+                raise LinkNotFoundError('No field named {}'.format(name))
+        return [(x.name, x.value) for x in fields if x.submitted]
+
+    def get_payload(
+            self,
+            action,  # type: Text
+            params,  # type: Dict[Text, Text]
+    ):  # type: (...) -> List[Tuple[Text, Text]]
+        """
+        Get payload for posting an AJAX action through the tiima form.
+        """
+        fields = [x.copy() for x in self.fields]
+        _new_control(fields, 'AjaxRequest', '1')
+        for (name, value) in get_action_fields(action):
+            if not _set_field(fields, name, value):
+                raise LinkNotFoundError('No field named {}'.format(name))
+        for (name, value) in params.items():
+            if not _set_field(fields, name, value):
+                _new_control(fields, name, value)
+        return [(x.name, x.value) for x in fields if x.submitted]
+
+
+TRANSPORTS = ('form', 'fast')
+
+Transport = BaseTransport
+
+TransportFactory = Callable[
+    [StatefulBrowser, Form, Optional[Text]], BaseTransport]
+
+
+def create_transport(
+        name,  # type: Union[Text, TransportFactory]
+        browser,  # type: StatefulBrowser
+        form,  # type: Form
+        url,  # type: Optional[Text]
+        pool_maxsize=4,  # type: int
+):  # type: (...) -> BaseTransport
+    if callable(name):
+        return name(browser, form, url)
+    if name == FormTransport.name:
+        return FormTransport(browser, form, url)
+    elif name == FastTransport.name:
+        return FastTransport(browser, form, url, pool_maxsize)
+    raise ValueError('Unknown transport: {}'.format(name))
+
+
+INPUT = 'input'
+CHECKABLE = 'checkable'  # checkbox or radio input
+BUTTON = 'button'
+TEXTAREA = 'textarea'
+SELECT = 'select'
+
+
+class FormField(object):
+    """
+    Captured field of a form.
+    """
+    __slots__ = ('name', 'value', 'kind', 'submitted', 'options')
+
+    def __init__(
+            self,
+            name,  # type: Text
+            value,  # type: Text
+            kind=INPUT,  # type: Text
+            submitted=True,  # type: bool
+            options=(),  # type: Tuple[Text, ...]
+    ):  # type: (...) -> None
+        self.name = name
+        self.value = value
+        self.kind = kind
+        self.submitted = submitted
+        self.options = options
+
+    def copy(self):  # type: (...) -> FormField
+        return FormField(
+            self.name, self.value, self.kind, self.submitted, self.options)
+
+
+def capture_form_fields(form):  # type: (Tag) -> List[FormField]
+    """
+    Capture the fields of a form.
+
+    Captures the fields in the same order and with the same values as
+    MechanicalSoup would submit them.  Fields which would not be
+    submitted (disabled fields and unchecked checkboxes) are captured
+    too, since they still affect setting the values.
+    """
+    result = []  # type: List[FormField]
+    for tag in form.select(
+            'input[name],button[name],textarea[name],select[name]'):
+        name = tag.get('name') or ''
+        submitted = not tag.has_attr('disabled')
+        tag_type = (tag.get('type') or '').lower()
+        if tag.name == 'input' and tag_type in ('radio', 'checkbox'):
+            result.append(FormField(
+                name, tag.get('value', 'on'), CHECKABLE,
+                submitted and 'checked' in tag.attrs))
+        elif tag.name == 'input':
+            result.append(FormField(
+                name, tag.get('value', ''), INPUT, submitted))
+        elif tag.name == 'button':
+            result.append(FormField(
+                name, tag.get('value', ''), BUTTON,
+                submitted and tag_type not in ('button', 'reset')))
+        elif tag.name == 'textarea':
+            result.append(FormField(name, tag.text, TEXTAREA, submitted))
+        elif tag.name == 'select':
+            if 'multiple' in tag.attrs:
+                raise ValueError('Multiple selects are not supported')
+            options = tag.select('option')
+            values = tuple(x.get('value', x.text) for x in options)
+            selected = [
+                x.get('value', x.text) for x in options
+                if 'selected' in x.attrs]
+            if values:
+                value = selected[-1] if selected else values[0]
+                result.append(FormField(
+                    name, value, SELECT, submitted, values))
+    return result
+
+
+def copy_form_fields(form):  # type: (Tag) -> Tag
+    """
+    Copy a form with only its fields.
+
+    The copy submits the same data as the original form, but does not
+    keep the rest of the page content the form may be wrapping.
+    """
+    soup = BeautifulSoup('', 'html.parser')
+    result = soup.new_tag(form.name, attrs=dict(form.attrs))
+    for tag in form.select('input,button,textarea,select'):
+        result.append(copy(tag))
+    return result
+
+
+def _set_field(fields, name, value):
+    # type: (List[FormField], Text, Text) -> bool
+    """
+    Set value of a captured field like MechanicalSoup's Form.set.
+
+    Returns False if there is no settable field with the given name.
+    """
+    for kind in (CHECKABLE, INPUT, TEXTAREA, SELECT):
+        for field in fields:
+            if field.name == name and field.kind == kind:
+                if kind == CHECKABLE:
+                    raise ValueError(
+                        'Cannot set checkbox or radio {}'.format(name))
+                if kind == SELECT and value not in field.options:
+                    return False
+                field.value = value
+                return True
+    return False
+
+
+def _new_control(fields, name, value):
+    # type: (List[FormField], Text, Text) -> None
+    """
+    Add a new text input like MechanicalSoup's Form.new_control.
+
+    Removes the old fields with the same name first, except buttons.
+    """
+    fields[:] = [
+        x for x in fields if not (x.name == name and x.kind != BUTTON)]
+    fields.append(FormField(name, value))
+
+
+def _get_origin(url):  # type: (Text) -> Text
+    parts = url.split('/', 3)
+    return '/'.join(parts[:3]) + '/'
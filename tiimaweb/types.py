@@ -1,31 +1,86 @@
 from __future__ import unicode_literals
 
 from datetime import date, datetime, timedelta
-from typing import NamedTuple, Text
+from typing import Any, Dict, List, NamedTuple, Optional, Text
 
 import requests
 from bs4 import BeautifulSoup
 from six import python_2_unicode_compatible
 
 from .exceptions import UnexpectedResponse
+from .parsing import SoupParser, get_response_encoding, is_html
 
-HtmlResponseBase = NamedTuple('HtmlResponseBase', [
-    ('response', requests.Response),
-    ('soup', BeautifulSoup),
-])
 
+class HtmlResponse(object):
+    """
+    HTTP response with HTML content and its soup.
+
+    The soup is either built up front by MechanicalSoup or, if a
+    parser is given, lazily on first access.  Parsers supporting it
+    may also build separate soups of page fragments, decoding the page
+    only once for all of them.
+
+    This used to be a (response, soup) tuple, but since the soup may
+    be built lazily, it no longer supports unpacking or indexing.
+    Access the response and the soup by attribute instead.
+    """
+    __slots__ = ('response', '_soup', '_parser', '_text', '_fragments')
+
+    def __init__(
+            self,
+            response,  # type: Optional[requests.Response]
+            soup=None,  # type: Optional[BeautifulSoup]
+            parser=None,  # type: Optional[SoupParser]
+    ):  # type: (...) -> None
+        self.response = response
+        self._soup = soup
+        self._parser = parser
+        self._text = None  # type: Optional[Text]
+        self._fragments = {}  # type: Dict[Text, BeautifulSoup]
 
-class HtmlResponse(HtmlResponseBase):
     @classmethod
     def from_response(
             cls,
             response,  # type: requests.Response
+            parser=None,  # type: Optional[SoupParser]
     ):  # type: (...) -> 'HtmlResponse'
+        if parser:
+            if not is_html(response):
+                raise UnexpectedResponse('Got non-HTML response')
+            return cls(response=response, parser=parser)
         soup = getattr(response, 'soup', None)
         if not soup:
             raise UnexpectedResponse('Got non-HTML response')
         return cls(response=response, soup=soup)
 
+    @property
+    def soup(self):  # type: (...) -> BeautifulSoup
+        if self._soup is None:
+            assert self._parser and self.response is not None
+            self._soup = self._parser.parse(
+                self.response.content, get_response_encoding(self.response))
+        return self._soup
+
+    def fragment(self, name):  # type: (Text) -> BeautifulSoup
+        """
+        Get soup containing the given fragment of the page.
+
+        The fragment names are listed in parsing.FRAGMENT_START_TAGS.
+        Falls back to the soup of the whole page, if the parser does
+        not support fragments or cannot find the fragment.
+        """
+        soup = self._fragments.get(name)
+        if soup is None:
+            parse_fragment = getattr(self._parser, 'parse_fragment', None)
+            response = self.response
+            if self._soup is None and parse_fragment and response is not None:
+                if self._text is None:
+                    self._text = self._parser.decode(  # type: ignore
+                        response.content, get_response_encoding(response))
+                soup = parse_fragment(self._text, name)
+            self._fragments[name] = soup = soup or self.soup
+        return soup
+
 
 TimeBlockBase = NamedTuple('TimeBlockBase', [
     ('id', Text),
@@ -40,6 +95,8 @@ TimeBlockBase = NamedTuple('TimeBlockBase', [
 
 @python_2_unicode_compatible
 class TimeBlock(TimeBlockBase):
+    __slots__ = ()
+
     def __str__(self):  # type: ignore
         return (
             '{self.start_time} -- {self.end_time} {self.reason_code} '
@@ -59,7 +116,139 @@ DaySummaryBase = NamedTuple('DaySummaryBase', [
 
 @python_2_unicode_compatible
 class DaySummary(DaySummaryBase):
+    __slots__ = ()
+
     def __str__(self):  # type: ignore
         return (
             '{self.day} {self.duration} '
             '{self.description}').format(self=self).strip()
+
+
+BatchResult = NamedTuple('BatchResult', [
+    ('time_blocks', Dict[date, List[TimeBlock]]),
+    ('request_count', int),
+    ('requests_saved', int),
+])
+
+BlockSpec = NamedTuple('BlockSpec', [
+    ('start_time', datetime),
+    ('end_time', datetime),
+    ('description', Text),
+    ('reason_code', Text),
+])
+
+DaySync = NamedTuple('DaySync', [
+    ('day', date),
+    ('deletes', List[TimeBlock]),
+    ('adds', List[BlockSpec]),
+    ('temporary_lunch', bool),
+    ('request_count', int),
+    ('time_blocks', Optional[List[TimeBlock]]),  # None in dry run
+])
+
+SyncResult = NamedTuple('SyncResult', [
+    ('checked_days', int),
+    ('fetched_days', int),
+    ('request_count', int),
+])
+
+BlockEvent = NamedTuple('BlockEvent', [
+    ('kind', Text),  # "added" or "removed"
+    ('day', date),
+    ('time_block', TimeBlock),
+])
+
+ReportRowBase = NamedTuple('ReportRowBase', [
+    ('key', Text),  # e.g. "2020-03-04", "2020-W10", "2020-03" or "total"
+    ('work', timedelta),  # Lunch breaks excluded
+    ('lunch', timedelta),
+    ('overtime', timedelta),
+    ('block_count', int),
+    ('by_reason_code', Dict[Text, timedelta]),  # Lunch breaks included
+])
+
+
+@python_2_unicode_compatible
+class ReportRow(ReportRowBase):
+    __slots__ = ()
+
+    def __str__(self):  # type: ignore
+        return '{} work {} lunch {} overtime {} ({})'.format(
+            self.key, format_duration(self.work),
+            format_duration(self.lunch), format_duration(self.overtime),
+            ', '.join(
+                '{} {}'.format(code, format_duration(duration))
+                for (code, duration) in sorted(self.by_reason_code.items())))
+
+
+def format_duration(duration):  # type: (timedelta) -> Text
+    """
+    Format a duration as hours and minutes, e.g. "37:30".
+    """
+    minutes = int(duration.total_seconds() // 60)
+    sign = '-' if minutes < 0 else ''
+    return '{}{}:{:02d}'.format(sign, abs(minutes) // 60, abs(minutes) % 60)
+
+
+DebugRecord = NamedTuple('DebugRecord', [
+    ('action', Text),
+    ('status_code', int),
+    ('url', Text),
+    ('content', bytes),
+])
+
+AccountJob = NamedTuple('AccountJob', [
+    ('url', Text),
+    ('username', Text),
+    ('password', Text),
+    ('customer', Text),
+    ('operations', List[Dict[Text, Any]]),
+])
+
+AccountResult = NamedTuple('AccountResult', [
+    ('url', Text),
+    ('username', Text),
+    ('customer', Text),
+    ('results', List[Dict[Text, Any]]),  # One for each finished operation
+    ('error', Optional[Text]),
+    ('request_count', int),
+    ('duration', float),  # seconds
+])
+
+FleetReportBase = NamedTuple('FleetReportBase', [
+    ('results', List[AccountResult]),
+    ('duration', float),  # seconds
+])
+
+
+@python_2_unicode_compatible
+class FleetReport(FleetReportBase):
+    __slots__ = ()
+
+    def __str__(self):  # type: ignore
+        return (
+            '{} accounts ({} failed), {} operations, {} requests '
+            'in {:.1f} s: {:.1f} accounts/s, {:.1f} requests/s').format(
+                len(self.results), len(self.failed), self.operation_count,
+                self.request_count, self.duration,
+                self.accounts_per_second, self.requests_per_second)
+
+    @property
+    def failed(self):  # type: (...) -> List[AccountResult]
+        return [x for x in self.results if x.error]
+
+    @property
+    def operation_count(self):  # type: (...) -> int
+        return sum(len(x.results) for x in self.results)
+
+    @property
+    def request_count(self):  # type: (...) -> int
+        return sum(x.request_count for x in self.results)
+
+    @property
+    def accounts_per_second(self):  # type: (...) -> float
+        return len(self.results) / self.duration if self.duration else 0.0
+
+    @property
+    def requests_per_second(self):  # type: (...) -> float
+        return self.request_count / self.duration if self.duration else 0.0
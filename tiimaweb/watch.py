@@ -0,0 +1,218 @@
+"""
+Watching accounts for changes in their time blocks.
+
+A Watcher polls the calendar strip of a connection, which gives the
+total and the reason code indicators of each date of three months in
+a single request, and fetches the time blocks only of the dates whose
+fingerprint (the total and the indicators) changed since the previous
+poll.  The changes come out as a stream of BlockEvent objects:
+
+  watcher = Watcher(connection)
+  for event in watcher.watch():
+      print(event.kind, event.time_block)  # added 2020-03-04 08:00...
+
+The first poll takes the time blocks of the dates which have something
+in them as the baseline without emitting events.  An edited block is
+seen as removed and added again.  Changes which keep both the total
+and the indicators of a date intact (e.g. an edited description) are
+not seen, like with the mirror module.
+
+The poll interval starts at min_interval and grows by the backoff
+factor after each poll without changes, up to max_interval, so idle
+accounts are polled less and less often.  Any change resets it.  Each
+failed poll grows it too, also before the first successful poll.  Many
+accounts can be watched in one loop with watch_all, which always
+polls the watcher which is due next:
+
+  for (watcher, event) in watch_all([Watcher(x) for x in connections]):
+      ...
+"""
+from __future__ import unicode_literals
+
+import heapq
+import time
+from datetime import date, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Text,
+    Tuple,
+)
+
+from .exceptions import TransientError
+from .instrumentation import timer
+from .types import BlockEvent, DaySummary, TimeBlock
+
+if TYPE_CHECKING:
+    from .client import Connection
+
+ADDED = 'added'
+REMOVED = 'removed'
+
+Fingerprint = Tuple[int, Text]
+
+
+def get_fingerprint(summary):  # type: (DaySummary) -> Fingerprint
+    """
+    Get fingerprint of a day summary: its total minutes and indicators.
+    """
+    return (int(summary.duration.total_seconds()) // 60, summary.description)
+
+
+EMPTY_FINGERPRINT = (0, '')  # type: Fingerprint
+
+
+class Watcher(object):
+    """
+    Poller of the changes in the time blocks of a connection.
+
+    The polled three months start from the given start date, or from
+    the first day of the previous month, if no start is given.
+    """
+    def __init__(
+            self,
+            connection,  # type: Connection
+            start=None,  # type: Optional[date]
+            min_interval=30.0,  # type: float
+            max_interval=600.0,  # type: float
+            backoff=2.0,  # type: float
+    ):  # type: (...) -> None
+        self.connection = connection
+        self.start = start
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.poll_count = 0
+        self.failure_count = 0  # Consecutive failed polls
+        self.fingerprints = {}  # type: Dict[date, Fingerprint]
+        self.time_blocks = {}  # type: Dict[date, List[TimeBlock]]
+
+    def get_start(self):  # type: (...) -> date
+        if self.start:
+            return self.start
+        previous_month_end = date.today().replace(day=1) - timedelta(days=1)
+        return previous_month_end.replace(day=1)
+
+    def poll(self):  # type: (...) -> List[BlockEvent]
+        """
+        Poll the calendar strip once and return the changes.
+
+        Fetches the time blocks of the changed dates only.  The dates
+        seen for the first time are taken as the baseline.
+        """
+        connection = self.connection
+        summaries = connection.get_totals_list(self.get_start())
+        seen = set()  # type: Set[date]
+        events = []  # type: List[BlockEvent]
+        for summary in summaries:
+            day = summary.day
+            seen.add(day)
+            fingerprint = get_fingerprint(summary)
+            is_new = day not in self.fingerprints
+            old_fingerprint = self.fingerprints.get(day, EMPTY_FINGERPRINT)
+            self.fingerprints[day] = fingerprint
+            if fingerprint == old_fingerprint:
+                if is_new:
+                    self.time_blocks[day] = []
+                continue
+            connection.cache.invalidate(day)
+            blocks = connection.get_time_blocks_of_date(day)
+            old_blocks = self.time_blocks.get(day, [])
+            self.time_blocks[day] = blocks
+            if not is_new:
+                events.extend(get_block_events(day, old_blocks, blocks))
+        for day in set(self.fingerprints) - seen:  # Out of the window
+            del self.fingerprints[day]
+            self.time_blocks.pop(day, None)
+        self.poll_count += 1
+        self.failure_count = 0
+        self._update_interval(bool(events))
+        return events
+
+    def poll_safely(self):  # type: (...) -> List[BlockEvent]
+        """
+        Poll like poll, but back off instead of raising TransientError.
+        """
+        try:
+            return self.poll()
+        except TransientError:
+            self.failure_count += 1
+            self._back_off()
+            return []
+
+    def watch(
+            self,
+            sleep=time.sleep,  # type: Callable[[float], None]
+    ):  # type: (...) -> Iterator[BlockEvent]
+        """
+        Poll forever, sleeping the current interval between the polls.
+        """
+        while True:
+            for event in self.poll_safely():
+                yield event
+            sleep(self.interval)
+
+    def _update_interval(self, changed):  # type: (bool) -> None
+        if changed:
+            self.interval = self.min_interval
+        elif self.poll_count > 1:
+            self._back_off()
+
+    def _back_off(self):  # type: (...) -> None
+        self.interval = min(self.interval * self.backoff, self.max_interval)
+
+
+def watch_all(
+        watchers,  # type: Iterable[Watcher]
+        sleep=time.sleep,  # type: Callable[[float], None]
+        clock=timer,  # type: Callable[[], float]
+):  # type: (...) -> Iterator[Tuple[Watcher, BlockEvent]]
+    """
+    Watch many connections in one loop.
+
+    Always polls the watcher which is due next according to its own
+    interval and yields its events with the watcher.
+    """
+    now = clock()
+    queue = [(now, index, watcher) for (index, watcher) in enumerate(watchers)]
+    heapq.heapify(queue)
+    while queue:
+        (due, index, watcher) = heapq.heappop(queue)
+        delay = due - clock()
+        if delay > 0:
+            sleep(delay)
+        for event in watcher.poll_safely():
+            yield (watcher, event)
+        heapq.heappush(queue, (clock() + watcher.interval, index, watcher))
+
+
+def get_block_events(
+        day,  # type: date
+        old_blocks,  # type: Iterable[TimeBlock]
+        new_blocks,  # type: Iterable[TimeBlock]
+):  # type: (...) -> List[BlockEvent]
+    """
+    Get the events turning the old time blocks of a date to the new.
+
+    The removed blocks come first, each group sorted by start time.
+    """
+    old_set = set(old_blocks)
+    new_set = set(new_blocks)
+    return [
+        BlockEvent(REMOVED, day, x)
+        for x in sorted(old_set - new_set, key=_get_sort_key)
+    ] + [
+        BlockEvent(ADDED, day, x)
+        for x in sorted(new_set - old_set, key=_get_sort_key)
+    ]
+
+
+def _get_sort_key(block):  # type: (TimeBlock) -> Tuple[object, ...]
+    return (block.start_time, block.end_time, block.id)